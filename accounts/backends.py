@@ -0,0 +1,22 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+UserModel = get_user_model()
+
+
+class UserBackend(ModelBackend):
+    """
+    Backend d'authentification chargeant l'utilisateur avec son rôle, son agence et son
+    profil de modèle en une seule requête.
+
+    get_user est appelé une fois par requête (request.user) ; les décorateurs de rôle,
+    AgencyIsolationMiddleware, les vues et les templates lisent ensuite user.role,
+    user.agency et user.model_profile depuis le cache de l'instance, sans requête.
+    """
+
+    def get_user(self, user_id):
+        try:
+            user = UserModel._default_manager.select_related('role', 'agency', 'model_profile').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
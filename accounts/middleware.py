@@ -2,6 +2,7 @@ from django.shortcuts import redirect
 from django.contrib import messages
 from django.utils.translation import gettext_lazy as _
 from django.urls import reverse
+from .tenancy import agency_scope_for_user, reset_current_agency, set_current_agency
 
 
 class RoleRequiredMiddleware:
@@ -23,7 +24,8 @@ class RoleRequiredMiddleware:
 class AgencyIsolationMiddleware:
     """
     Middleware pour isoler les données par agence pour les Regional Managers.
-    Ajoute l'agence de l'utilisateur au contexte de la requête.
+    Ajoute l'agence de l'utilisateur au contexte de la requête et fixe le périmètre
+    d'agence utilisé par les managers `scoped` (accounts.tenancy) pendant la vue.
     """
     
     def __init__(self, get_response):
@@ -36,5 +38,9 @@ class AgencyIsolationMiddleware:
         else:
             request.user_agency = None
         
-        response = self.get_response(request)
+        token = set_current_agency(agency_scope_for_user(request.user))
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_current_agency(token)
         return response
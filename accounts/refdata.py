@@ -0,0 +1,168 @@
+"""
+Cache des données de référence : agences, rôles, catégories de dépenses, sources de
+revenus et règles de bonus actives.
+
+Ces petites tables changent rarement mais sont relues par presque toutes les vues
+(sélecteurs, rôle MODELE, règles de bonus). Chaque ensemble est chargé une fois, stocké
+dans le cache partagé (CACHES['default']) sous une version globale et mémorisé dans le
+processus ; une lecture ne coûte alors qu'une lecture de la version dans le cache.
+
+Toute sauvegarde ou suppression sur ces tables incrémente la version (signaux branchés
+depuis AccountsConfig.ready), immédiatement puis à nouveau au commit de la transaction :
+aucun processus ne peut garder en cache un état lu avant le commit. Les écritures
+groupées (update, bulk_create) n'envoient pas de signal : leurs auteurs appellent
+invalidate().
+"""
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+VERSION_KEY = 'refdata:version'
+REFDATA_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Mémoire du processus : nom -> (version, valeur)
+_local = {}
+
+
+def get_version():
+    """Version courante des données de référence"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(VERSION_KEY, version, None)
+    return version
+
+
+def invalidate():
+    """Rend obsolètes les données de référence de tous les processus"""
+    _local.clear()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, None)
+
+
+def _load(name, loader):
+    version = get_version()
+    memo = _local.get(name)
+    if memo is not None and memo[0] == version:
+        return memo[1]
+    key = f'refdata:{version}:{name}'
+    value = cache.get(key)
+    if value is None:
+        value = loader()
+        cache.set(key, value, REFDATA_CACHE_TIMEOUT)
+    _local[name] = (version, value)
+    return value
+
+
+def get_agencies(active_only=False):
+    """
+    Agences triées par nom.
+
+    Returns:
+        list: Instances de Agency (toutes, ou seulement les actives)
+    """
+    from agencies.models import Agency
+
+    agencies = _load('agencies', lambda: list(Agency.objects.order_by('name')))
+    if active_only:
+        return [agency for agency in agencies if agency.is_active]
+    return agencies
+
+
+def get_agency(agency_id):
+    """Agence par identifiant (None si elle n'existe pas)"""
+    try:
+        agency_id = int(agency_id)
+    except (TypeError, ValueError):
+        return None
+    for agency in get_agencies():
+        if agency.id == agency_id:
+            return agency
+    return None
+
+
+def get_roles():
+    """Rôles triés par nom"""
+    from .models import Role
+
+    return _load('roles', lambda: list(Role.objects.order_by('name')))
+
+
+def get_role(role_type):
+    """
+    Rôle par type (Role.RoleType).
+
+    Raises:
+        Role.DoesNotExist: Si le rôle n'a pas été créé
+    """
+    from .models import Role
+
+    for role in get_roles():
+        if role.name == role_type:
+            return role
+    raise Role.DoesNotExist(f'Role {role_type} does not exist')
+
+
+def get_expense_categories():
+    """Catégories de dépenses triées par nom"""
+    from financial.models import ExpenseCategory
+
+    return _load('expense_categories', lambda: list(ExpenseCategory.objects.order_by('name')))
+
+
+def get_revenue_sources():
+    """Sources de revenus triées par nom"""
+    from financial.models import RevenueSource
+
+    return _load('revenue_sources', lambda: list(RevenueSource.objects.order_by('name')))
+
+
+def _load_bonus_rules():
+    from agencies.models import BonusRule
+
+    rules = defaultdict(list)
+    for rule in BonusRule.objects.filter(is_active=True).order_by('order'):
+        rules[rule.agency_id].append(rule)
+    return dict(rules)
+
+
+def get_bonus_rules(agency_id):
+    """Règles de bonus actives d'une agence, triées par ordre"""
+    return list(_load('bonus_rules', _load_bonus_rules).get(agency_id, []))
+
+
+def get_bonus_rules_by_agency(agency_ids=None):
+    """
+    Règles de bonus actives de plusieurs agences.
+
+    Returns:
+        dict: {agency_id: [BonusRule triées par ordre]} (agences sans règle absentes)
+    """
+    rules = _load('bonus_rules', _load_bonus_rules)
+    if agency_ids is not None:
+        agency_ids = set(agency_ids)
+        rules = {agency_id: agency_rules for agency_id, agency_rules in rules.items() if agency_id in agency_ids}
+    return {agency_id: list(agency_rules) for agency_id, agency_rules in rules.items()}
+
+
+def reference_data_changed(sender, **kwargs):
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+def connect_signals():
+    """Branche l'invalidation (appelé depuis AccountsConfig.ready)"""
+    from agencies.models import Agency, BonusRule
+    from financial.models import ExpenseCategory, RevenueSource
+    from .models import Role
+
+    for action, signal in (('save', post_save), ('delete', post_delete)):
+        for model in (Agency, BonusRule, ExpenseCategory, RevenueSource, Role):
+            signal.connect(
+                reference_data_changed, sender=model,
+                dispatch_uid=f'refdata_{model.__name__.lower()}_{action}'
+            )
@@ -0,0 +1,36 @@
+"""
+Stockage privé des fichiers générés ou déposés (relevés de paiement, rapports, imports).
+
+Les fichiers sont écrits sous PRIVATE_ROOT, hors de MEDIA_ROOT que le serveur web publie
+sans authentification : ils ne sont servis que par les vues qui vérifient le rôle et
+l'agence de l'utilisateur (FileResponse). Le stockage n'a pas d'URL publique.
+"""
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.functional import cached_property
+
+
+class PrivateStorage(FileSystemStorage):
+    """FileSystemStorage sous PRIVATE_ROOT, sans URL"""
+
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.PRIVATE_ROOT)
+
+    @cached_property
+    def base_url(self):
+        return None
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == 'PRIVATE_ROOT':
+            self.__dict__.pop('base_location', None)
+            self.__dict__.pop('location', None)
+
+
+_private_storage = PrivateStorage()
+
+
+def private_storage():
+    """Stockage privé partagé (callable utilisable comme storage d'un FileField)"""
+    return _private_storage
@@ -0,0 +1,105 @@
+"""
+Périmètre d'agence (tenant) de la requête courante.
+
+AgencyIsolationMiddleware fixe l'agence visible par l'utilisateur dans une variable de
+contexte pour la durée de la requête ; le manager `scoped` des modèles rattachés à une
+agence (Model, WorkSession, Schedule, Expense, Revenue, Salary) y ajoute le filtre
+d'agence automatiquement, sur la colonne agency_id de la table elle-même (index
+composites commençant par l'agence) plutôt que par une jointure.
+
+Le manager `objects` n'est jamais filtré : admin, tâches de fond, commandes et relations
+voient toutes les données. Hors requête (worker, commandes, shell), le périmètre est
+ouvert, sauf dans un bloc agency_scope().
+
+Les vues de listes et les tableaux de bord de ces modèles passent par `scoped` ; le code
+qui reçoit une agence explicite (fiche d'agence, liquidation) utilise for_agency(). Les
+rapports (reports.engine, reports.trends) gardent leur liste d'agences explicite : leurs
+résultats sont mis en cache et partagés entre utilisateurs, et calculés aussi par le
+worker, hors requête.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import models
+
+# Utilisateur sans agence (hors General Manager) : aucune donnée visible
+NO_AGENCY = object()
+
+# None : pas de filtre ; NO_AGENCY : aucune ligne ; sinon identifiant de l'agence
+_current_agency = ContextVar('current_agency', default=None)
+
+
+def agency_scope_for_user(user):
+    """
+    Périmètre d'un utilisateur (mêmes règles que filter_by_agency_queryset).
+
+    - General Manager : pas de filtre
+    - Regional Manager et Modèle : leur agence
+    - Utilisateur anonyme ou sans agence : aucune donnée
+
+    Returns:
+        None, NO_AGENCY ou l'identifiant de l'agence
+    """
+    if not user.is_authenticated:
+        return NO_AGENCY
+    if user.is_general_manager():
+        return None
+    return user.agency_id or NO_AGENCY
+
+
+def get_current_agency():
+    """Périmètre courant (None, NO_AGENCY ou identifiant d'agence)"""
+    return _current_agency.get()
+
+
+def set_current_agency(scope):
+    """Fixe le périmètre courant ; renvoie le jeton à passer à reset_current_agency()"""
+    return _current_agency.set(scope)
+
+
+def reset_current_agency(token):
+    _current_agency.reset(token)
+
+
+@contextmanager
+def agency_scope(scope):
+    """
+    Bloc exécuté avec un périmètre donné (tâche de fond ou commande agissant pour une
+    agence) : une Agency, son identifiant, None ou NO_AGENCY.
+    """
+    if isinstance(scope, models.Model):
+        scope = scope.pk
+    token = set_current_agency(scope)
+    try:
+        yield
+    finally:
+        reset_current_agency(token)
+
+
+def scope_queryset(queryset, scope, agency_field='agency'):
+    """Restreint un queryset à un périmètre (None, NO_AGENCY, Agency ou identifiant)"""
+    if scope is None:
+        return queryset
+    if scope is NO_AGENCY:
+        return queryset.none()
+    return queryset.filter(**{agency_field: scope})
+
+
+class TenantManager(models.Manager):
+    """
+    Manager filtré sur le périmètre d'agence courant.
+
+    Args:
+        agency_field (str): Champ ForeignKey vers Agency du modèle
+    """
+
+    def __init__(self, agency_field='agency'):
+        super().__init__()
+        self.agency_field = agency_field
+
+    def get_queryset(self):
+        return scope_queryset(super().get_queryset(), get_current_agency(), self.agency_field)
+
+    def for_agency(self, agency):
+        """Lignes d'une agence (Agency ou identifiant), indépendamment du périmètre courant"""
+        return super().get_queryset().filter(**{self.agency_field: agency})
@@ -1,7 +1,19 @@
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from agencies.models import Agency
+from django.utils import timezone
+from agencies.models import Agency, BonusRule
+from models_app.models import Model, WorkSession
+from . import refdata
+from .tenancy import NO_AGENCY, agency_scope
 from .models import Role
 
 User = get_user_model()
@@ -172,3 +184,221 @@ class PermissionTest(TestCase):
         self.assertTrue(self.rm_user.is_regional_manager())
         self.assertFalse(self.rm_user.is_modele())
         self.assertEqual(self.rm_user.agency, self.agency)
+
+
+class UserBackendTest(TestCase):
+    """Tests du chargement de l'utilisateur de la requête"""
+
+    def setUp(self):
+        self.client = Client()
+        rm_role = Role.objects.create(name=Role.RoleType.REGIONAL_MANAGER)
+        self.agency = Agency.objects.create(name="Agencia Test", code="AGT001")
+        User.objects.create_user(username="regional", password="test123", role=rm_role, agency=self.agency)
+        self.client.login(username="regional", password="test123")
+
+    def test_role_and_agency_loaded_with_user(self):
+        """Rôle, agence et profil de modèle sont lus avec l'utilisateur, sans requête séparée"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('accounts:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        statements = [query['sql'] for query in queries.captured_queries]
+        user_queries = [sql for sql in statements if 'FROM "accounts_user"' in sql]
+        self.assertIn('JOIN "accounts_role"', user_queries[0])
+        self.assertFalse([sql for sql in statements if 'FROM "accounts_role"' in sql])
+        self.assertFalse([sql for sql in statements if 'FROM "agencies_agency" WHERE "agencies_agency"."id" =' in sql])
+
+
+class ReferenceDataTest(TestCase):
+    """Tests du cache des données de référence"""
+
+    def setUp(self):
+        self.modele_role = Role.objects.create(name=Role.RoleType.MODELE)
+        self.agency = Agency.objects.create(name="Norte", code="AGT001")
+        self.inactive = Agency.objects.create(name="Cerrada", code="AGT002", is_active=False)
+        self.rule = BonusRule.objects.create(
+            agency=self.agency,
+            name="Quincena",
+            period_type=BonusRule.PeriodType.BIWEEKLY,
+            target_currency=BonusRule.TargetCurrency.COP,
+            target_amount=Decimal('0.00'),
+            bonus_type=BonusRule.BonusType.FIXED_AMOUNT,
+            bonus_value=Decimal('50000.00'),
+        )
+
+    def test_lookups_cached_until_change(self):
+        """Les lectures suivantes ne touchent pas la base ; une sauvegarde invalide le cache"""
+        self.assertEqual(refdata.get_role(Role.RoleType.MODELE), self.modele_role)
+        self.assertEqual(refdata.get_agencies(active_only=True), [self.agency])
+        self.assertEqual(refdata.get_bonus_rules(self.agency.id), [self.rule])
+        with self.assertNumQueries(0):
+            refdata.get_role(Role.RoleType.MODELE)
+            refdata.get_agencies()
+            refdata.get_agency(self.agency.id)
+            refdata.get_bonus_rules(self.agency.id)
+            # Un autre processus lit le cache partagé sans requête
+            refdata._local.clear()
+            self.assertEqual(refdata.get_agency(self.inactive.id), self.inactive)
+        with self.assertRaises(Role.DoesNotExist):
+            refdata.get_role(Role.RoleType.GENERAL_MANAGER)
+
+        south = Agency.objects.create(name="Sur", code="AGT003")
+        self.assertEqual(refdata.get_agencies(active_only=True), [self.agency, south])
+        self.rule.is_active = False
+        self.rule.save()
+        self.assertEqual(refdata.get_bonus_rules(self.agency.id), [])
+
+
+class SessionTest(TestCase):
+    """Tests des sessions : backend cached_db, mot de passe temporaire et nettoyage"""
+
+    def setUp(self):
+        rm_role = Role.objects.create(name=Role.RoleType.REGIONAL_MANAGER)
+        modele_role = Role.objects.create(name=Role.RoleType.MODELE)
+        self.agency = Agency.objects.create(name="Agencia Test", code="AGT001")
+        User.objects.create_user(username="regional", password="test123", role=rm_role, agency=self.agency)
+        model_user = User.objects.create_user(username="ana", password="test123", role=modele_role, agency=self.agency)
+        self.model = Model.objects.create(
+            first_name="Ana", last_name="Ruiz", agency=self.agency, fecha_ingreso=date(2025, 1, 1), user=model_user
+        )
+
+    def _session_queries(self):
+        """Requêtes sur django_session lors d'une requête authentifiée (après la connexion)"""
+        client = Client()
+        client.login(username="regional", password="test123")
+        client.get(reverse('accounts:dashboard'))
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('accounts:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries.captured_queries if 'django_session' in query['sql']]
+
+    def test_cached_db_sessions_skip_database(self):
+        """Benchmark : cached_db lit la session depuis le cache, sans aller en base"""
+        with self.settings(SESSION_ENGINE='django.contrib.sessions.backends.db'):
+            self.assertEqual(len(self._session_queries()), 1)
+        with self.settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db'):
+            self.assertEqual(self._session_queries(), [])
+
+    def test_temporary_password_shown_once_outside_session(self):
+        """Le mot de passe réinitialisé est affiché une fois, hors session et chiffré dans le cache"""
+        self.client.login(username="regional", password="test123")
+        self.client.post(reverse('models_app:model_user_reset_password', args=[self.model.id]))
+        self.assertFalse([key for key in self.client.session.keys() if 'password' in key])
+
+        stored = cache.get(f'accounts:temp_password:{self.client.session["_auth_user_id"]}:{self.model.user_id}')
+        password = self.client.get(reverse('models_app:detail', args=[self.model.id])).context['user_password_temp']
+        self.assertNotIn(password, stored)
+        self.assertTrue(self.client.login(username="ana", password=password))
+        self.client.login(username="regional", password="test123")
+        self.assertIsNone(self.client.get(reverse('models_app:detail', args=[self.model.id])).context['user_password_temp'])
+
+    def test_worker_clears_expired_sessions(self):
+        """Le worker des tâches supprime les sessions expirées"""
+        Session.objects.create(session_key="expirada", session_data="", expire_date=timezone.now() - timedelta(days=1))
+        Session.objects.create(session_key="vigente", session_data="", expire_date=timezone.now() + timedelta(days=1))
+        call_command('run_worker', once=True, stdout=io.StringIO())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ["vigente"])
+
+
+class UserListTest(TestCase):
+    """Tests de la liste paginée des utilisateurs"""
+
+    def setUp(self):
+        self.client = Client()
+        gm_role = Role.objects.create(name=Role.RoleType.GENERAL_MANAGER)
+        self.modele_role = Role.objects.create(name=Role.RoleType.MODELE)
+        self.agency = Agency.objects.create(name="Norte", code="AGT001")
+        User.objects.create_user(username="general", password="test123", role=gm_role)
+        self.client.login(username="general", password="test123")
+        self.other = Agency.objects.create(name="Sur", code="AGT002")
+        User.objects.bulk_create([
+            User(username=f"modelo{i:02d}", role=self.modele_role, agency=self.agency, is_active=i % 4 != 0)
+            for i in range(60)
+        ] + [User(username="lejos", role=self.modele_role, agency=self.other)])
+
+    def test_counters_follow_filters_and_page(self):
+        """Les compteurs suivent les filtres de rôle et d'agence ; la page est limitée"""
+        params = {'role': Role.RoleType.MODELE, 'agency': self.agency.id}
+        response = self.client.get(reverse('accounts:user_list'), params)
+        context = response.context
+        self.assertEqual((context['total_users'], context['active_users'], context['inactive_users']), (60, 45, 15))
+        self.assertEqual(context['page_obj'].paginator.count, 60)
+        self.assertEqual(len(context['users']), 50)
+
+        response = self.client.get(reverse('accounts:user_list'), {**params, 'is_active': 'false', 'page': 1})
+        self.assertEqual(response.context['page_obj'].paginator.count, 15)
+        self.assertTrue(all(not user.is_active for user in response.context['users']))
+        self.assertEqual(response.context['total_users'], 60)
+        self.assertEqual(self.client.get(reverse('accounts:user_list'), {'agency': 'x'}).context['total_users'], 62)
+
+    def test_query_count_independent_of_users(self):
+        """Benchmark : le nombre de requêtes ne dépend pas du nombre d'utilisateurs"""
+        self.client.get(reverse('accounts:user_list'))
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(reverse('accounts:user_list'), {'agency': self.other.id})
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(reverse('accounts:user_list'))
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+
+
+class TenancyTest(TestCase):
+    """Tests du périmètre d'agence de la requête (managers scoped)"""
+
+    def setUp(self):
+        """Créer deux agences avec un modèle et une session chacune, et un Regional Manager"""
+        rm_role = Role.objects.create(name=Role.RoleType.REGIONAL_MANAGER)
+        self.agency = Agency.objects.create(name="Agencia Norte", code="AGN001")
+        self.other = Agency.objects.create(name="Agencia Sur", code="AGS001")
+        self.manager = User.objects.create_user(
+            username="regional", password="test123", role=rm_role, agency=self.agency
+        )
+        self.model = Model.objects.create(
+            first_name="Ana", last_name="Norte", agency=self.agency, fecha_ingreso=date(2025, 1, 1)
+        )
+        self.other_model = Model.objects.create(
+            first_name="Ana", last_name="Sur", agency=self.other, fecha_ingreso=date(2025, 1, 1)
+        )
+        self.session = WorkSession.objects.create(model=self.model, date=date(2026, 3, 2))
+        WorkSession.objects.create(model=self.other_model, date=date(2026, 3, 2))
+
+    def test_scoped_managers(self):
+        """Filtre d'agence injecté sur la colonne de la table, sans jointure ; objects reste global"""
+        self.assertEqual(WorkSession.scoped.count(), 2)
+        with agency_scope(self.agency):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(list(WorkSession.scoped.all()), [self.session])
+            self.assertNotIn('JOIN', queries.captured_queries[0]['sql'])
+            self.assertEqual(list(Model.scoped.all()), [self.model])
+            self.assertEqual(WorkSession.objects.count(), 2)
+            self.assertEqual(Model.scoped.for_agency(self.other).get(), self.other_model)
+        with agency_scope(NO_AGENCY):
+            self.assertFalse(Model.scoped.exists())
+
+        client = Client()
+        client.login(username="regional", password="test123")
+        response = client.get(reverse('models_app:autocomplete'), {'q': 'Ana'})
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.model.id])
+
+    def test_regional_manager_views_use_scope(self):
+        """Liste des modèles et tableau de bord du Regional Manager limités à son agence"""
+        today = timezone.now().date()
+        WorkSession.objects.create(model=self.model, date=today)
+        WorkSession.objects.create(model=self.other_model, date=today)
+        client = Client()
+        client.login(username="regional", password="test123")
+
+        response = client.get(reverse('models_app:list'), {'show_inactive': 'true'})
+        self.assertEqual([model.id for model in response.context['models']], [self.model.id])
+
+        response = client.get(reverse('accounts:dashboard'), {'working_date': today.isoformat()})
+        self.assertEqual(response.context['total_sessions_today'], 1)
+        self.assertEqual(response.context['active_models'], 1)
+        self.assertEqual([row['model'] for row in response.context['working_models_data']], [self.model])
+
+    def test_session_agency_follows_model(self):
+        """L'agence dénormalisée des sessions suit celle du modèle"""
+        self.assertEqual(self.session.agency_id, self.agency.id)
+        self.model.agency = self.other
+        self.model.save()
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.agency_id, self.other.id)
+        self.assertEqual(WorkSession.scoped.for_agency(self.other).count(), 2)
@@ -8,6 +8,7 @@ urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('dashboard/', views.dashboard_view, name='dashboard'),
+    path('dashboard/stats/', views.dashboard_stats_api, name='dashboard_stats'),
     
     # User management
     path('users/', views.user_list, name='user_list'),
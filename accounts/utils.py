@@ -1,5 +1,14 @@
+import base64
+import secrets
+from importlib import import_module
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
+from django.utils.crypto import salted_hmac
 from .models import Role
+from .tenancy import agency_scope_for_user, scope_queryset
 
 
 def check_role_permission(user, required_role):
@@ -73,17 +82,66 @@ def filter_by_agency_queryset(user, queryset, agency_field='agency'):
     Returns:
         QuerySet filtré
     """
-    if not user.is_authenticated:
-        return queryset.none()
-    
-    # General Manager voit tout
-    if user.is_general_manager():
-        return queryset
-    
-    # Regional Manager et Modèle : uniquement leur agence
-    if user.agency:
-        filter_kwargs = {agency_field: user.agency}
-        return queryset.filter(**filter_kwargs)
-    
-    # Pas d'agence assignée = pas d'accès
-    return queryset.none()
+    return scope_queryset(queryset, agency_scope_for_user(user), agency_field)
+
+
+# Durée de conservation d'un mot de passe temporaire après sa réinitialisation (secondes) ;
+# il est affiché par la redirection qui suit immédiatement
+TEMP_PASSWORD_TIMEOUT = 2 * 60
+
+_TEMP_PASSWORD_SALT = 'accounts.utils.temp_password'
+
+
+def _temp_password_key(request, user_id):
+    return f'accounts:temp_password:{request.user.pk}:{user_id}'
+
+
+def _temp_password_keystream(nonce, length):
+    """Flux de chiffrement dérivé de SECRET_KEY et d'un nonce propre à chaque mot de passe"""
+    stream = b''
+    counter = 0
+    while len(stream) < length:
+        stream += salted_hmac(_TEMP_PASSWORD_SALT, f'{nonce}:{counter}', algorithm='sha256').digest()
+        counter += 1
+    return stream[:length]
+
+
+def store_temporary_password(request, user_id, password):
+    """
+    Conserve un mot de passe généré pour l'afficher une seule fois à l'utilisateur courant.
+
+    Le mot de passe est gardé dans le cache et non dans la session. Le cache de production
+    pouvant être persistant (FileBasedCache, Redis), la valeur y est chiffrée avec une clé
+    dérivée de SECRET_KEY puis signée (signing.dumps) : elle n'est jamais écrite en clair
+    et expire après TEMP_PASSWORD_TIMEOUT secondes.
+    """
+    nonce = secrets.token_hex(16)
+    data = password.encode()
+    encrypted = bytes(a ^ b for a, b in zip(data, _temp_password_keystream(nonce, len(data))))
+    token = signing.dumps(
+        {'nonce': nonce, 'data': base64.urlsafe_b64encode(encrypted).decode()},
+        salt=_TEMP_PASSWORD_SALT,
+    )
+    cache.set(_temp_password_key(request, user_id), token, TEMP_PASSWORD_TIMEOUT)
+
+
+def pop_temporary_password(request, user_id):
+    """Retourne puis oublie le mot de passe temporaire d'un utilisateur (None s'il a expiré)"""
+    key = _temp_password_key(request, user_id)
+    token = cache.get(key)
+    if token is None:
+        return None
+    cache.delete(key)
+    try:
+        payload = signing.loads(token, salt=_TEMP_PASSWORD_SALT, max_age=TEMP_PASSWORD_TIMEOUT)
+    except signing.BadSignature:
+        return None
+    encrypted = base64.urlsafe_b64decode(payload['data'])
+    keystream = _temp_password_keystream(payload['nonce'], len(encrypted))
+    return bytes(a ^ b for a, b in zip(encrypted, keystream)).decode()
+
+
+def clear_expired_sessions():
+    """Supprime les sessions expirées du backend configuré (équivalent de clearsessions)"""
+    engine = import_module(settings.SESSION_ENGINE)
+    engine.SessionStore.clear_expired()
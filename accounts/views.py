@@ -2,16 +2,23 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.http import JsonResponse
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Sum, Count, Q, Avg
+from django.core.paginator import Paginator
+from django.db.models import Sum, Count, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
 from .decorators import role_required, general_manager_required
 from .models import Role, User
+from .refdata import get_agencies, get_roles
 from financial.models import Expense, Salary, Revenue
-from models_app.models import Model, ModelGain, WorkedHours, WorkSession, ScheduleAssignment
+from models_app.models import Model, WorkSession, ScheduleAssignment, active_by_dates_q
+from models_app.stats import get_model_personal_stats
 from agencies.models import Agency
 
+# Utilisateurs par page de la liste
+USER_LIST_PAGE_SIZE = 50
+
 
 def login_view(request):
     """Vue de connexion"""
@@ -42,16 +49,8 @@ def logout_view(request):
     return redirect('accounts:login')
 
 
-@login_required
-def dashboard_view(request):
-    """Vue du tableau de bord avec statistiques selon le rôle"""
-    context = {
-        'user': request.user,
-        'user_role': request.user.get_role_display() if request.user.role else 'Sin rol',
-        'user_agency': request.user.agency.name if request.user.agency else None,
-    }
-    
-    # Récupérer la période (par défaut : mois en cours)
+def _get_period_from_request(request):
+    """Lit la période (period_start, period_end) depuis la requête, par défaut le mois en cours"""
     period_start = request.GET.get('period_start')
     period_end = request.GET.get('period_end')
     
@@ -71,6 +70,21 @@ def dashboard_view(request):
         except ValueError:
             period_end = timezone.now().date()
     
+    return period_start, period_end
+
+
+@login_required
+def dashboard_view(request):
+    """Vue du tableau de bord avec statistiques selon le rôle"""
+    context = {
+        'user': request.user,
+        'user_role': request.user.get_role_display() if request.user.role else 'Sin rol',
+        'user_agency': request.user.agency.name if request.user.agency else None,
+    }
+    
+    # Récupérer la période (par défaut : mois en cours)
+    period_start, period_end = _get_period_from_request(request)
+    
     context['period_start'] = period_start
     context['period_end'] = period_end
     
@@ -78,7 +92,7 @@ def dashboard_view(request):
     if request.user.role:
         if request.user.is_general_manager():
             # Dashboard General Manager - Stats du jour et sessions de travail
-            agencies = Agency.objects.all()
+            agencies = get_agencies()
             
             # Date du jour pour les stats
             today = timezone.now().date()
@@ -129,7 +143,7 @@ def dashboard_view(request):
             # Récupérer les sessions de travail pour cette date
             if working_agency:
                 work_sessions = WorkSession.objects.filter(
-                    model__agency=working_agency,
+                    agency=working_agency,
                     date=working_date
                 ).select_related('model', 'schedule_assignment', 'schedule_assignment__schedule').order_by('model__first_name', 'model__last_name')
             else:
@@ -193,7 +207,7 @@ def dashboard_view(request):
             for agency in agencies:
                 # Gain total de l'agence (sessions complétées)
                 agency_gain_total = WorkSession.objects.filter(
-                    model__agency=agency,
+                    agency=agency,
                     status=WorkSession.Status.COMPLETED,
                     date__gte=period_start,
                     date__lte=period_end
@@ -287,17 +301,17 @@ def dashboard_view(request):
             return render(request, 'accounts/dashboard_general_manager.html', context)
             
         elif request.user.is_regional_manager() and request.user.agency:
-            # Dashboard Regional Manager - Vue de son agence (même structure que General Manager)
+            # Dashboard Regional Manager - Vue de son agence (même structure que General Manager) :
+            # les managers `scoped` sont filtrés sur son agence par AgencyIsolationMiddleware
             agency = request.user.agency
             
             # Date du jour pour les stats
             today = timezone.now().date()
             
             # Ganancia total del día (sessions complétées du jour pour cette agence)
-            today_completed_sessions = WorkSession.objects.filter(
+            today_completed_sessions = WorkSession.scoped.filter(
                 status=WorkSession.Status.COMPLETED,
-                date=today,
-                model__agency=agency
+                date=today
             )
             
             total_gain_today = today_completed_sessions.aggregate(
@@ -305,7 +319,7 @@ def dashboard_view(request):
             )['total'] or 0
             
             # Stats des sessions de travail du jour (optimisé avec des agrégations)
-            today_sessions_qs = WorkSession.objects.filter(date=today, model__agency=agency)
+            today_sessions_qs = WorkSession.scoped.filter(date=today)
             
             total_sessions_today = today_sessions_qs.count()
             late_count_today = today_sessions_qs.filter(late_minutes__gt=0).count()
@@ -329,8 +343,7 @@ def dashboard_view(request):
                 working_date = today
             
             # Récupérer les sessions de travail pour cette date
-            work_sessions = WorkSession.objects.filter(
-                model__agency=agency,
+            work_sessions = WorkSession.scoped.filter(
                 date=working_date
             ).select_related('model', 'schedule_assignment', 'schedule_assignment__schedule').order_by('model__first_name', 'model__last_name')
             
@@ -350,7 +363,7 @@ def dashboard_view(request):
                 })
             
             # Statistiques des modèles actifs
-            active_models = Model.active_by_dates.filter(agency=agency).count()
+            active_models = Model.scoped.filter(active_by_dates_q()).count()
             
             context.update({
                 'agency': agency,
@@ -382,31 +395,8 @@ def dashboard_view(request):
                 messages.warning(request, _('No tiene un perfil de modelo asociado.'))
                 return render(request, 'accounts/dashboard.html', context)
             
-            # Gains du modèle
-            total_gains = ModelGain.objects.filter(
-                model=model,
-                date__gte=period_start,
-                date__lte=period_end
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            # Heures travaillées
-            total_hours = WorkedHours.objects.filter(
-                model=model,
-                date__gte=period_start,
-                date__lte=period_end
-            ).aggregate(total=Sum('hours'))['total'] or 0
-            
-            avg_hours = WorkedHours.objects.filter(
-                model=model,
-                date__gte=period_start,
-                date__lte=period_end
-            ).aggregate(avg=Avg('hours'))['avg'] or 0
-            
-            # Derniers gains
-            recent_gains = ModelGain.objects.filter(model=model).order_by('-date')[:10]
-            
-            # Dernières heures travaillées
-            recent_hours = WorkedHours.objects.filter(model=model).order_by('-date')[:10]
+            # Statistiques personnelles (totaux, moyennes, activité récente, quinzaine)
+            stats = get_model_personal_stats(model, period_start, period_end)
             
             # Horarios asignados
             schedule_assignments = ScheduleAssignment.objects.filter(
@@ -415,11 +405,12 @@ def dashboard_view(request):
             
             context.update({
                 'model': model,
-                'total_gains': total_gains,
-                'total_hours': total_hours,
-                'avg_hours': avg_hours,
-                'recent_gains': recent_gains,
-                'recent_hours': recent_hours,
+                'stats': stats,
+                'total_gains': stats['totals']['gain_cop'],
+                'total_hours': stats['totals']['hours'],
+                'avg_hours': stats['averages']['hours_per_session'],
+                'recent_sessions': stats['recent_sessions'],
+                'quincena': stats['quincena'],
                 'schedule_assignments': schedule_assignments,
             })
             
@@ -428,41 +419,87 @@ def dashboard_view(request):
     return render(request, 'accounts/dashboard.html', context)
 
 
+@login_required
+def dashboard_stats_api(request):
+    """
+    API JSON légère des statistiques personnelles du modèle connecté (suivi mobile).
+    Accepte les mêmes paramètres period_start / period_end que le tableau de bord.
+    """
+    if not request.user.is_modele():
+        return JsonResponse({'success': False, 'error': 'Solo disponible para modelos'}, status=403)
+    
+    try:
+        model = Model.objects.get(user=request.user)
+    except Model.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Perfil de modelo no encontrado'}, status=404)
+    
+    period_start, period_end = _get_period_from_request(request)
+    stats = get_model_personal_stats(model, period_start, period_end)
+    return JsonResponse({'success': True, 'model_id': model.id, **stats})
+
+
 # ==================== USER MANAGEMENT ====================
 
 @login_required
 @general_manager_required
 def user_list(request):
-    """Liste des utilisateurs (seulement pour superuser et general_manager)"""
-    users = User.objects.all().select_related('role', 'agency').order_by('-date_joined')
+    """
+    Liste paginée des utilisateurs (seulement pour superuser et general_manager)
+    
+    Les compteurs portent sur les filtres de rôle et d'agence et sont calculés par un seul
+    agrégat conditionnel, qui donne aussi le nombre de lignes de la pagination.
+    """
+    users = User.objects.all()
     
     # Filtres
-    role_filter = request.GET.get('role')
-    agency_filter = request.GET.get('agency')
-    is_active_filter = request.GET.get('is_active')
+    role_filter = request.GET.get('role', '')
+    agency_filter = request.GET.get('agency', '')
+    is_active_filter = request.GET.get('is_active', '')
     
     if role_filter:
         users = users.filter(role__name=role_filter)
     
-    if agency_filter:
+    if agency_filter.isdigit():
         users = users.filter(agency_id=agency_filter)
+    else:
+        agency_filter = ''
+    
+    # Statistiques (selon les filtres de rôle et d'agence)
+    counts = users.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_active=True)),
+    )
+    total_users = counts['total']
+    active_users = counts['active']
+    inactive_users = total_users - active_users
     
     if is_active_filter == 'true':
         users = users.filter(is_active=True)
+        users_count = active_users
     elif is_active_filter == 'false':
         users = users.filter(is_active=False)
+        users_count = inactive_users
+    else:
+        is_active_filter = ''
+        users_count = total_users
+    
+    paginator = Paginator(users.select_related('role', 'agency').order_by('-date_joined', '-id'), USER_LIST_PAGE_SIZE)
+    # Le nombre de lignes est déjà connu par l'agrégat conditionnel
+    paginator.count = users_count
+    page = paginator.get_page(request.GET.get('page'))
     
-    # Statistiques
-    total_users = User.objects.count()
-    active_users = User.objects.filter(is_active=True).count()
-    inactive_users = User.objects.filter(is_active=False).count()
+    # Paramètres conservés dans les liens de pagination
+    filters = request.GET.copy()
+    filters.pop('page', None)
     
     # Rôles et agences pour les filtres
-    roles = Role.objects.all()
-    agencies = Agency.objects.all()
+    roles = get_roles()
+    agencies = get_agencies()
     
     context = {
-        'users': users,
+        'users': page.object_list,
+        'page_obj': page,
+        'filters_query': filters.urlencode(),
         'roles': roles,
         'agencies': agencies,
         'total_users': total_users,
@@ -528,8 +565,8 @@ def user_create(request):
             except Exception as e:
                 messages.error(request, _('Error al crear el usuario: {}').format(str(e)))
     
-    roles = Role.objects.all()
-    agencies = Agency.objects.all()
+    roles = get_roles()
+    agencies = get_agencies()
     
     context = {
         'roles': roles,
@@ -601,8 +638,8 @@ def user_update(request, user_id):
             except Exception as e:
                 messages.error(request, _('Error al actualizar el usuario: {}').format(str(e)))
     
-    roles = Role.objects.all()
-    agencies = Agency.objects.all()
+    roles = get_roles()
+    agencies = get_agencies()
     
     context = {
         'target_user': target_user,
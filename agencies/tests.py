@@ -1,3 +1,66 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import Role
+from models_app.models import Model
+from .models import Agency
 
-# Create your tests here.
+User = get_user_model()
+
+
+class AgencyDetailTest(TestCase):
+    """Tests du détail d'une agence (compteurs conditionnels et liste paginée)"""
+
+    def setUp(self):
+        """Créer une agence avec 30 modèles actifs, un modèle inactif et un modèle retiré"""
+        self.client = Client()
+        gm_role = Role.objects.create(name=Role.RoleType.GENERAL_MANAGER)
+        User.objects.create_user(username="general", password="test123", role=gm_role)
+        self.client.login(username="general", password="test123")
+        self.agency = Agency.objects.create(name="Agencia Test", code="AGT001")
+        today = timezone.now().date()
+        Model.objects.bulk_create([
+            Model(first_name=f"Modelo{i:02d}", last_name="Test", agency=self.agency, fecha_ingreso=date(2025, 1, 1))
+            for i in range(30)
+        ])
+        Model.objects.create(
+            first_name="Ina", last_name="Activa", agency=self.agency, fecha_ingreso=date(2025, 1, 1),
+            status=Model.Status.INACTIVE,
+        )
+        Model.objects.create(
+            first_name="Rita", last_name="Retirada", agency=self.agency, fecha_ingreso=date(2025, 1, 1),
+            fecha_retiro=today - timedelta(days=1),
+        )
+
+    def test_counts_and_pagination(self):
+        """Les compteurs proviennent d'un seul agrégat et les onglets filtrent par l'indicateur annoté"""
+        url = reverse('agencies:detail', args=[self.agency.id])
+        response = self.client.get(url)
+        self.assertEqual(
+            (response.context['models_count'], response.context['active_models_count'], response.context['inactive_models_count']),
+            (32, 30, 2),
+        )
+        self.assertEqual(len(response.context['models']), 25)
+        self.assertEqual(response.context['page_obj'].paginator.num_pages, 2)
+
+        response = self.client.get(url, {'status': 'inactive'})
+        self.assertEqual(
+            sorted(model.first_name for model in response.context['models']), ["Ina", "Rita"]
+        )
+        self.assertFalse(any(model.is_active_now for model in response.context['models']))
+
+    def test_query_count_does_not_depend_on_agency_size(self):
+        """Le nombre de requêtes est le même pour une page pleine et une page partielle"""
+        url = reverse('agencies:detail', args=[self.agency.id])
+        self.client.get(url)
+        with self.assertNumQueries(self._count_queries(url, {'status': 'inactive'})):
+            self.client.get(url, {'status': 'active', 'page': 2})
+
+    def _count_queries(self, url, params):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url, params)
+        return len(ctx.captured_queries)
@@ -2,12 +2,16 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Q
+from django.core.paginator import Paginator
+from django.db.models import BooleanField, Count, ExpressionWrapper, Q
 from .models import Agency
-from models_app.models import Model
+from models_app.models import Model, active_by_dates_q
 from accounts.decorators import general_manager_required, regional_manager_required
 from accounts.utils import filter_by_agency_queryset
 
+# Modèles affichés par page dans le détail d'une agence
+AGENCY_MODELS_PAGE_SIZE = 25
+
 
 @login_required
 def agency_list(request):
@@ -50,21 +54,41 @@ def agency_detail(request, agency_id):
         messages.error(request, _('No tiene acceso a esta agencia.'))
         return redirect('agencies:list')
     
-    # Récupérer les modèles de l'agence
-    models = Model.objects.filter(agency=agency).order_by('-created_at')
-    # Modèles actifs selon les dates d'entrée et de sortie
-    active_models = Model.active_by_dates.filter(agency=agency).order_by('-created_at')
-    # Modèles inactifs (statut INACTIVE ou dates hors période)
-    inactive_models = models.exclude(id__in=active_models.values_list('id', flat=True))
+    # Un seul parcours des modèles : indicateur « actif selon les dates » annoté
+    is_active = active_by_dates_q()
+    models = Model.scoped.for_agency(agency).annotate(
+        is_active_now=ExpressionWrapper(is_active, output_field=BooleanField())
+    )
+    counts = models.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=is_active),
+    )
+    
+    # Onglet affiché : tous, actifs ou inactifs (filtre sur l'annotation, sans sous-requête)
+    selected_status = request.GET.get('status', 'all')
+    if selected_status == 'active':
+        models = models.filter(is_active_now=True)
+    elif selected_status == 'inactive':
+        models = models.filter(is_active_now=False)
+    else:
+        selected_status = 'all'
+    paginator = Paginator(models.order_by('-created_at', '-id'), AGENCY_MODELS_PAGE_SIZE)
+    # Le nombre de lignes de l'onglet est déjà connu par l'agrégat conditionnel
+    paginator.count = {
+        'all': counts['total'],
+        'active': counts['active'],
+        'inactive': counts['total'] - counts['active'],
+    }[selected_status]
+    page = paginator.get_page(request.GET.get('page'))
     
     context = {
         'agency': agency,
-        'models': models,
-        'active_models': active_models,
-        'inactive_models': inactive_models,
-        'models_count': models.count(),
-        'active_models_count': active_models.count(),
-        'inactive_models_count': inactive_models.count(),
+        'models': page.object_list,
+        'page_obj': page,
+        'selected_status': selected_status,
+        'models_count': counts['total'],
+        'active_models_count': counts['active'],
+        'inactive_models_count': counts['total'] - counts['active'],
     }
     return render(request, 'agencies/detail.html', context)
 
@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     "models_app",
     "financial",
     "reports",
+    "jobs",
 ]
 
 MIDDLEWARE = [
@@ -143,6 +144,13 @@ USE_L10N = True
 # Modèle utilisateur personnalisé
 AUTH_USER_MODEL = "accounts.User"
 
+# Le backend du projet charge rôle, agence et profil avec l'utilisateur ; ModelBackend
+# reste déclaré pour les sessions ouvertes avant son introduction
+AUTHENTICATION_BACKENDS = [
+    "accounts.backends.UserBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
@@ -152,4 +160,16 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 
 # Media files
 MEDIA_URL = "media/"
-MEDIA_ROOT = BASE_DIR / "media"
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / "media"
+
+# Fichiers privés (relevés, rapports, imports) : hors de MEDIA_ROOT, jamais publiés par
+# le serveur web, servis uniquement par les vues authentifiées
+PRIVATE_ROOT = BASE_DIR / "private"
+
+# Cache (P&L, données de référence) : mémoire locale en développement, partagé entre
+# processus en production (voir settings_production)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
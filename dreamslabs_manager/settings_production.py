@@ -31,6 +31,7 @@ INSTALLED_APPS = [
     "models_app",
     "financial",
     "reports",
+    "jobs",
 ]
 
 MIDDLEWARE = [
@@ -119,6 +120,11 @@ USE_L10N = True
 # Modèle utilisateur personnalisé
 AUTH_USER_MODEL = "accounts.User"
 
+AUTHENTICATION_BACKENDS = [
+    "accounts.backends.UserBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
+
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = "static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
@@ -128,6 +134,45 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Fichiers privés : ne pas publier ce répertoire dans nginx (voir accounts/storage.py)
+PRIVATE_ROOT = Path(config('PRIVATE_ROOT', default=str(BASE_DIR / 'private')))
+
+# Cache partagé entre les workers gunicorn et le worker des tâches : les invalidations
+# (versions des P&L et des données de référence) doivent être vues par tous les processus.
+# Redis si REDIS_URL est défini (paquet redis requis), sinon fichiers locaux au serveur.
+# L'alias "sessions" porte le cache des sessions (backend cached_db).
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        },
+        "sessions": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "sessions",
+        },
+    }
+else:
+    CACHE_DIR = Path(config('CACHE_DIR', default=str(BASE_DIR / 'cache')))
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": str(CACHE_DIR / 'default'),
+        },
+        "sessions": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": str(CACHE_DIR / 'sessions'),
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        },
+    }
+
+# Sessions lues depuis le cache, écrites en base et dans le cache ; les sessions expirées
+# sont supprimées de la base par le worker des tâches (voir jobs run_worker)
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
+SESSION_CACHE_ALIAS = "sessions"
+
 # Security settings for production
 SECURE_SSL_REDIRECT = config('SECURE_SSL_REDIRECT', default=False, cast=bool)
 SESSION_COOKIE_SECURE = config('SESSION_COOKIE_SECURE', default=False, cast=bool)
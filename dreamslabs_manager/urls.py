@@ -26,4 +26,6 @@ urlpatterns = [
     path("agencies/", include('agencies.urls')),
     path("models/", include('models_app.urls')),
     path("financial/", include('financial.urls')),
+    path("reports/", include('reports.urls')),
+    path("jobs/", include('jobs.urls')),
 ]
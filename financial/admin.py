@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
-from .models import ExpenseCategory, Expense, Employee, Salary, RevenueSource, Revenue
+from .models import ExpenseCategory, Expense, Employee, Salary, RevenueSource, Revenue, PayrollRun, PayrollLine
 
 
 @admin.register(ExpenseCategory)
@@ -119,3 +119,35 @@ class RevenueAdmin(admin.ModelAdmin):
         if not change:
             obj.created_by = request.user
         super().save_model(request, obj, form, change)
+
+
+class PayrollLineInline(admin.TabularInline):
+    model = PayrollLine
+    extra = 0
+    can_delete = False
+    fields = ['model_name', 'cedula', 'sessions_count', 'gross_cop', 'model_share', 'penalties', 'bonuses', 'net_payout']
+    readonly_fields = fields
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PayrollRun)
+class PayrollRunAdmin(admin.ModelAdmin):
+    list_display = ['agency', 'period_start', 'period_end', 'lines_count', 'net_payout', 'created_by', 'created_at']
+    list_filter = ['agency', 'period_start']
+    date_hierarchy = 'period_start'
+    inlines = [PayrollLineInline]
+    
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if request.user.is_regional_manager() and request.user.agency:
+            return qs.filter(agency=request.user.agency)
+        return qs
+    
+    # Les liquidations sont figées : création et correction passent par l'interface de liquidation
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,68 @@
+"""
+Analyse par catégorie / source, mois et agence des listes financières.
+
+Une seule requête GROUP BY (référence, mois, agence) est exécutée sur le queryset filtré ;
+les ventilations par référence, par mois et par agence sont des cumuls en mémoire de ce
+résultat, dont la taille est bornée par le nombre de combinaisons (et non de lignes).
+"""
+from decimal import Decimal
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def _rollup(cells, key):
+    """Cumule les cellules selon une clé et trie par total décroissant"""
+    totals = {}
+    for cell in cells:
+        entry = totals.setdefault(cell[key], {key: cell[key], 'total': Decimal('0.00'), 'count': 0})
+        entry['total'] += cell['total']
+        entry['count'] += cell['count']
+    return sorted(totals.values(), key=lambda entry: entry['total'], reverse=True)
+
+
+def get_breakdown(queryset, group_field, date_field='date', amount_field='amount'):
+    """
+    Ventile un queryset financier par référence (catégorie ou source), mois et agence.
+
+    Args:
+        queryset: Queryset déjà filtré (agence, dates, référence)
+        group_field (str): 'category' ou 'source'
+        date_field (str): Champ date
+        amount_field (str): Champ montant
+
+    Returns:
+        dict: {'total', 'count', 'cells', 'by_group', 'by_month', 'by_agency'}
+              où chaque cellule est {'group', 'month', 'agency', 'total', 'count'} et chaque
+              entrée des ventilations porte aussi son 'percentage' du total
+    """
+    rows = (
+        queryset.order_by()
+        .annotate(month=TruncMonth(date_field))
+        .values('month', f'{group_field}__name', 'agency__name')
+        .annotate(total=Sum(amount_field), count=Count('id'))
+        .order_by('month', f'{group_field}__name', 'agency__name')
+    )
+    cells = [
+        {
+            'group': row[f'{group_field}__name'],
+            'month': row['month'].strftime('%Y-%m'),
+            'agency': row['agency__name'],
+            'total': (row['total'] or Decimal('0.00')).quantize(Decimal('0.01')),
+            'count': row['count'],
+        }
+        for row in rows
+    ]
+
+    total = sum((cell['total'] for cell in cells), Decimal('0.00'))
+    breakdown = {
+        'total': total,
+        'count': sum(cell['count'] for cell in cells),
+        'cells': cells,
+        'by_group': _rollup(cells, 'group'),
+        'by_month': sorted(_rollup(cells, 'month'), key=lambda entry: entry['month']),
+        'by_agency': _rollup(cells, 'agency'),
+    }
+    for key in ('by_group', 'by_month', 'by_agency'):
+        for entry in breakdown[key]:
+            entry['percentage'] = round(entry['total'] * 100 / total, 1) if total else Decimal('0.0')
+    return breakdown
@@ -0,0 +1,186 @@
+"""
+Exports en flux (CSV et XLSX) des listes financières.
+
+Les lignes sont produites une à une depuis un itérateur de base de données et écrites
+immédiatement dans la réponse : la mémoire utilisée ne dépend pas du nombre de lignes.
+Le format XLSX est écrit avec la bibliothèque standard (zipfile) en chaînes inline,
+sans dépendance externe.
+"""
+import csv
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+from django.http import StreamingHttpResponse
+
+CSV_CONTENT_TYPE = 'text/csv; charset=utf-8'
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Nombre de lignes lues par aller-retour avec la base de données
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """Pseudo-fichier dont write() retourne la valeur écrite (pour csv.writer)"""
+
+    def write(self, value):
+        return value
+
+
+class _ChunkBuffer:
+    """Pseudo-fichier non positionnable qui accumule les octets écrits jusqu'à leur lecture"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _format_value(value):
+    """Représentation texte d'une valeur exportée"""
+    if value is None:
+        return ''
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+# Premiers caractères qu'un tableur interprète comme une formule (injection CSV)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_value(value):
+    """
+    Valeur d'une cellule CSV ; un texte qui commence comme une formule est préfixé par «'».
+
+    Les nombres ne sont pas concernés (un montant négatif reste un nombre).
+    """
+    text = _format_value(value)
+    if isinstance(value, str) and text.startswith(FORMULA_PREFIXES):
+        return "'" + text
+    return text
+
+
+def stream_csv(header, rows):
+    """
+    Génère un CSV ligne par ligne (avec BOM UTF-8 pour l'ouverture dans Excel).
+
+    Args:
+        header (list): Noms des colonnes
+        rows: Itérable de tuples
+    """
+    writer = csv.writer(Echo())
+    yield '\ufeff' + writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(_format_value(value))}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def stream_xlsx(header, rows, sheet_name='Datos'):
+    """
+    Génère un classeur XLSX d'une feuille, par morceaux d'octets.
+
+    Args:
+        header (list): Noms des colonnes
+        rows: Itérable de tuples
+        sheet_name (str): Nom de la feuille
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(sheet_name[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        yield buffer.pop()
+
+        with archive.open('xl/worksheets/sheet1.xml', mode='w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _xlsx_row(header)
+            ).encode('utf-8'))
+            for row in rows:
+                sheet.write(_xlsx_row(row).encode('utf-8'))
+                data = buffer.pop()
+                if data:
+                    yield data
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.pop()
+
+
+def export_response(export_format, filename, header, rows, sheet_name='Datos'):
+    """
+    Construit une réponse en flux pour un export CSV ou XLSX.
+
+    Args:
+        export_format (str): 'csv' ou 'xlsx'
+        filename (str): Nom du fichier sans extension
+        header (list): Noms des colonnes
+        rows: Itérable de tuples (idéalement un queryset.iterator())
+        sheet_name (str): Nom de la feuille (XLSX)
+
+    Returns:
+        StreamingHttpResponse
+    """
+    if export_format == 'xlsx':
+        response = StreamingHttpResponse(stream_xlsx(header, rows, sheet_name), content_type=XLSX_CONTENT_TYPE)
+        response['Content-Disposition'] = f'attachment; filename="{filename}.xlsx"'
+    else:
+        response = StreamingHttpResponse(stream_csv(header, rows), content_type=CSV_CONTENT_TYPE)
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
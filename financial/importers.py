@@ -0,0 +1,140 @@
+"""
+Import groupé de dépenses et de revenus depuis un fichier CSV.
+
+Les catégories, sources et agences sont chargées une seule fois en mémoire ; chaque
+ligne est validée contre ces index, puis les lignes valides sont insérées par lots
+(bulk_create) dans une transaction. Les lignes invalides sont retournées dans un
+rapport d'erreurs par ligne.
+"""
+import csv
+from functools import partial
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+
+from agencies.models import Agency
+from reports.signals import ledger_bulk_changed
+from .models import Expense, ExpenseCategory, Revenue, RevenueSource
+
+# Configuration par type d'import : modèle, modèle de référence et colonne de référence
+LEDGER_KINDS = {
+    'expense': {'model': Expense, 'lookup_model': ExpenseCategory, 'column': 'category'},
+    'revenue': {'model': Revenue, 'lookup_model': RevenueSource, 'column': 'source'},
+}
+
+ERROR_REPORT_HEADER = ['line', 'errors']
+
+# Montant maximal des colonnes amount (max_digits=10, decimal_places=2)
+MAX_AMOUNT = Decimal('99999999.99')
+
+
+def _build_lookup(queryset, *fields):
+    """Index {valeur normalisée: id} sur l'id et les champs texte donnés"""
+    lookup = {}
+    for values in queryset.values_list('id', *fields):
+        lookup[str(values[0])] = values[0]
+        for value in values[1:]:
+            if value:
+                lookup[value.strip().lower()] = values[0]
+    return lookup
+
+
+def validate_row(row, lookups, column, agency=None):
+    """
+    Valide une ligne d'import.
+
+    Args:
+        row (dict): Ligne du CSV
+        lookups (dict): {'agency': index des agences, column: index des catégories/sources}
+        column (str): 'category' ou 'source'
+        agency (Agency, optional): Agence imposée (Regional Manager)
+
+    Returns:
+        tuple: (dict des valeurs nettoyées, liste des erreurs)
+    """
+    errors = []
+    cleaned = {'description': (row.get('description') or '').strip()}
+
+    try:
+        cleaned['date'] = datetime.strptime((row.get('date') or '').strip(), '%Y-%m-%d').date()
+    except ValueError:
+        errors.append('Fecha inválida')
+
+    try:
+        amount = Decimal((row.get('amount') or '').strip().replace(',', '.'))
+        if amount < 0:
+            errors.append('El monto debe ser positivo')
+        elif amount > MAX_AMOUNT:
+            errors.append('Monto inválido')
+        else:
+            cleaned['amount'] = amount.quantize(Decimal('0.01'))
+    except InvalidOperation:
+        errors.append('Monto inválido')
+
+    reference_id = lookups[column].get((row.get(column) or '').strip().lower())
+    if reference_id is None:
+        errors.append('Categoría no encontrada' if column == 'category' else 'Fuente no encontrada')
+    cleaned[f'{column}_id'] = reference_id
+
+    agency_value = (row.get('agency') or '').strip().lower()
+    if agency is not None:
+        if agency_value and lookups['agency'].get(agency_value) != agency.id:
+            errors.append('Agencia no permitida')
+        cleaned['agency_id'] = agency.id
+    else:
+        cleaned['agency_id'] = lookups['agency'].get(agency_value)
+        if cleaned['agency_id'] is None:
+            errors.append('Agencia no encontrada')
+
+    return cleaned, errors
+
+
+def import_ledger(stream, kind, user, agency=None, batch_size=500):
+    """
+    Importe des dépenses ou des revenus depuis un CSV
+    (date, amount, category|source, [agency], [description]).
+
+    Les lignes valides sont insérées par lots dans une seule transaction ; les lignes
+    invalides sont ignorées et décrites dans le rapport.
+
+    Args:
+        stream: Fichier texte ouvert
+        kind (str): 'expense' ou 'revenue'
+        user: Utilisateur à l'origine de l'import (created_by)
+        agency (Agency, optional): Agence imposée à toutes les lignes
+        batch_size (int): Taille des lots d'insertion
+
+    Returns:
+        dict: {'rows', 'created', 'errors': [{'line', 'errors'}]}
+    """
+    config = LEDGER_KINDS[kind]
+    column = config['column']
+    lookups = {
+        'agency': _build_lookup(Agency.objects.all(), 'code', 'name'),
+        column: _build_lookup(config['lookup_model'].objects.all(), 'name'),
+    }
+    result = {'rows': 0, 'created': 0, 'errors': []}
+
+    batch = []
+    touched = set()
+    with transaction.atomic():
+        reader = csv.DictReader(stream)
+        for row in reader:
+            result['rows'] += 1
+            cleaned, errors = validate_row(row, lookups, column, agency)
+            if errors:
+                result['errors'].append({'line': reader.line_num, 'errors': errors})
+                continue
+            batch.append(config['model'](created_by=user, **cleaned))
+            touched.add((cleaned['agency_id'], cleaned['date']))
+            if len(batch) >= batch_size:
+                config['model'].objects.bulk_create(batch)
+                result['created'] += len(batch)
+                batch = []
+        if batch:
+            config['model'].objects.bulk_create(batch)
+            result['created'] += len(batch)
+        # Après le commit : un P&L lu pendant la transaction ne reconstruit pas un cube périmé
+        transaction.on_commit(partial(ledger_bulk_changed.send, sender=config['model'], items=touched))
+
+    return result
@@ -0,0 +1,46 @@
+import time
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from agencies.models import Agency
+from financial.models import PayrollRun
+from financial.payroll import run_payroll
+from financial.statements import generate_statements
+from models_app.utils import get_quincena_bounds
+
+
+class Command(BaseCommand):
+    help = 'Genera los extractos de pago de todos los modelos de una quincena (HTML + índice)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--agency', help='Código de la agencia (por defecto todas)')
+        parser.add_argument('--date', help='Una fecha de la quincena (AAAA-MM-DD, por defecto hoy)')
+        parser.add_argument('--workers', type=int, default=None, help='Procesos de renderizado (por defecto uno por CPU)')
+
+    def handle(self, *args, **options):
+        agencies = Agency.objects.order_by('name')
+        if options['agency']:
+            agencies = agencies.filter(code=options['agency'])
+            if not agencies.exists():
+                raise CommandError(f"Agencia no encontrada: {options['agency']}")
+
+        try:
+            day = datetime.strptime(options['date'], '%Y-%m-%d').date() if options['date'] else timezone.now().date()
+        except ValueError:
+            raise CommandError(f"Fecha inválida: {options['date']}")
+        period_start, period_end = get_quincena_bounds(day)
+
+        for agency in agencies:
+            started = time.monotonic()
+            # Les relevés reprennent la liquidation en vigueur de la quinzaine, créée au besoin
+            run = PayrollRun.objects.filter(
+                agency=agency, period_start=period_start, period_end=period_end, next_run__isnull=True
+            ).first()
+            if run is None:
+                run = run_payroll(agency, period_start, period_end)
+                self.stdout.write(f'{agency.code}: liquidación #{run.id} creada')
+
+            result = generate_statements(run.id, workers=options['workers'])
+            self.stdout.write(self.style.SUCCESS(
+                f"{agency.code}: {result['count']} extractos en {time.monotonic() - started:.1f}s -> {result['directory']}"
+            ))
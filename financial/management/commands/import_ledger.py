@@ -0,0 +1,47 @@
+import csv
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from agencies.models import Agency
+from financial.importers import ERROR_REPORT_HEADER, LEDGER_KINDS, import_ledger
+
+
+class Command(BaseCommand):
+    help = 'Importa gastos o ingresos desde un archivo CSV (date, amount, category|source, agency, description)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(LEDGER_KINDS), help='Tipo de registros a importar')
+        parser.add_argument('file', help='Archivo CSV con encabezado')
+        parser.add_argument('--agency', help='Código de la agencia asignada a todas las líneas')
+        parser.add_argument('--errors', help='Archivo CSV donde escribir el reporte de errores (por defecto la salida estándar)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Líneas insertadas por lote')
+
+    def handle(self, *args, **options):
+        agency = None
+        if options['agency']:
+            agency = Agency.objects.filter(code=options['agency']).first()
+            if agency is None:
+                raise CommandError(f"Agencia no encontrada: {options['agency']}")
+
+        try:
+            with open(options['file'], newline='', encoding='utf-8-sig') as stream:
+                result = import_ledger(stream, options['kind'], user=None, agency=agency, batch_size=options['batch_size'])
+        except OSError as e:
+            raise CommandError(str(e))
+
+        if result['errors']:
+            errors_file = open(options['errors'], 'w', newline='', encoding='utf-8') if options['errors'] else sys.stdout
+            try:
+                writer = csv.writer(errors_file)
+                writer.writerow(ERROR_REPORT_HEADER)
+                for error in result['errors']:
+                    writer.writerow([error['line'], '; '.join(error['errors'])])
+            finally:
+                if errors_file is not sys.stdout:
+                    errors_file.close()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n{result['rows']} línea(s) leída(s): {result['created']} registro(s) creado(s), "
+                f"{len(result['errors'])} con errores"
+            )
+        )
@@ -0,0 +1,268 @@
+# Generated by Django 6.0.1 on 2026-10-19 18:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("agencies", "0008_alter_bonusrule_options_alter_bonusrule_order_and_more"),
+        ("financial", "0001_initial"),
+        ("models_app", "0018_model_referred_by_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PayrollRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "period_start",
+                    models.DateField(verbose_name="Inicio de la quincena"),
+                ),
+                ("period_end", models.DateField(verbose_name="Fin de la quincena")),
+                ("lines_count", models.IntegerField(default=0, verbose_name="Modelos")),
+                (
+                    "gross_cop",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Ganancia bruta (COP)",
+                    ),
+                ),
+                (
+                    "bank_fees",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Impuestos bancarios (COP)",
+                    ),
+                ),
+                (
+                    "model_share",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Ganancia de modelos (COP)",
+                    ),
+                ),
+                (
+                    "penalties",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Multas (COP)",
+                    ),
+                ),
+                (
+                    "bonuses",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Bonos (COP)",
+                    ),
+                ),
+                (
+                    "net_payout",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Pago neto (COP)",
+                    ),
+                ),
+                ("notes", models.TextField(blank=True, verbose_name="Notas")),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Fecha de creación"
+                    ),
+                ),
+                (
+                    "agency",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="payroll_runs",
+                        to="agencies.agency",
+                        verbose_name="Agencia",
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="payroll_runs_created",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Creado por",
+                    ),
+                ),
+                (
+                    "previous_run",
+                    models.OneToOneField(
+                        blank=True,
+                        help_text="Liquidación de la misma quincena reemplazada por esta",
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="next_run",
+                        to="financial.payrollrun",
+                        verbose_name="Liquidación anterior",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Liquidación de Quincena",
+                "verbose_name_plural": "Liquidaciones de Quincena",
+                "ordering": ["-period_start", "-created_at"],
+            },
+        ),
+        migrations.CreateModel(
+            name="PayrollLine",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "model_name",
+                    models.CharField(max_length=255, verbose_name="Nombre del modelo"),
+                ),
+                (
+                    "cedula",
+                    models.CharField(blank=True, max_length=20, verbose_name="Cédula"),
+                ),
+                (
+                    "sessions_count",
+                    models.IntegerField(default=0, verbose_name="Sesiones completadas"),
+                ),
+                (
+                    "worked_hours",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=8,
+                        verbose_name="Horas trabajadas",
+                    ),
+                ),
+                (
+                    "gross_usd",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=12,
+                        verbose_name="Ganancia bruta (USD)",
+                    ),
+                ),
+                (
+                    "gross_cop",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Ganancia bruta (COP)",
+                    ),
+                ),
+                (
+                    "bank_fees",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Impuestos bancarios (COP)",
+                    ),
+                ),
+                (
+                    "model_share",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        help_text="Ganancia del modelo antes de descontar las multas",
+                        max_digits=14,
+                        verbose_name="Ganancia del modelo (COP)",
+                    ),
+                ),
+                (
+                    "penalties",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Multas (COP)",
+                    ),
+                ),
+                (
+                    "bonuses",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Bonos (COP)",
+                    ),
+                ),
+                (
+                    "net_payout",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Pago neto (COP)",
+                    ),
+                ),
+                (
+                    "model",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="payroll_lines",
+                        to="models_app.model",
+                        verbose_name="Modelo",
+                    ),
+                ),
+                (
+                    "run",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lines",
+                        to="financial.payrollrun",
+                        verbose_name="Liquidación",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Línea de Liquidación",
+                "verbose_name_plural": "Líneas de Liquidación",
+                "ordering": ["model_name"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="payrollrun",
+            index=models.Index(
+                fields=["agency", "period_start"], name="financial_p_agency__7f3244_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="payrollline",
+            unique_together={("run", "model")},
+        ),
+    ]
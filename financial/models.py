@@ -3,6 +3,7 @@ from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from django.utils import timezone
+from accounts.tenancy import TenantManager
 
 User = get_user_model()
 
@@ -80,6 +81,9 @@ class Expense(models.Model):
         verbose_name=_('Creado por')
     )
     
+    objects = models.Manager()  # Manager par défaut
+    scoped = TenantManager()  # Manager filtré sur l'agence de la requête
+    
     class Meta:
         verbose_name = _('Gasto')
         verbose_name_plural = _('Gastos')
@@ -203,6 +207,9 @@ class Salary(models.Model):
         verbose_name=_('Creado por')
     )
     
+    objects = models.Manager()  # Manager par défaut
+    scoped = TenantManager()  # Manager filtré sur l'agence de la requête
+    
     class Meta:
         verbose_name = _('Salario')
         verbose_name_plural = _('Salarios')
@@ -289,6 +296,9 @@ class Revenue(models.Model):
         verbose_name=_('Creado por')
     )
     
+    objects = models.Manager()  # Manager par défaut
+    scoped = TenantManager()  # Manager filtré sur l'agence de la requête
+    
     class Meta:
         verbose_name = _('Ingreso')
         verbose_name_plural = _('Ingresos')
@@ -301,3 +311,195 @@ class Revenue(models.Model):
     
     def __str__(self):
         return f"{self.agency.name} - {self.date} - ${self.amount:,.2f} COP - {self.source.name}"
+
+
+class PayrollRun(models.Model):
+    """Liquidation figée des paiements des modèles d'une agence pour une quinzaine"""
+    
+    agency = models.ForeignKey(
+        'agencies.Agency',
+        on_delete=models.PROTECT,
+        related_name='payroll_runs',
+        verbose_name=_('Agencia')
+    )
+    period_start = models.DateField(
+        verbose_name=_('Inicio de la quincena')
+    )
+    period_end = models.DateField(
+        verbose_name=_('Fin de la quincena')
+    )
+    previous_run = models.OneToOneField(
+        'self',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='next_run',
+        verbose_name=_('Liquidación anterior'),
+        help_text=_('Liquidación de la misma quincena reemplazada por esta')
+    )
+    lines_count = models.IntegerField(
+        default=0,
+        verbose_name=_('Modelos')
+    )
+    gross_cop = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Ganancia bruta (COP)')
+    )
+    bank_fees = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Impuestos bancarios (COP)')
+    )
+    model_share = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Ganancia de modelos (COP)')
+    )
+    penalties = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Multas (COP)')
+    )
+    bonuses = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Bonos (COP)')
+    )
+    net_payout = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Pago neto (COP)')
+    )
+    notes = models.TextField(
+        blank=True,
+        verbose_name=_('Notas')
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_('Fecha de creación')
+    )
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='payroll_runs_created',
+        verbose_name=_('Creado por')
+    )
+    
+    class Meta:
+        verbose_name = _('Liquidación de Quincena')
+        verbose_name_plural = _('Liquidaciones de Quincena')
+        ordering = ['-period_start', '-created_at']
+        indexes = [
+            models.Index(fields=['agency', 'period_start']),
+        ]
+    
+    def __str__(self):
+        return f"{self.agency.name} - {self.period_start} / {self.period_end}"
+    
+    def save(self, *args, **kwargs):
+        # Une liquidation est figée : une correction passe par une nouvelle liquidation
+        if not self._state.adding:
+            raise ValueError("Une liquidation enregistrée ne peut pas être modifiée")
+        super().save(*args, **kwargs)
+    
+    @property
+    def is_current(self):
+        """Vrai si la liquidation n'a pas été remplacée par une nouvelle exécution"""
+        return not hasattr(self, 'next_run')
+
+
+class PayrollLine(models.Model):
+    """Paiement figé d'un modèle dans une liquidation"""
+    
+    run = models.ForeignKey(
+        PayrollRun,
+        on_delete=models.CASCADE,
+        related_name='lines',
+        verbose_name=_('Liquidación')
+    )
+    model = models.ForeignKey(
+        'models_app.Model',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='payroll_lines',
+        verbose_name=_('Modelo')
+    )
+    model_name = models.CharField(
+        max_length=255,
+        verbose_name=_('Nombre del modelo')
+    )
+    cedula = models.CharField(
+        max_length=20,
+        blank=True,
+        verbose_name=_('Cédula')
+    )
+    sessions_count = models.IntegerField(
+        default=0,
+        verbose_name=_('Sesiones completadas')
+    )
+    worked_hours = models.DecimalField(
+        max_digits=8,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Horas trabajadas')
+    )
+    gross_usd = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Ganancia bruta (USD)')
+    )
+    gross_cop = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Ganancia bruta (COP)')
+    )
+    bank_fees = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Impuestos bancarios (COP)')
+    )
+    model_share = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Ganancia del modelo (COP)'),
+        help_text=_('Ganancia del modelo antes de descontar las multas')
+    )
+    penalties = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Multas (COP)')
+    )
+    bonuses = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Bonos (COP)')
+    )
+    net_payout = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Pago neto (COP)')
+    )
+    
+    class Meta:
+        verbose_name = _('Línea de Liquidación')
+        verbose_name_plural = _('Líneas de Liquidación')
+        ordering = ['model_name']
+        unique_together = [['run', 'model']]
+    
+    def __str__(self):
+        return f"{self.model_name} - ${self.net_payout:,.2f} COP"
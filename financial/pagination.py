@@ -0,0 +1,114 @@
+"""
+Pagination par curseur (keyset) des listes financières.
+
+Les lignes sont triées par (date, id) décroissants ; le curseur « date:id » désigne la
+dernière (ou première) ligne de la page affichée, de sorte que chaque page est lue par
+une requête bornée, quelle que soit la taille de la table.
+"""
+from datetime import datetime
+from django.db.models import Q, Sum
+
+PAGE_SIZES = [25, 50, 100]
+DEFAULT_PAGE_SIZE = 50
+
+
+def encode_cursor(day, pk):
+    """Encode la position (date, id) d'une ligne"""
+    return f"{day.isoformat()}:{pk}"
+
+
+def decode_cursor(value):
+    """
+    Décode un curseur « date:id ».
+
+    Returns:
+        tuple: (date, id) ou None si le curseur est absent ou invalide
+    """
+    try:
+        day, pk = (value or '').split(':')
+        return datetime.strptime(day, '%Y-%m-%d').date(), int(pk)
+    except ValueError:
+        return None
+
+
+def get_page_size(request):
+    """Taille de page demandée, limitée aux valeurs autorisées"""
+    try:
+        page_size = int(request.GET.get('page_size', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return DEFAULT_PAGE_SIZE
+    return page_size if page_size in PAGE_SIZES else DEFAULT_PAGE_SIZE
+
+
+def keyset_paginate(request, queryset, date_field='date', amount_field='amount'):
+    """
+    Retourne une page d'un queryset filtré, avec les totaux calculés par un seul agrégat.
+
+    Paramètres GET : ``after`` (page suivante), ``before`` (page précédente), ``page_size``.
+
+    Args:
+        request: Requête HTTP
+        queryset: Queryset déjà filtré
+        date_field (str): Champ date du tri
+        amount_field (str): Champ montant des totaux
+
+    Returns:
+        dict: {'object_list', 'page_size', 'page_sizes', 'next_cursor', 'previous_cursor',
+               'total', 'page_total', 'running_total', 'query', 'filters_query'}
+    """
+    page_size = get_page_size(request)
+    after = decode_cursor(request.GET.get('after'))
+    before = decode_cursor(request.GET.get('before')) if not after else None
+
+    if before:
+        # Page précédente : lecture en ordre croissant à partir du curseur puis inversion
+        day, pk = before
+        rows = list(
+            queryset.filter(Q(**{f'{date_field}__gt': day}) | Q(**{date_field: day, 'id__gt': pk}))
+            .order_by(date_field, 'id')[:page_size + 1]
+        )
+        has_more_before = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        has_more_after = True
+    else:
+        page_queryset = queryset.order_by(f'-{date_field}', '-id')
+        if after:
+            day, pk = after
+            page_queryset = page_queryset.filter(
+                Q(**{f'{date_field}__lt': day}) | Q(**{date_field: day, 'id__lt': pk})
+            )
+        rows = list(page_queryset[:page_size + 1])
+        has_more_after = len(rows) > page_size
+        rows = rows[:page_size]
+        has_more_before = after is not None
+
+    # Total général, total de la page et cumul jusqu'à la fin de la page en une requête
+    aggregates = {'total': Sum(amount_field)}
+    if rows:
+        first, last = rows[0], rows[-1]
+        first_day, last_day = getattr(first, date_field), getattr(last, date_field)
+        up_to_last = Q(**{f'{date_field}__gt': last_day}) | Q(**{date_field: last_day, 'id__gte': last.id})
+        before_first = Q(**{f'{date_field}__gt': first_day}) | Q(**{date_field: first_day, 'id__gt': first.id})
+        aggregates['running_total'] = Sum(amount_field, filter=up_to_last)
+        aggregates['page_total'] = Sum(amount_field, filter=up_to_last & ~before_first)
+    totals = queryset.order_by().aggregate(**aggregates)
+
+    # Filtres conservés dans les liens de navigation
+    query = request.GET.copy()
+    for key in ('after', 'before'):
+        query.pop(key, None)
+    filters_query = query.copy()
+    filters_query.pop('page_size', None)
+
+    return {
+        'object_list': rows,
+        'page_size': page_size,
+        'page_sizes': PAGE_SIZES,
+        'next_cursor': encode_cursor(getattr(rows[-1], date_field), rows[-1].id) if rows and has_more_after else None,
+        'previous_cursor': encode_cursor(getattr(rows[0], date_field), rows[0].id) if rows and has_more_before else None,
+        'total': totals['total'] or 0,
+        'page_total': totals.get('page_total') or 0,
+        'running_total': totals.get('running_total') or 0,
+        'query': query.urlencode(),
+        'filters_query': filters_query.urlencode(),
+    }
@@ -0,0 +1,178 @@
+"""
+Liquidation des paiements des modèles par quinzaine.
+
+Pour une agence et une quinzaine, les montants de chaque modèle sont calculés par une
+seule requête GROUP BY sur les sessions, les bonus par le moteur partagé (deux requêtes
+pour toute l'agence) ; la liquidation et ses lignes sont écrites dans une transaction
+(bulk_create) et ne sont plus modifiées ensuite. Une nouvelle exécution sur la même
+quinzaine crée une nouvelle liquidation liée à la précédente, comparée ligne à ligne.
+
+Les exécutions d'une même agence sont sérialisées par un verrou sur la ligne de l'agence
+(SELECT ... FOR UPDATE) : la liquidation précédente est lue une fois le verrou obtenu,
+y compris lors d'une première exécution où aucune liquidation n'existe encore.
+"""
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from agencies.models import Agency
+from models_app.bonuses import compute_bonuses_by_model
+from models_app.models import Model, WorkSession
+from .models import PayrollLine, PayrollRun
+
+# Montants d'une ligne, totalisés sur la liquidation
+PAYROLL_AMOUNT_FIELDS = ['gross_cop', 'bank_fees', 'model_share', 'penalties', 'bonuses', 'net_payout']
+
+# Champs comparés entre deux exécutions
+PAYROLL_DIFF_FIELDS = ['sessions_count', 'gross_usd'] + PAYROLL_AMOUNT_FIELDS
+
+ZERO = Decimal('0.00')
+
+
+def _zero():
+    return Value(ZERO, output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def compute_payroll_lines(agency, period_start, period_end):
+    """
+    Calcule les lignes de paiement de tous les modèles d'une agence pour une période.
+
+    Sont inclus les modèles actifs pendant la période et tous ceux ayant des sessions.
+    La part du modèle est reconstituée avant multas, sur les sessions dont le gain est
+    positif (une session terminée sans gain n'a pas de part) ; le paiement net vaut
+    part du modèle + bonus - multas (y compris les absences).
+
+    Returns:
+        list: PayrollLine non enregistrées (sans liquidation)
+    """
+    sessions = WorkSession.scoped.for_agency(agency).filter(date__gte=period_start, date__lte=period_end)
+    completed = Q(status=WorkSession.Status.COMPLETED)
+    # Sans gain (montant nul ou absent), la part avant multas est nulle : la multa déjà
+    # déduite de session_model_ganancia n'y est pas rajoutée
+    with_gain = completed & Q(session_gain_amount__gt=0)
+    penalty = Coalesce(F('late_penalty_amount'), _zero()) + Coalesce(F('absence_penalty_amount'), _zero())
+    totals = {
+        row['model_id']: row
+        for row in sessions.order_by().values('model_id').annotate(
+            sessions_count=Count('id', filter=completed),
+            worked_hours=Sum('total_worked_hours', filter=completed),
+            gross_usd=Sum('session_gain_amount_usd', filter=completed),
+            gross_cop=Sum('session_gain_amount', filter=completed),
+            bank_fees=Sum('session_bank_fees', filter=completed),
+            # session_model_ganancia est déjà net des multas de la session
+            model_share=Sum(Coalesce(F('session_model_ganancia'), _zero()) + penalty, filter=with_gain),
+            penalties=Sum(penalty),
+        )
+    }
+    bonuses = compute_bonuses_by_model(period_start, period_end, [agency.id])
+
+    models = (
+        Model.scoped.for_agency(agency)
+        .filter(
+            Q(id__in=list(totals))
+            | (
+                Q(status=Model.Status.ACTIVE, fecha_ingreso__lte=period_end)
+                & (Q(fecha_retiro__isnull=True) | Q(fecha_retiro__gte=period_start))
+            )
+        )
+        .only('id', 'first_name', 'last_name', 'cedula')
+        .order_by('first_name', 'last_name')
+    )
+
+    lines = []
+    for model in models:
+        row = totals.get(model.id, {})
+        line = PayrollLine(
+            model=model,
+            model_name=model.full_name,
+            cedula=model.cedula or '',
+            sessions_count=row.get('sessions_count', 0),
+            worked_hours=(row.get('worked_hours') or ZERO).quantize(Decimal('0.01')),
+            gross_usd=(row.get('gross_usd') or ZERO).quantize(Decimal('0.01')),
+            bonuses=bonuses.get((agency.id, model.id), ZERO).quantize(Decimal('0.01')),
+        )
+        for field in ('gross_cop', 'bank_fees', 'model_share', 'penalties'):
+            setattr(line, field, (row.get(field) or ZERO).quantize(Decimal('0.01')))
+        line.net_payout = line.model_share + line.bonuses - line.penalties
+        lines.append(line)
+    return lines
+
+
+def run_payroll(agency, period_start, period_end, user=None, notes=''):
+    """
+    Exécute et fige la liquidation d'une quinzaine.
+
+    L'agence est verrouillée pendant l'exécution : une exécution concurrente attend la fin
+    de celle-ci, puis prend la nouvelle liquidation comme liquidation précédente.
+
+    Returns:
+        PayrollRun
+
+    Raises:
+        IntegrityError: Si une autre exécution a remplacé la même liquidation (bases sans
+                        SELECT ... FOR UPDATE)
+    """
+    with transaction.atomic():
+        Agency.objects.select_for_update().only('id').get(pk=agency.pk)
+        previous_run = PayrollRun.objects.filter(
+            agency=agency, period_start=period_start, period_end=period_end, next_run__isnull=True
+        ).first()
+        lines = compute_payroll_lines(agency, period_start, period_end)
+        run = PayrollRun(
+            agency=agency,
+            period_start=period_start,
+            period_end=period_end,
+            previous_run=previous_run,
+            lines_count=len(lines),
+            created_by=user,
+            notes=notes,
+            **{
+                field: sum((getattr(line, field) for line in lines), ZERO)
+                for field in PAYROLL_AMOUNT_FIELDS
+            },
+        )
+        run.save()
+        for line in lines:
+            line.run = run
+        PayrollLine.objects.bulk_create(lines, batch_size=500)
+    return run
+
+
+def diff_runs(run):
+    """
+    Compare une liquidation à la précédente de la même quinzaine.
+
+    Returns:
+        list: [{'model_name', 'change': 'added'|'removed'|'changed',
+                'fields': [{'field', 'old', 'new', 'delta'}]}] (vide sans liquidation précédente)
+    """
+    if run.previous_run_id is None:
+        return []
+    fields = ['model_id', 'model_name'] + PAYROLL_DIFF_FIELDS
+    current = {line['model_id']: line for line in run.lines.values(*fields)}
+    previous = {line['model_id']: line for line in run.previous_run.lines.values(*fields)}
+
+    def sort_key(model_id):
+        return (current.get(model_id) or previous[model_id])['model_name']
+
+    changes = []
+    for model_id in sorted(current.keys() | previous.keys(), key=sort_key):
+        old, new = previous.get(model_id), current.get(model_id)
+        if old is None:
+            changes.append({'model_name': new['model_name'], 'change': 'added', 'fields': [
+                {'field': 'net_payout', 'old': None, 'new': new['net_payout'], 'delta': new['net_payout']},
+            ]})
+        elif new is None:
+            changes.append({'model_name': old['model_name'], 'change': 'removed', 'fields': [
+                {'field': 'net_payout', 'old': old['net_payout'], 'new': None, 'delta': -old['net_payout']},
+            ]})
+        else:
+            changed_fields = [
+                {'field': field, 'old': old[field], 'new': new[field], 'delta': new[field] - old[field]}
+                for field in PAYROLL_DIFF_FIELDS
+                if old[field] != new[field]
+            ]
+            if changed_fields:
+                changes.append({'model_name': new['model_name'], 'change': 'changed', 'fields': changed_fields})
+    return changes
@@ -0,0 +1,154 @@
+"""
+Relevés de paiement (extractos) des modèles pour une liquidation de quinzaine.
+
+Les données sont chargées en une requête par table (liquidation et agence, lignes,
+sessions) puis regroupées par modèle en mémoire. Le rendu HTML de chaque relevé est
+réparti sur un pool de processus ; chaque processus écrit ses fichiers directement dans
+PRIVATE_ROOT/statements/run_<id>/ et le processus principal écrit l'index.
+
+Les relevés contiennent la cédula et le paiement de chaque modèle : ils sont écrits hors
+de MEDIA_ROOT (publié par le serveur web) et servis uniquement par la vue
+payroll_statement, après vérification du rôle et de l'agence.
+"""
+import os
+import shutil
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from models_app.models import WorkSession
+from .models import PayrollRun
+
+STATEMENTS_DIR = 'statements'
+INDEX_FILENAME = 'index.html'
+
+# En dessous de ce nombre de relevés, le démarrage du pool coûte plus que le rendu
+MIN_PARALLEL_STATEMENTS = 20
+
+LINE_FIELDS = [
+    'model_id', 'model_name', 'cedula', 'sessions_count', 'worked_hours', 'gross_usd', 'gross_cop',
+    'bank_fees', 'model_share', 'penalties', 'bonuses', 'net_payout',
+]
+
+SESSION_FIELDS = [
+    'model_id', 'date', 'status', 'total_worked_hours', 'session_gain_amount_usd', 'session_gain_amount',
+    'late_penalty_amount', 'absence_penalty_amount',
+]
+
+
+def statements_path(run_id):
+    """Répertoire (privé) des relevés d'une liquidation"""
+    return Path(settings.PRIVATE_ROOT) / STATEMENTS_DIR / f'run_{run_id}'
+
+
+def statement_filename(model_id):
+    return f'modelo_{model_id}.html'
+
+
+def load_statement_data(run_id):
+    """
+    Charge en bloc les données des relevés d'une liquidation (trois requêtes).
+
+    Returns:
+        tuple: (PayrollRun avec son agence, liste des contextes de rendu par modèle)
+    """
+    run = PayrollRun.objects.select_related('agency').get(id=run_id)
+    lines = list(run.lines.order_by('model_name').values(*LINE_FIELDS))
+
+    status_labels = dict(WorkSession.Status.choices)
+    sessions_by_model = defaultdict(list)
+    sessions = (
+        WorkSession.objects.filter(
+            model_id__in=[line['model_id'] for line in lines if line['model_id']],
+            date__gte=run.period_start,
+            date__lte=run.period_end,
+        )
+        .order_by('date', 'id')
+        .values(*SESSION_FIELDS)
+    )
+    for session in sessions:
+        session['status_display'] = str(status_labels.get(session['status'], session['status']))
+        session['penalty'] = (session['late_penalty_amount'] or Decimal('0.00')) + (
+            session['absence_penalty_amount'] or Decimal('0.00')
+        )
+        sessions_by_model[session['model_id']].append(session)
+
+    # Contextes sérialisables (envoyés aux processus du pool)
+    agency = {'name': run.agency.name, 'code': run.agency.code}
+    generated_at = timezone.now()
+    payloads = [
+        {
+            'filename': statement_filename(line['model_id'] or f'linea_{index}'),
+            'context': {
+                'run': {'id': run.id, 'period_start': run.period_start, 'period_end': run.period_end},
+                'agency': agency,
+                'line': line,
+                'sessions': sessions_by_model.get(line['model_id'], []),
+                'generated_at': generated_at,
+            },
+        }
+        for index, line in enumerate(lines)
+    ]
+    return run, payloads
+
+
+def _init_worker():
+    """Initialisation d'un processus du pool (nécessaire hors fork)"""
+    django.setup()
+
+
+def _render_statement(directory, payload):
+    """Rend un relevé et l'écrit dans le répertoire de la liquidation"""
+    html = render_to_string('financial/statement.html', payload['context'])
+    (Path(directory) / payload['filename']).write_text(html, encoding='utf-8')
+    return payload['filename']
+
+
+def generate_statements(run_id, workers=None):
+    """
+    Génère les relevés HTML de tous les modèles d'une liquidation et leur index.
+
+    Les fichiers d'une génération précédente de la même liquidation sont remplacés.
+
+    Args:
+        run_id (int): Liquidation
+        workers (int, optional): Nombre de processus (par défaut un par CPU, au plus 8) ;
+                                 1 rend tout dans le processus courant
+
+    Returns:
+        dict: {'run_id', 'count', 'directory'}
+    """
+    run, payloads = load_statement_data(run_id)
+    directory = statements_path(run.id)
+    shutil.rmtree(directory, ignore_errors=True)
+    directory.mkdir(parents=True)
+
+    if workers is None:
+        workers = min(os.cpu_count() or 1, 8)
+    if workers <= 1 or len(payloads) < MIN_PARALLEL_STATEMENTS:
+        filenames = [_render_statement(directory, payload) for payload in payloads]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            filenames = list(executor.map(
+                _render_statement,
+                [str(directory)] * len(payloads),
+                payloads,
+                chunksize=max(1, len(payloads) // (workers * 4)),
+            ))
+
+    index = render_to_string('financial/statement_index.html', {
+        'run': run,
+        'statements': [
+            {'filename': filename, 'line': payload['context']['line']}
+            for filename, payload in zip(filenames, payloads)
+        ],
+        'generated_at': timezone.now(),
+    })
+    (directory / INDEX_FILENAME).write_text(index, encoding='utf-8')
+    return {'run_id': run.id, 'count': len(filenames), 'directory': str(directory)}
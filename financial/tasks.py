@@ -0,0 +1,21 @@
+"""
+Tâches exécutées en segundo plano par le worker (voir jobs.queue).
+"""
+from django.urls import reverse
+
+from .statements import generate_statements
+
+
+def generate_payroll_statements(run_id, workers=None):
+    """
+    Génère les relevés de paiement d'une liquidation.
+
+    Returns:
+        dict: {'run_id', 'count', 'url'} (url de l'index des relevés)
+    """
+    result = generate_statements(run_id, workers=workers)
+    return {
+        'run_id': result['run_id'],
+        'count': result['count'],
+        'url': reverse('financial:payroll_statement', args=[run_id, 'index.html']),
+    }
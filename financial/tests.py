@@ -1,3 +1,377 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import zipfile
+from datetime import date, time, timedelta
+from decimal import Decimal
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from accounts.models import Role
+from agencies.models import Agency, BonusRule
+from models_app.models import Model, Schedule, ScheduleAssignment, WorkSession
+from .analytics import get_breakdown
+from .models import Expense, ExpenseCategory, Revenue, RevenueSource, PayrollRun
+from .payroll import diff_runs, run_payroll
+from .statements import generate_statements, load_statement_data, statements_path
+
+User = get_user_model()
+
+
+class ExpenseListPaginationTest(TestCase):
+    """Tests de la pagination par curseur de la liste des dépenses"""
+
+    def setUp(self):
+        """Créer un General Manager et 60 dépenses réparties sur deux catégories"""
+        self.client = Client()
+        gm_role = Role.objects.create(name=Role.RoleType.GENERAL_MANAGER)
+        User.objects.create_user(username="general", password="test123", role=gm_role)
+        self.client.login(username="general", password="test123")
+        agency = Agency.objects.create(name="Agencia Test", code="AGT001")
+        self.rent = ExpenseCategory.objects.create(name="Alquiler")
+        self.other = ExpenseCategory.objects.create(name="Otros")
+        Expense.objects.bulk_create([
+            Expense(
+                agency=agency,
+                category=self.rent if i % 2 else self.other,
+                date=date(2026, 1, 1) + timedelta(days=i // 3),
+                amount=Decimal('10.00'),
+            )
+            for i in range(60)
+        ])
+
+    def test_pages_cover_all_rows_once(self):
+        """Les pages successives couvrent chaque ligne une seule fois, avec le cumul"""
+        url = reverse('financial:expense_list')
+        response = self.client.get(url, {'page_size': 25})
+        page = response.context['page']
+        seen = [expense.id for expense in page['object_list']]
+        self.assertEqual(page['total'], Decimal('600.00'))
+        self.assertEqual(page['page_total'], Decimal('250.00'))
+        self.assertIsNone(page['previous_cursor'])
+
+        while page['next_cursor']:
+            response = self.client.get(url, {'page_size': 25, 'after': page['next_cursor']})
+            page = response.context['page']
+            seen += [expense.id for expense in page['object_list']]
+        self.assertEqual(len(seen), 60)
+        self.assertEqual(len(set(seen)), 60)
+        self.assertEqual(page['running_total'], Decimal('600.00'))
+
+        response = self.client.get(url, {'page_size': 25, 'before': page['previous_cursor']})
+        self.assertEqual(
+            [expense.id for expense in response.context['page']['object_list']],
+            seen[25:50]
+        )
+
+    def test_filters_preserved_in_page_links(self):
+        """Le filtre de catégorie s'applique aux totaux et reste dans les liens"""
+        response = self.client.get(reverse('financial:expense_list'), {'category': self.rent.id, 'page_size': 25})
+        page = response.context['page']
+        self.assertEqual(page['total'], Decimal('300.00'))
+        self.assertIn(f'category={self.rent.id}', page['query'])
+        self.assertIsNotNone(page['next_cursor'])
+
+
+class ExpenseExportTest(TestCase):
+    """Tests de l'export en flux des dépenses"""
+
+    def setUp(self):
+        """Créer deux agences avec une dépense chacune et un Regional Manager"""
+        self.client = Client()
+        rm_role = Role.objects.create(name=Role.RoleType.REGIONAL_MANAGER)
+        self.agency = Agency.objects.create(name="Agencia Test", code="AGT001")
+        other_agency = Agency.objects.create(name="Otra Agencia", code="AGT002")
+        User.objects.create_user(username="regional", password="test123", role=rm_role, agency=self.agency)
+        self.client.login(username="regional", password="test123")
+        category = ExpenseCategory.objects.create(name="Alquiler")
+        Expense.objects.create(agency=self.agency, category=category, date=date(2026, 3, 1),
+                               amount=Decimal('1500.00'), description='Local "centro"')
+        Expense.objects.create(agency=other_agency, category=category, date=date(2026, 3, 2),
+                               amount=Decimal('900.00'))
+
+    def test_csv_export_is_streamed_and_scoped(self):
+        """Le CSV est diffusé en flux et limité à l'agence du Regional Manager"""
+        response = self.client.get(reverse('financial:expense_export'))
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        lines = content.splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('Local ""centro""', lines[1])
+        self.assertIn('1500.00', lines[1])
+
+    def test_csv_export_neutralizes_formulas(self):
+        """Un texte qui commence comme une formule est préfixé ; les montants négatifs restent des nombres"""
+        category = ExpenseCategory.objects.get()
+        Expense.objects.create(agency=self.agency, category=category, date=date(2026, 3, 3),
+                               amount=Decimal('-20.00'), description='=HYPERLINK("http://x")')
+        response = self.client.get(reverse('financial:expense_export'))
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        self.assertIn('"\'=HYPERLINK(""http://x"")"', content)
+        self.assertIn(',-20.00', content)
+
+    def test_xlsx_export_is_valid_workbook(self):
+        """Le XLSX est une archive valide contenant la feuille de données"""
+        response = self.client.get(reverse('financial:expense_export'), {'format': 'xlsx'})
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertEqual(sheet.count('<row>'), 2)
+        self.assertIn('Local "centro"', sheet)
+        self.assertNotIn('Otra Agencia', sheet)
+
+
+class LedgerImportTest(TestCase):
+    """Tests de l'import CSV groupé des dépenses et revenus"""
+
+    def setUp(self):
+        """Créer une agence, une catégorie, une source et un Regional Manager"""
+        self.client = Client()
+        rm_role = Role.objects.create(name=Role.RoleType.REGIONAL_MANAGER)
+        self.agency = Agency.objects.create(name="Agencia Test", code="AGT001")
+        Agency.objects.create(name="Otra Agencia", code="AGT002")
+        User.objects.create_user(username="regional", password="test123", role=rm_role, agency=self.agency)
+        self.client.login(username="regional", password="test123")
+        ExpenseCategory.objects.create(name="Alquiler")
+        RevenueSource.objects.create(name="Eventos")
+
+    def _upload(self, url_name, content):
+        upload = SimpleUploadedFile('import.csv', content.encode('utf-8'), content_type='text/csv')
+        return self.client.post(reverse(url_name), {'file': upload})
+
+    def test_expense_import_reports_errors_per_row(self):
+        """Les lignes valides sont importées, les autres listées avec leurs erreurs"""
+        rows = ["date,amount,category,agency,description"]
+        rows += [f"2026-03-{day:02d},1000,alquiler,,Línea {day}" for day in range(1, 29)]
+        rows += [
+            "2026-03-40,abc,Alquiler,,",
+            "2026-03-01,500,Desconocida,AGT002,",
+            "2026-03-01,1e9,Alquiler,,",
+            "2026-03-01,123456789012,Alquiler,,",
+        ]
+        response = self._upload('financial:expense_import', "\n".join(rows) + "\n")
+        self.assertEqual(response.status_code, 200)
+        result = response.context['result']
+        self.assertEqual(result['created'], 28)
+        self.assertEqual(Expense.objects.filter(agency=self.agency).count(), 28)
+        self.assertEqual(result['errors'][0], {'line': 30, 'errors': ['Fecha inválida', 'Monto inválido']})
+        self.assertEqual(result['errors'][1]['errors'], ['Categoría no encontrada', 'Agencia no permitida'])
+        self.assertEqual([error['errors'] for error in result['errors'][2:]], [['Monto inválido']] * 2)
+
+    def test_revenue_import_query_count_is_constant(self):
+        """Benchmark : les recherches sont en mémoire et l'insertion se fait par lots"""
+        rows = ["date,amount,source"] + [f"2026-03-01,{i},Eventos" for i in range(200)]
+        with CaptureQueriesContext(connection) as ctx:
+            self._upload('financial:revenue_import', "\n".join(rows))
+        self.assertEqual(Revenue.objects.count(), 200)
+        self.assertLess(len(ctx.captured_queries), 25)
+
+
+class BreakdownTest(TestCase):
+    """Tests de la ventilation par catégorie, mois et agence"""
+
+    def setUp(self):
+        """Créer des dépenses sur deux catégories, deux mois et deux agences"""
+        self.client = Client()
+        gm_role = Role.objects.create(name=Role.RoleType.GENERAL_MANAGER)
+        User.objects.create_user(username="general", password="test123", role=gm_role)
+        self.client.login(username="general", password="test123")
+        north = Agency.objects.create(name="Norte", code="AGT001")
+        south = Agency.objects.create(name="Sur", code="AGT002")
+        rent = ExpenseCategory.objects.create(name="Alquiler")
+        other = ExpenseCategory.objects.create(name="Otros")
+        for agency, category, day, amount in [
+            (north, rent, date(2026, 1, 5), '300.00'),
+            (north, rent, date(2026, 1, 20), '100.00'),
+            (south, other, date(2026, 1, 7), '50.00'),
+            (south, rent, date(2026, 2, 3), '50.00'),
+        ]:
+            Expense.objects.create(agency=agency, category=category, date=day, amount=Decimal(amount))
+
+    def test_breakdown_single_query(self):
+        """La ventilation complète est calculée par une seule requête GROUP BY"""
+        with self.assertNumQueries(1):
+            breakdown = get_breakdown(Expense.objects.all(), 'category')
+        self.assertEqual(breakdown['total'], Decimal('500.00'))
+        self.assertEqual(len(breakdown['cells']), 3)
+        self.assertEqual(breakdown['by_group'][0]['group'], 'Alquiler')
+        self.assertEqual(breakdown['by_group'][0]['total'], Decimal('450.00'))
+        self.assertEqual([entry['month'] for entry in breakdown['by_month']], ['2026-01', '2026-02'])
+        self.assertEqual(breakdown['by_agency'][0]['percentage'], Decimal('80.0'))
+
+    def test_breakdown_endpoint_applies_filters(self):
+        """L'endpoint JSON applique les filtres de la liste"""
+        response = self.client.get(reverse('financial:expense_breakdown'), {'date_from': '2026-02-01'})
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(Decimal(data['total']), Decimal('50.00'))
+        self.assertEqual(data['cells'], [
+            {'group': 'Alquiler', 'month': '2026-02', 'agency': 'Sur', 'total': '50.00', 'count': 1}
+        ])
+
+
+class PayrollRunTest(TestCase):
+    """Tests des liquidations figées par quinzaine"""
+
+    def setUp(self):
+        """Créer une agence avec deux modèles, leurs sessions, une absence et un bonus journalier"""
+        self.agency = Agency.objects.create(name="Agencia Test", code="AGT001")
+        schedule = Schedule.objects.create(
+            agency=self.agency,
+            name="Diario",
+            start_time=time(8, 0),
+            end_time=time(16, 0),
+            week_days="MONDAY,TUESDAY,WEDNESDAY,THURSDAY,FRIDAY,SATURDAY,SUNDAY",
+        )
+        self.ana = Model.objects.create(first_name="Ana", last_name="Ruiz", agency=self.agency, fecha_ingreso=date(2025, 1, 1))
+        self.eva = Model.objects.create(first_name="Eva", last_name="Soto", agency=self.agency, fecha_ingreso=date(2025, 1, 1))
+        ScheduleAssignment.objects.create(model=self.ana, schedule=schedule)
+        for day in (date(2026, 3, 2), date(2026, 3, 3)):
+            WorkSession.objects.create(
+                model=self.ana,
+                date=day,
+                status=WorkSession.Status.COMPLETED,
+                session_gain_amount=Decimal('200000.00'),
+                session_bank_fees=Decimal('2000.00'),
+                # Part du modèle déjà nette de la multa de retard
+                session_model_ganancia=Decimal('95000.00'),
+                late_penalty_amount=Decimal('5000.00'),
+            )
+        WorkSession.objects.create(
+            model=self.eva,
+            date=date(2026, 3, 4),
+            status=WorkSession.Status.ABSENT,
+            late_penalty_amount=Decimal('0.00'),
+            absence_penalty_amount=Decimal('20000.00'),
+        )
+        BonusRule.objects.create(
+            agency=self.agency,
+            name="Diario",
+            period_type=BonusRule.PeriodType.DAILY,
+            target_currency=BonusRule.TargetCurrency.COP,
+            target_amount=Decimal('0.00'),
+            bonus_type=BonusRule.BonusType.FIXED_AMOUNT,
+            bonus_value=Decimal('10000.00'),
+        )
+
+    def test_net_payout_includes_bonuses_and_penalties(self):
+        """Paiement net = part avant multas + bonus - multas (absences comprises)"""
+        run = run_payroll(self.agency, date(2026, 3, 1), date(2026, 3, 15))
+        lines = {line.model_id: line for line in run.lines.all()}
+
+        ana = lines[self.ana.id]
+        self.assertEqual(ana.sessions_count, 2)
+        self.assertEqual(ana.model_share, Decimal('200000.00'))
+        self.assertEqual(ana.penalties, Decimal('10000.00'))
+        self.assertEqual(ana.bonuses, Decimal('20000.00'))
+        self.assertEqual(ana.net_payout, Decimal('210000.00'))
+
+        eva = lines[self.eva.id]
+        self.assertEqual(eva.sessions_count, 0)
+        self.assertEqual(eva.net_payout, Decimal('-20000.00'))
+        self.assertEqual(run.net_payout, Decimal('190000.00'))
+        self.assertEqual(run.lines_count, 2)
+
+    def test_penalty_without_gain_not_added_to_share(self):
+        """Une session terminée sans gain saisi n'ajoute pas sa multa à la part du modèle"""
+        WorkSession.objects.create(
+            model=self.eva,
+            date=date(2026, 3, 5),
+            status=WorkSession.Status.COMPLETED,
+            late_penalty_amount=Decimal('3000.00'),
+        )
+        run = run_payroll(self.agency, date(2026, 3, 1), date(2026, 3, 15))
+        eva = run.lines.get(model=self.eva)
+        self.assertEqual(eva.sessions_count, 1)
+        self.assertEqual(eva.model_share, Decimal('0.00'))
+        self.assertEqual(eva.penalties, Decimal('23000.00'))
+        self.assertEqual(eva.net_payout, Decimal('-23000.00'))
+
+    def test_rerun_keeps_previous_snapshot(self):
+        """Une nouvelle exécution crée une liquidation liée, la précédente reste inchangée"""
+        first = run_payroll(self.agency, date(2026, 3, 1), date(2026, 3, 15))
+        WorkSession.objects.filter(model=self.eva).update(absence_penalty_amount=Decimal('0.00'))
+        second = run_payroll(self.agency, date(2026, 3, 1), date(2026, 3, 15))
+
+        first.refresh_from_db()
+        self.assertEqual(second.previous_run, first)
+        self.assertFalse(first.is_current)
+        self.assertEqual(first.net_payout, Decimal('190000.00'))
+        self.assertEqual(second.net_payout, Decimal('210000.00'))
+
+        changes = diff_runs(second)
+        self.assertEqual([change['model_name'] for change in changes], ["Eva Soto"])
+        deltas = {field['field']: field['delta'] for field in changes[0]['fields']}
+        self.assertEqual(deltas['net_payout'], Decimal('20000.00'))
+
+        with self.assertRaises(ValueError):
+            first.save()
+
+    def test_payroll_view_runs_and_shows_diff(self):
+        """Le Regional Manager liquide la quinzaine de son agence depuis l'interface"""
+        rm_role = Role.objects.create(name=Role.RoleType.REGIONAL_MANAGER)
+        User.objects.create_user(username="regional", password="test123", role=rm_role, agency=self.agency)
+        client = Client()
+        client.login(username="regional", password="test123")
+
+        response = client.post(reverse('financial:payroll_list'), {'quincena': '2026-03-10'})
+        run = PayrollRun.objects.get()
+        self.assertRedirects(response, reverse('financial:payroll_detail', args=[run.id]))
+        self.assertEqual((run.period_start, run.period_end), (date(2026, 3, 1), date(2026, 3, 15)))
+
+        client.post(reverse('financial:payroll_list'), {'quincena': '2026-03-01'})
+        latest = PayrollRun.objects.get(previous_run=run)
+        response = client.get(reverse('financial:payroll_detail', args=[latest.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['changes'], [])
+
+        response = client.get(reverse('financial:payroll_export', args=[latest.id]), {'format': 'csv'})
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertIn('Ana Ruiz', content)
+
+    def test_concurrent_rerun_reported_to_user(self):
+        """Une liquidation concurrente de la même quinzaine donne un message, pas une erreur 500"""
+        rm_role = Role.objects.create(name=Role.RoleType.REGIONAL_MANAGER)
+        User.objects.create_user(username="regional", password="test123", role=rm_role, agency=self.agency)
+        client = Client()
+        client.login(username="regional", password="test123")
+
+        with mock.patch('financial.views.run_payroll', side_effect=IntegrityError):
+            response = client.post(reverse('financial:payroll_list'), {'quincena': '2026-03-10'}, follow=True)
+        self.assertRedirects(response, reverse('financial:payroll_list'))
+        self.assertIn('al mismo tiempo', str(list(response.context['messages'])[0]))
+        self.assertFalse(PayrollRun.objects.exists())
+
+    def test_statements_rendered_in_process_pool(self):
+        """Les relevés sont chargés en trois requêtes et rendus par le pool avec leur index"""
+        run = run_payroll(self.agency, date(2026, 3, 1), date(2026, 3, 15))
+        with self.assertNumQueries(3):
+            load_statement_data(run.id)
+
+        with tempfile.TemporaryDirectory() as media_root, tempfile.TemporaryDirectory() as private_root, \
+                override_settings(MEDIA_ROOT=media_root, PRIVATE_ROOT=private_root):
+            with mock.patch('financial.statements.MIN_PARALLEL_STATEMENTS', 0):
+                result = generate_statements(run.id, workers=2)
+            self.assertEqual(result['count'], 2)
+            directory = statements_path(run.id)
+            statement = (directory / f'modelo_{self.ana.id}.html').read_text(encoding='utf-8')
+            self.assertIn('Ana Ruiz', statement)
+            self.assertIn('$210.000,00', statement)
+            index = (directory / 'index.html').read_text(encoding='utf-8')
+            self.assertIn(f'href="modelo_{self.eva.id}.html"', index)
+            # Hors du répertoire publié : accessibles uniquement par la vue authentifiée
+            self.assertEqual(os.listdir(media_root), [])
+
+            url = reverse('financial:payroll_statement', args=[run.id, f'modelo_{self.ana.id}.html'])
+            self.assertEqual(Client().get(url).status_code, 302)
+            rm_role = Role.objects.create(name=Role.RoleType.REGIONAL_MANAGER)
+            client = Client()
+            client.force_login(User.objects.create_user(username="regional", role=rm_role, agency=self.agency))
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'Ana Ruiz', b''.join(response.streaming_content))
 
-# Create your tests here.
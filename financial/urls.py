@@ -6,15 +6,29 @@ app_name = 'financial'
 urlpatterns = [
     # Expenses (Dépenses)
     path('expenses/', views.expense_list, name='expense_list'),
+    path('expenses/export/', views.expense_export, name='expense_export'),
+    path('expenses/breakdown/', views.expense_breakdown, name='expense_breakdown'),
+    path('expenses/import/', views.expense_import, name='expense_import'),
     path('expenses/create/', views.expense_create, name='expense_create'),
     path('expenses/<int:expense_id>/update/', views.expense_update, name='expense_update'),
     path('expenses/<int:expense_id>/delete/', views.expense_delete, name='expense_delete'),
     
     # Salaries (Salaires)
     path('salaries/', views.salary_list, name='salary_list'),
+    path('salaries/export/', views.salary_export, name='salary_export'),
     path('salaries/create/', views.salary_create, name='salary_create'),
     
     # Revenues (Revenus)
     path('revenues/', views.revenue_list, name='revenue_list'),
+    path('revenues/export/', views.revenue_export, name='revenue_export'),
+    path('revenues/breakdown/', views.revenue_breakdown, name='revenue_breakdown'),
+    path('revenues/import/', views.revenue_import, name='revenue_import'),
     path('revenues/create/', views.revenue_create, name='revenue_create'),
+    
+    # Payroll (Liquidations des modèles)
+    path('payroll/', views.payroll_list, name='payroll_list'),
+    path('payroll/<int:run_id>/', views.payroll_detail, name='payroll_detail'),
+    path('payroll/<int:run_id>/export/', views.payroll_export, name='payroll_export'),
+    path('payroll/<int:run_id>/statements/', views.payroll_statements, name='payroll_statements'),
+    path('payroll/<int:run_id>/statements/<str:filename>', views.payroll_statement, name='payroll_statement'),
 ]
@@ -1,60 +1,112 @@
+import io
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import FileResponse, Http404, JsonResponse
+from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Q, Sum, Count
+from django.db import IntegrityError
+from django.db.models import Q, Count
 from django.utils import timezone
 from datetime import datetime, date, timedelta
-from .models import Expense, ExpenseCategory, Employee, Salary, Revenue, RevenueSource
-from accounts.decorators import regional_manager_required, agency_required, general_manager_required
+from .models import Expense, ExpenseCategory, Employee, Salary, Revenue, RevenueSource, PayrollRun
+from accounts.decorators import regional_manager_required, agency_required, general_manager_required, role_required
+from accounts.models import Role
+from accounts.refdata import get_agencies, get_expense_categories, get_revenue_sources
 from accounts.utils import filter_by_agency_queryset
+from .pagination import keyset_paginate
+from .exports import EXPORT_CHUNK_SIZE, export_response
+from .importers import import_ledger
+from .analytics import get_breakdown
+from .payroll import diff_runs, run_payroll
+from .statements import INDEX_FILENAME, statements_path
+from .tasks import generate_payroll_statements
+from jobs.queue import enqueue
+from models_app.utils import get_quincena_bounds
 
 
-# ==================== EXPENSES (DÉPENSES) ====================
-
-@login_required
-def expense_list(request):
-    """Liste des dépenses"""
-    if request.user.is_general_manager():
-        expenses = Expense.objects.all().order_by('-date', '-created_at')
-    elif request.user.is_regional_manager() and request.user.agency:
-        expenses = Expense.objects.filter(agency=request.user.agency).order_by('-date', '-created_at')
-    else:
-        expenses = Expense.objects.none()
-        messages.warning(request, _('No tiene acceso a los gastos.'))
+def _filter_by_date_range(request, queryset, date_field):
+    """
+    Applique les filtres GET date_from / date_to (les dates invalides sont ignorées).
     
-    # Filtres
+    Returns:
+        tuple: (queryset filtré, date_from, date_to)
+    """
     date_from = request.GET.get('date_from')
     date_to = request.GET.get('date_to')
-    category_id = request.GET.get('category')
     
     if date_from:
         try:
             date_from = datetime.strptime(date_from, '%Y-%m-%d').date()
-            expenses = expenses.filter(date__gte=date_from)
+            queryset = queryset.filter(**{f'{date_field}__gte': date_from})
         except ValueError:
             pass
     
     if date_to:
         try:
             date_to = datetime.strptime(date_to, '%Y-%m-%d').date()
-            expenses = expenses.filter(date__lte=date_to)
+            queryset = queryset.filter(**{f'{date_field}__lte': date_to})
         except ValueError:
             pass
     
+    return queryset, date_from, date_to
+
+
+def _get_id_param(request, name):
+    """Retourne un identifiant GET entier, ou None"""
+    value = request.GET.get(name)
+    return int(value) if value and value.isdigit() else None
+
+
+def _get_filtered_expenses(request):
+    """
+    Dépenses visibles par l'utilisateur avec les filtres de la liste (dates, catégorie).
+    
+    Returns:
+        tuple: (queryset, {'date_from', 'date_to', 'selected_category'})
+    """
+    expenses = Expense.scoped.all()
+    expenses, date_from, date_to = _filter_by_date_range(request, expenses, 'date')
+    category_id = _get_id_param(request, 'category')
     if category_id:
         expenses = expenses.filter(category_id=category_id)
+    return expenses, {'date_from': date_from, 'date_to': date_to, 'selected_category': category_id}
+
+
+def _get_filtered_revenues(request):
+    """
+    Revenus visibles par l'utilisateur avec les filtres de la liste (dates, source).
+    
+    Returns:
+        tuple: (queryset, {'date_from', 'date_to', 'selected_source'})
+    """
+    revenues = Revenue.scoped.all()
+    revenues, date_from, date_to = _filter_by_date_range(request, revenues, 'date')
+    source_id = _get_id_param(request, 'source')
+    if source_id:
+        revenues = revenues.filter(source_id=source_id)
+    return revenues, {'date_from': date_from, 'date_to': date_to, 'selected_source': source_id}
+
+
+# ==================== EXPENSES (DÉPENSES) ====================
+
+@login_required
+def expense_list(request):
+    """Liste des dépenses (pagination par curseur et ventilation)"""
+    expenses, filters = _get_filtered_expenses(request)
+    if not (request.user.is_general_manager() or (request.user.is_regional_manager() and request.user.agency)):
+        expenses = expenses.none()
+        messages.warning(request, _('No tiene acceso a los gastos.'))
     
-    # Statistiques
-    total = expenses.aggregate(total=Sum('amount'))['total'] or 0
+    page = keyset_paginate(request, expenses.select_related('agency', 'category'))
     
     context = {
-        'expenses': expenses,
-        'categories': ExpenseCategory.objects.all().order_by('name'),
-        'total': total,
-        'date_from': date_from,
-        'date_to': date_to,
-        'selected_category': int(category_id) if category_id else None,
+        'expenses': page['object_list'],
+        'page': page,
+        'breakdown': get_breakdown(expenses, 'category'),
+        'categories': get_expense_categories(),
+        'total': page['total'],
+        **filters,
     }
     return render(request, 'financial/expense_list.html', context)
 
@@ -72,11 +124,10 @@ def expense_create(request):
             agency = get_object_or_404(Agency, id=agency_id)
         elif not request.user.agency:
             # Si superuser sans agence, afficher toutes les agences pour choisir
-            from agencies.models import Agency
-            agencies = Agency.objects.all()
+            agencies = get_agencies()
             context = {
                 'agencies': agencies,
-                'categories': ExpenseCategory.objects.all().order_by('name'),
+                'categories': get_expense_categories(),
                 'default_date': timezone.now().date(),
             }
             return render(request, 'financial/expense_create.html', context)
@@ -121,11 +172,10 @@ def expense_create(request):
         except Exception as e:
             messages.error(request, _('Error al registrar el gasto: {}').format(str(e)))
     
-    from agencies.models import Agency
-    agencies = Agency.objects.all() if request.user.is_superuser else [request.user.agency] if request.user.agency else []
+    agencies = get_agencies() if request.user.is_superuser else [request.user.agency] if request.user.agency else []
     
     context = {
-        'categories': ExpenseCategory.objects.all().order_by('name'),
+        'categories': get_expense_categories(),
         'default_date': timezone.now().date(),
         'agencies': agencies,
         'selected_agency': agency,
@@ -171,12 +221,11 @@ def expense_update(request, expense_id):
         except Exception as e:
             messages.error(request, _('Error al actualizar el gasto: {}').format(str(e)))
     
-    from agencies.models import Agency
-    agencies = Agency.objects.all() if request.user.is_superuser else [request.user.agency] if request.user.agency else []
+    agencies = get_agencies() if request.user.is_superuser else [request.user.agency] if request.user.agency else []
     
     context = {
         'expense': expense,
-        'categories': ExpenseCategory.objects.all().order_by('name'),
+        'categories': get_expense_categories(),
         'agencies': agencies,
     }
     return render(request, 'financial/expense_update.html', context)
@@ -208,39 +257,21 @@ def expense_delete(request, expense_id):
 
 @login_required
 def salary_list(request):
-    """Liste des salaires"""
-    if request.user.is_general_manager():
-        salaries = Salary.objects.all().order_by('-payment_date', '-created_at')
-    elif request.user.is_regional_manager() and request.user.agency:
-        salaries = Salary.objects.filter(agency=request.user.agency).order_by('-payment_date', '-created_at')
+    """Liste des salaires (pagination par curseur)"""
+    if request.user.is_general_manager() or (request.user.is_regional_manager() and request.user.agency):
+        # General Manager : tous les salaires ; Regional Manager : ceux de son agence
+        salaries = Salary.scoped.all()
     else:
         salaries = Salary.objects.none()
         messages.warning(request, _('No tiene acceso a los salarios.'))
     
     # Filtres
-    date_from = request.GET.get('date_from')
-    date_to = request.GET.get('date_to')
-    employee_id = request.GET.get('employee')
-    
-    if date_from:
-        try:
-            date_from = datetime.strptime(date_from, '%Y-%m-%d').date()
-            salaries = salaries.filter(payment_date__gte=date_from)
-        except ValueError:
-            pass
-    
-    if date_to:
-        try:
-            date_to = datetime.strptime(date_to, '%Y-%m-%d').date()
-            salaries = salaries.filter(payment_date__lte=date_to)
-        except ValueError:
-            pass
-    
+    salaries, date_from, date_to = _filter_by_date_range(request, salaries, 'payment_date')
+    employee_id = _get_id_param(request, 'employee')
     if employee_id:
         salaries = salaries.filter(employee_id=employee_id)
     
-    # Statistiques
-    total = salaries.aggregate(total=Sum('amount'))['total'] or 0
+    page = keyset_paginate(request, salaries.select_related('employee'), date_field='payment_date')
     
     # Récupérer les employés pour le filtre
     if request.user.is_general_manager():
@@ -251,12 +282,13 @@ def salary_list(request):
         employees = Employee.objects.none()
     
     context = {
-        'salaries': salaries,
+        'salaries': page['object_list'],
+        'page': page,
         'employees': employees,
-        'total': total,
+        'total': page['total'],
         'date_from': date_from,
         'date_to': date_to,
-        'selected_employee': int(employee_id) if employee_id else None,
+        'selected_employee': employee_id,
     }
     return render(request, 'financial/salary_list.html', context)
 
@@ -317,47 +349,21 @@ def salary_create(request):
 
 @login_required
 def revenue_list(request):
-    """Liste des revenus"""
-    if request.user.is_general_manager():
-        revenues = Revenue.objects.all().order_by('-date', '-created_at')
-    elif request.user.is_regional_manager() and request.user.agency:
-        revenues = Revenue.objects.filter(agency=request.user.agency).order_by('-date', '-created_at')
-    else:
-        revenues = Revenue.objects.none()
+    """Liste des revenus (pagination par curseur et ventilation)"""
+    revenues, filters = _get_filtered_revenues(request)
+    if not (request.user.is_general_manager() or (request.user.is_regional_manager() and request.user.agency)):
+        revenues = revenues.none()
         messages.warning(request, _('No tiene acceso a los ingresos.'))
     
-    # Filtres
-    date_from = request.GET.get('date_from')
-    date_to = request.GET.get('date_to')
-    source_id = request.GET.get('source')
-    
-    if date_from:
-        try:
-            date_from = datetime.strptime(date_from, '%Y-%m-%d').date()
-            revenues = revenues.filter(date__gte=date_from)
-        except ValueError:
-            pass
-    
-    if date_to:
-        try:
-            date_to = datetime.strptime(date_to, '%Y-%m-%d').date()
-            revenues = revenues.filter(date__lte=date_to)
-        except ValueError:
-            pass
-    
-    if source_id:
-        revenues = revenues.filter(source_id=source_id)
-    
-    # Statistiques
-    total = revenues.aggregate(total=Sum('amount'))['total'] or 0
+    page = keyset_paginate(request, revenues.select_related('agency', 'source'))
     
     context = {
-        'revenues': revenues,
-        'sources': RevenueSource.objects.all().order_by('name'),
-        'total': total,
-        'date_from': date_from,
-        'date_to': date_to,
-        'selected_source': int(source_id) if source_id else None,
+        'revenues': page['object_list'],
+        'page': page,
+        'breakdown': get_breakdown(revenues, 'source'),
+        'sources': get_revenue_sources(),
+        'total': page['total'],
+        **filters,
     }
     return render(request, 'financial/revenue_list.html', context)
 
@@ -396,7 +402,255 @@ def revenue_create(request):
             messages.error(request, _('Error al registrar el ingreso: {}').format(str(e)))
     
     context = {
-        'sources': RevenueSource.objects.all().order_by('name'),
+        'sources': get_revenue_sources(),
         'default_date': timezone.now().date(),
     }
     return render(request, 'financial/revenue_create.html', context)
+
+
+# ==================== EXPORTS ====================
+
+def _get_export_format(request):
+    """Format d'export demandé (CSV par défaut)"""
+    return 'xlsx' if request.GET.get('format') == 'xlsx' else 'csv'
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+def expense_export(request):
+    """Export en flux des dépenses (mêmes filtres que la liste)"""
+    expenses, _filters = _get_filtered_expenses(request)
+    
+    rows = expenses.order_by('-date', '-id').values_list(
+        'date', 'agency__name', 'category__name', 'amount', 'description'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return export_response(
+        _get_export_format(request),
+        'gastos',
+        ['Fecha', 'Agencia', 'Categoría', 'Monto (COP)', 'Descripción'],
+        rows,
+        sheet_name='Gastos',
+    )
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+def salary_export(request):
+    """Export en flux des salaires (mêmes filtres que la liste)"""
+    salaries = Salary.scoped.all()
+    salaries, _date_from, _date_to = _filter_by_date_range(request, salaries, 'payment_date')
+    employee_id = _get_id_param(request, 'employee')
+    if employee_id:
+        salaries = salaries.filter(employee_id=employee_id)
+    
+    rows = salaries.order_by('-payment_date', '-id').values_list(
+        'payment_date', 'agency__name', 'employee__first_name', 'employee__last_name',
+        'period_start', 'period_end', 'amount', 'description'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return export_response(
+        _get_export_format(request),
+        'salarios',
+        ['Fecha de Pago', 'Agencia', 'Nombre', 'Apellido', 'Periodo Desde', 'Periodo Hasta', 'Monto (COP)', 'Descripción'],
+        rows,
+        sheet_name='Salarios',
+    )
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+def revenue_export(request):
+    """Export en flux des revenus (mêmes filtres que la liste)"""
+    revenues, _filters = _get_filtered_revenues(request)
+    
+    rows = revenues.order_by('-date', '-id').values_list(
+        'date', 'agency__name', 'source__name', 'amount', 'description'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return export_response(
+        _get_export_format(request),
+        'ingresos',
+        ['Fecha', 'Agencia', 'Fuente', 'Monto (COP)', 'Descripción'],
+        rows,
+        sheet_name='Ingresos',
+    )
+
+
+# ==================== ANALYSES ====================
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+def expense_breakdown(request):
+    """Ventilation JSON des dépenses par catégorie, mois et agence (mêmes filtres que la liste)"""
+    expenses, _filters = _get_filtered_expenses(request)
+    return JsonResponse({'success': True, **get_breakdown(expenses, 'category')})
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+def revenue_breakdown(request):
+    """Ventilation JSON des revenus par source, mois et agence (mêmes filtres que la liste)"""
+    revenues, _filters = _get_filtered_revenues(request)
+    return JsonResponse({'success': True, **get_breakdown(revenues, 'source')})
+
+
+# ==================== IMPORTS ====================
+
+def _ledger_import(request, kind, list_url_name):
+    """Import CSV groupé de dépenses ou de revenus, avec rapport d'erreurs par ligne"""
+    from agencies.models import Agency
+    
+    agencies = get_agencies() if request.user.is_superuser else None
+    result = None
+    
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if not upload:
+            messages.error(request, _('Debe seleccionar un archivo.'))
+            return redirect(request.path)
+        
+        # Regional Manager : toutes les lignes sont rattachées à son agence
+        agency = None
+        if request.user.is_superuser:
+            if request.POST.get('agency'):
+                agency = get_object_or_404(Agency, id=request.POST.get('agency'))
+        else:
+            agency = request.user.agency
+        
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        try:
+            result = import_ledger(stream, kind, request.user, agency=agency)
+        except UnicodeDecodeError:
+            messages.error(request, _('El archivo debe estar codificado en UTF-8.'))
+            return redirect(request.path)
+        finally:
+            stream.detach()
+        
+        messages.success(request, _('{} registros importados exitosamente.').format(result['created']))
+        if result['errors']:
+            messages.warning(request, _('{} líneas con errores no fueron importadas.').format(len(result['errors'])))
+    
+    context = {
+        'kind': kind,
+        'result': result,
+        'agencies': agencies,
+        'list_url_name': list_url_name,
+    }
+    return render(request, 'financial/ledger_import.html', context)
+
+
+@regional_manager_required
+@agency_required
+def expense_import(request):
+    """Import CSV groupé de dépenses"""
+    return _ledger_import(request, 'expense', 'financial:expense_list')
+
+
+@regional_manager_required
+@agency_required
+def revenue_import(request):
+    """Import CSV groupé de revenus"""
+    return _ledger_import(request, 'revenue', 'financial:revenue_list')
+
+
+# ==================== PAYROLL (LIQUIDATION DES MODÈLES) ====================
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+def payroll_list(request):
+    """Liquidations par quinzaine et lancement d'une nouvelle liquidation"""
+    from agencies.models import Agency
+    
+    runs = filter_by_agency_queryset(request.user, PayrollRun.objects.all()).select_related(
+        'agency', 'created_by', 'next_run'
+    )
+    can_choose_agency = request.user.is_superuser or request.user.is_general_manager()
+    
+    if request.method == 'POST':
+        try:
+            day = datetime.strptime(request.POST.get('quincena', ''), '%Y-%m-%d').date()
+        except ValueError:
+            messages.error(request, _('Fecha inválida.'))
+            return redirect('financial:payroll_list')
+        
+        if can_choose_agency:
+            agency = get_object_or_404(Agency, id=request.POST.get('agency'))
+        elif request.user.agency:
+            agency = request.user.agency
+        else:
+            messages.error(request, _('No tiene una agencia asignada.'))
+            return redirect('financial:payroll_list')
+        
+        period_start, period_end = get_quincena_bounds(day)
+        try:
+            run = run_payroll(agency, period_start, period_end, user=request.user, notes=request.POST.get('notes', ''))
+        except IntegrityError:
+            messages.error(request, _('Otra liquidación de esta quincena se ejecutó al mismo tiempo. Intente de nuevo.'))
+            return redirect('financial:payroll_list')
+        if run.previous_run_id:
+            messages.success(request, _('Liquidación recalculada: {} modelos.').format(run.lines_count))
+        else:
+            messages.success(request, _('Liquidación cerrada: {} modelos.').format(run.lines_count))
+        return redirect('financial:payroll_detail', run_id=run.id)
+    
+    context = {
+        'runs': runs[:100],
+        'agencies': get_agencies() if can_choose_agency else None,
+        'today': timezone.now().date(),
+    }
+    return render(request, 'financial/payroll_list.html', context)
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+def payroll_detail(request, run_id):
+    """Lignes figées d'une liquidation et différences avec la liquidation précédente"""
+    run = get_object_or_404(
+        filter_by_agency_queryset(request.user, PayrollRun.objects.select_related('agency', 'created_by', 'previous_run')),
+        id=run_id
+    )
+    context = {
+        'run': run,
+        'lines': run.lines.all(),
+        'changes': diff_runs(run),
+        'next_run': getattr(run, 'next_run', None),
+        'statements_ready': (statements_path(run.id) / INDEX_FILENAME).is_file(),
+    }
+    return render(request, 'financial/payroll_detail.html', context)
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+def payroll_export(request, run_id):
+    """Export en flux des lignes d'une liquidation"""
+    run = get_object_or_404(filter_by_agency_queryset(request.user, PayrollRun.objects.all()), id=run_id)
+    rows = run.lines.values_list(
+        'model_name', 'cedula', 'sessions_count', 'worked_hours', 'gross_usd', 'gross_cop',
+        'bank_fees', 'model_share', 'penalties', 'bonuses', 'net_payout'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return export_response(
+        _get_export_format(request),
+        f'liquidacion_{run.period_start:%Y%m%d}_{run.period_end:%Y%m%d}',
+        ['Modelo', 'Cédula', 'Sesiones', 'Horas', 'Bruto (USD)', 'Bruto (COP)', 'Impuestos',
+         'Ganancia Modelo', 'Multas', 'Bonos', 'Pago Neto (COP)'],
+        rows,
+        sheet_name='Liquidación',
+    )
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+@require_http_methods(["POST"])
+def payroll_statements(request, run_id):
+    """Programme la génération des extractos de pago d'une liquidation"""
+    run = get_object_or_404(filter_by_agency_queryset(request.user, PayrollRun.objects.all()), id=run_id)
+    job = enqueue(
+        generate_payroll_statements,
+        label=f'Extractos liquidación #{run.id} ({run.period_start:%d/%m/%Y} - {run.period_end:%d/%m/%Y})',
+        user=request.user,
+        run_id=run.id,
+    )
+    messages.success(request, _('Generación de extractos programada.'))
+    return redirect('jobs:job_detail', job_id=job.id)
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+def payroll_statement(request, run_id, filename):
+    """Index ou extracto généré d'une liquidation"""
+    run = get_object_or_404(filter_by_agency_queryset(request.user, PayrollRun.objects.all()), id=run_id)
+    # Seuls les noms de fichiers produits par la génération sont servis
+    if '/' in filename or '\\' in filename or not filename.endswith('.html'):
+        raise Http404
+    path = statements_path(run.id) / filename
+    if not path.is_file():
+        raise Http404
+    return FileResponse(open(path, 'rb'), content_type='text/html; charset=utf-8')
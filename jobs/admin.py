@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'task', 'label', 'status', 'attempts', 'run_after', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'task', 'created_at']
+    search_fields = ['task', 'label', 'error']
+    readonly_fields = ['created_at', 'finished_at', 'locked_at', 'locked_by', 'heartbeat_at']
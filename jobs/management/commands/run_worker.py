@@ -0,0 +1,61 @@
+import os
+import signal
+import socket
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from accounts.utils import clear_expired_sessions
+from jobs.queue import claim_next, requeue_stale, run_job
+
+# Intervalle de suppression des sessions expirées (secondes)
+SESSION_CLEANUP_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta las tareas en segundo plano de la cola (Job)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Procesa las tareas listas y termina')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--max-jobs', type=int, default=0, help='Termina después de N tareas (0 = sin límite)')
+
+    def handle(self, *args, **options):
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+
+        # Arrêt propre : la tâche en cours se termine avant la sortie
+        def stop(signum, frame):
+            self.stopping = True
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        processed = 0
+        last_stale_check = 0
+        last_session_cleanup = None
+        self.stdout.write(f'Worker {worker_id} iniciado')
+        while not self.stopping:
+            close_old_connections()
+            if time.monotonic() - last_stale_check > 60:
+                requeued = requeue_stale()
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f'{requeued} tareas abandonadas recuperadas'))
+                last_stale_check = time.monotonic()
+            if last_session_cleanup is None or time.monotonic() - last_session_cleanup > SESSION_CLEANUP_INTERVAL:
+                clear_expired_sessions()
+                last_session_cleanup = time.monotonic()
+
+            job = claim_next(worker_id)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            job = run_job(job)
+            processed += 1
+            style = self.style.SUCCESS if job.status == job.Status.SUCCEEDED else self.style.ERROR
+            self.stdout.write(style(f'#{job.id} {job.task}: {job.get_status_display()}'))
+            if options['max_jobs'] and processed >= options['max_jobs']:
+                break
+
+        self.stdout.write(f'Worker {worker_id} detenido ({processed} tareas)')
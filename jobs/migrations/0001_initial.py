@@ -0,0 +1,131 @@
+# Generated by Django 6.0.1 on 2026-10-19 18:04
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Job",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "task",
+                    models.CharField(
+                        help_text="Chemin pointé de la fonction à exécuter (ex: reports.tasks.render_report)",
+                        max_length=255,
+                        verbose_name="Tarea",
+                    ),
+                ),
+                (
+                    "label",
+                    models.CharField(
+                        blank=True, max_length=255, verbose_name="Descripción"
+                    ),
+                ),
+                (
+                    "kwargs",
+                    models.JSONField(
+                        blank=True, default=dict, verbose_name="Parámetros"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "Pendiente"),
+                            ("RUNNING", "En ejecución"),
+                            ("SUCCEEDED", "Completada"),
+                            ("FAILED", "Fallida"),
+                        ],
+                        default="PENDING",
+                        max_length=20,
+                        verbose_name="Estado",
+                    ),
+                ),
+                ("attempts", models.IntegerField(default=0, verbose_name="Intentos")),
+                (
+                    "max_attempts",
+                    models.IntegerField(default=3, verbose_name="Intentos máximos"),
+                ),
+                (
+                    "run_after",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="Ejecutar después de",
+                    ),
+                ),
+                (
+                    "locked_by",
+                    models.CharField(blank=True, max_length=100, verbose_name="Worker"),
+                ),
+                (
+                    "locked_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Tomada el"
+                    ),
+                ),
+                (
+                    "result",
+                    models.JSONField(blank=True, null=True, verbose_name="Resultado"),
+                ),
+                ("error", models.TextField(blank=True, verbose_name="Error")),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Fecha de creación"
+                    ),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Fecha de fin"
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="jobs",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Creado por",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Tarea en segundo plano",
+                "verbose_name_plural": "Tareas en segundo plano",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["status", "run_after"],
+                        name="jobs_job_status_babf0b_idx",
+                    ),
+                    models.Index(
+                        fields=["created_by", "-created_at"],
+                        name="jobs_job_created_d1be9f_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 21:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("jobs", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="heartbeat_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Mis à jour périodiquement pendant l'exécution ; sert à détecter les tâches abandonnées",
+                null=True,
+                verbose_name="Última señal del worker",
+            ),
+        ),
+    ]
@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class Job(models.Model):
+    """Tâche différée exécutée par le worker (manage.py run_worker)"""
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', _('Pendiente')
+        RUNNING = 'RUNNING', _('En ejecución')
+        SUCCEEDED = 'SUCCEEDED', _('Completada')
+        FAILED = 'FAILED', _('Fallida')
+
+    task = models.CharField(
+        max_length=255,
+        verbose_name=_('Tarea'),
+        help_text=_('Chemin pointé de la fonction à exécuter (ex: reports.tasks.render_report)')
+    )
+    label = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name=_('Descripción')
+    )
+    kwargs = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name=_('Parámetros')
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name=_('Estado')
+    )
+    attempts = models.IntegerField(
+        default=0,
+        verbose_name=_('Intentos')
+    )
+    max_attempts = models.IntegerField(
+        default=3,
+        verbose_name=_('Intentos máximos')
+    )
+    run_after = models.DateTimeField(
+        default=timezone.now,
+        verbose_name=_('Ejecutar después de')
+    )
+    locked_by = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name=_('Worker')
+    )
+    locked_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_('Tomada el')
+    )
+    heartbeat_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_('Última señal del worker'),
+        help_text=_('Mis à jour périodiquement pendant l\'exécution ; sert à détecter les tâches abandonnées')
+    )
+    result = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name=_('Resultado')
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name=_('Error')
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs',
+        verbose_name=_('Creado por')
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_('Fecha de creación')
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_('Fecha de fin')
+    )
+
+    class Meta:
+        verbose_name = _('Tarea en segundo plano')
+        verbose_name_plural = _('Tareas en segundo plano')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+            models.Index(fields=['created_by', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.label or self.task} - {self.get_status_display()}"
+
+    @property
+    def is_finished(self):
+        """Vrai si la tâche ne sera plus exécutée"""
+        return self.status in (self.Status.SUCCEEDED, self.Status.FAILED)
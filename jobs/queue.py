@@ -0,0 +1,213 @@
+"""
+File de tâches en base de données, sans service externe.
+
+enqueue() enregistre une tâche (chemin pointé d'une fonction + paramètres JSON) ; le
+worker (manage.py run_worker) la réserve puis l'exécute hors du cycle requête/réponse.
+
+La réservation utilise SELECT ... FOR UPDATE SKIP LOCKED lorsque la base le permet
+(PostgreSQL) : plusieurs workers se partagent la file sans se bloquer. Sinon (SQLite),
+une mise à jour conditionnelle (UPDATE ... WHERE status = 'PENDING') garantit qu'une tâche
+n'est prise que par un seul worker.
+
+Pendant l'exécution, un thread met à jour heartbeat_at toutes les HEARTBEAT_INTERVAL
+secondes : une tâche longue reste réservée tant que son worker est vivant, et seule une
+tâche sans signal depuis STALE_AFTER est remise en file.
+"""
+import logging
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Délai avant la première nouvelle tentative, doublé à chaque échec
+RETRY_DELAY_SECONDS = 30
+
+# Intervalle de mise à jour de heartbeat_at pendant l'exécution (secondes)
+HEARTBEAT_INTERVAL = 60
+
+# Une tâche sans signal de son worker depuis plus longtemps est considérée comme
+# abandonnée (worker arrêté) ; plusieurs intervalles de battement pour tolérer un retard
+STALE_AFTER = timedelta(minutes=5)
+
+
+def enqueue(task, label='', user=None, run_after=None, max_attempts=3, **kwargs):
+    """
+    Ajoute une tâche à la file.
+
+    Args:
+        task: Fonction ou chemin pointé de la fonction (ses paramètres doivent être
+              sérialisables en JSON et son résultat aussi)
+        label (str): Description affichée dans la page de suivi
+        user: Utilisateur à l'origine de la tâche
+        run_after (datetime, optional): Date avant laquelle la tâche n'est pas exécutée
+        max_attempts (int): Nombre maximal d'exécutions en cas d'erreur
+        **kwargs: Paramètres passés à la fonction
+
+    Returns:
+        Job: Tâche créée
+    """
+    if callable(task):
+        task = f'{task.__module__}.{task.__qualname__}'
+    return Job.objects.create(
+        task=task,
+        label=label,
+        kwargs=kwargs,
+        created_by=user if user is not None and user.is_authenticated else None,
+        run_after=run_after or timezone.now(),
+        max_attempts=max_attempts,
+    )
+
+
+def claim_next(worker_id):
+    """
+    Réserve la prochaine tâche prête pour un worker.
+
+    Returns:
+        Job ou None si aucune tâche n'est prête
+    """
+    now = timezone.now()
+    ready = Job.objects.filter(status=Job.Status.PENDING, run_after__lte=now).order_by('run_after', 'id')
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = ready.select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            job.status = Job.Status.RUNNING
+            job.locked_by = worker_id
+            job.locked_at = now
+            job.heartbeat_at = now
+            job.attempts += 1
+            job.save(update_fields=['status', 'locked_by', 'locked_at', 'heartbeat_at', 'attempts'])
+            return job
+
+    # Repli sans SKIP LOCKED : seule la mise à jour qui trouve encore la tâche en attente la réserve
+    for job_id in ready.values_list('id', flat=True)[:10]:
+        claimed = Job.objects.filter(id=job_id, status=Job.Status.PENDING).update(
+            status=Job.Status.RUNNING,
+            locked_by=worker_id,
+            locked_at=now,
+            heartbeat_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+@contextmanager
+def heartbeat(job, interval=None):
+    """
+    Signale périodiquement (heartbeat_at) que le worker exécute toujours la tâche.
+
+    Le thread utilise sa propre connexion, fermée à la fin du bloc.
+
+    Args:
+        job (Job): Tâche réservée
+        interval (float, optional): Secondes entre deux signaux (HEARTBEAT_INTERVAL par défaut)
+    """
+    interval = HEARTBEAT_INTERVAL if interval is None else interval
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(interval):
+                try:
+                    Job.objects.filter(id=job.id, locked_by=job.locked_by).update(heartbeat_at=timezone.now())
+                except Exception:
+                    logger.warning(f"Signal de vie impossible pour la tâche #{job.id}", exc_info=True)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'job-{job.id}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_job(job):
+    """
+    Exécute une tâche réservée et enregistre son résultat.
+
+    En cas d'erreur, la tâche est replanifiée avec un délai croissant tant que le nombre
+    maximal de tentatives n'est pas atteint, puis marquée en échec.
+
+    Le résultat n'est enregistré que si la tâche est toujours réservée par ce worker :
+    une tâche remise en file (requeue_stale) puis reprise ailleurs n'est pas écrasée.
+
+    Returns:
+        Job: Tâche mise à jour
+    """
+    worker_id = job.locked_by
+    try:
+        func = import_string(job.task)
+        with heartbeat(job):
+            result = func(**job.kwargs)
+    except Exception:
+        logger.exception(f"Erreur lors de l'exécution de la tâche #{job.id} ({job.task})")
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.Status.PENDING
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_DELAY_SECONDS * 2 ** (job.attempts - 1))
+        else:
+            job.status = Job.Status.FAILED
+            job.finished_at = timezone.now()
+    else:
+        job.status = Job.Status.SUCCEEDED
+        job.result = result
+        job.error = ''
+        job.finished_at = timezone.now()
+
+    job.locked_by = ''
+    job.locked_at = None
+    job.heartbeat_at = None
+    saved = Job.objects.filter(pk=job.pk, locked_by=worker_id).update(
+        status=job.status,
+        result=job.result,
+        error=job.error,
+        run_after=job.run_after,
+        finished_at=job.finished_at,
+        locked_by=job.locked_by,
+        locked_at=job.locked_at,
+        heartbeat_at=job.heartbeat_at,
+    )
+    if not saved:
+        logger.warning(
+            f"Résultat de la tâche #{job.id} ignoré : elle n'est plus réservée par {worker_id}"
+        )
+    return job
+
+
+def requeue_stale(stale_after=STALE_AFTER):
+    """
+    Remet en file les tâches dont le worker ne donne plus de signal depuis stale_after
+    (ou les marque en échec si elles ont épuisé leurs tentatives). Une tâche longue dont
+    le worker met à jour heartbeat_at n'est pas concernée.
+
+    Returns:
+        int: Nombre de tâches traitées
+    """
+    limit = timezone.now() - stale_after
+    stale = Job.objects.filter(status=Job.Status.RUNNING).filter(
+        Q(heartbeat_at__lt=limit) | Q(heartbeat_at__isnull=True, locked_at__lt=limit)
+    )
+    requeued = stale.filter(attempts__lt=F('max_attempts')).update(
+        status=Job.Status.PENDING, locked_by='', locked_at=None, heartbeat_at=None
+    )
+    failed = stale.update(
+        status=Job.Status.FAILED, locked_by='', locked_at=None, heartbeat_at=None,
+        error='Tarea abandonada por el worker', finished_at=timezone.now()
+    )
+    return requeued + failed
@@ -0,0 +1,153 @@
+import importlib
+import io
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import Role
+from .models import Job
+from .queue import claim_next, enqueue, heartbeat, requeue_stale, run_job
+
+User = get_user_model()
+
+
+def add(a, b):
+    """Tâche de test"""
+    return {'sum': a + b}
+
+
+def explode():
+    """Tâche de test toujours en erreur"""
+    raise ValueError('boom')
+
+
+class JobQueueTest(TestCase):
+    """Tests de la file de tâches et du worker"""
+
+    def test_claim_and_run(self):
+        """Une tâche n'est réservée qu'une fois puis exécutée avec ses paramètres"""
+        job = enqueue(add, label='Suma', a=2, b=3)
+        self.assertEqual(job.task, 'jobs.tests.add')
+        claimed = claim_next('worker-1')
+        self.assertEqual(claimed.id, job.id)
+        self.assertEqual(claimed.status, Job.Status.RUNNING)
+        self.assertIsNone(claim_next('worker-2'))
+
+        run_job(claimed)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.SUCCEEDED)
+        self.assertEqual(job.result, {'sum': 5})
+        self.assertEqual(job.attempts, 1)
+
+    def test_retry_with_backoff_then_fail(self):
+        """Une tâche en erreur est replanifiée puis marquée en échec"""
+        job = enqueue('jobs.tests.explode', max_attempts=2)
+        with self.assertLogs('jobs.queue', level='ERROR'):
+            run_job(claim_next('worker-1'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.PENDING)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn('boom', job.error)
+        self.assertIsNone(claim_next('worker-1'))
+
+        Job.objects.filter(id=job.id).update(run_after=timezone.now())
+        with self.assertLogs('jobs.queue', level='ERROR'):
+            run_job(claim_next('worker-1'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_worker_command_and_stale_jobs(self):
+        """Le worker traite la file ; les tâches abandonnées sont remises en file"""
+        stale = enqueue(add, a=1, b=1)
+        Job.objects.filter(id=stale.id).update(
+            status=Job.Status.RUNNING, attempts=1, locked_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(requeue_stale(), 1)
+        enqueue(add, a=4, b=4)
+        call_command('run_worker', once=True, stdout=io.StringIO())
+        self.assertEqual(Job.objects.filter(status=Job.Status.SUCCEEDED).count(), 2)
+
+    def test_long_job_with_heartbeat_is_not_requeued(self):
+        """Seules les tâches sans signal récent de leur worker sont remises en file"""
+        now = timezone.now()
+        alive = enqueue(add, a=1, b=1)
+        dead = enqueue(add, a=2, b=2)
+        Job.objects.filter(id=alive.id).update(
+            status=Job.Status.RUNNING, attempts=1, locked_by='w1',
+            locked_at=now - timedelta(hours=2), heartbeat_at=now - timedelta(seconds=30)
+        )
+        Job.objects.filter(id=dead.id).update(
+            status=Job.Status.RUNNING, attempts=1, locked_by='w2',
+            locked_at=now - timedelta(hours=2), heartbeat_at=now - timedelta(hours=1)
+        )
+        self.assertEqual(requeue_stale(), 1)
+        alive.refresh_from_db()
+        dead.refresh_from_db()
+        self.assertEqual(alive.status, Job.Status.RUNNING)
+        self.assertEqual(dead.status, Job.Status.PENDING)
+        self.assertIsNone(dead.heartbeat_at)
+
+    def test_result_ignored_when_job_was_reclaimed(self):
+        """Un worker dont la tâche a été reprise par un autre n'écrase pas son état"""
+        job = enqueue(add, a=1, b=2)
+        claimed = claim_next('worker-1')
+        # Worker 1 jugé mort : la tâche est remise en file puis reprise par worker 2
+        Job.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        requeue_stale()
+        self.assertEqual(claim_next('worker-2').id, job.id)
+
+        with self.assertLogs('jobs.queue', level='WARNING'):
+            run_job(claimed)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.RUNNING)
+        self.assertEqual(job.locked_by, 'worker-2')
+        self.assertIsNone(job.result)
+
+    def test_status_endpoint_is_scoped(self):
+        """Chaque utilisateur ne voit que l'état de ses propres tâches"""
+        rm_role = Role.objects.create(name=Role.RoleType.REGIONAL_MANAGER)
+        owner = User.objects.create_user(username="owner", password="test123", role=rm_role)
+        User.objects.create_user(username="other", password="test123", role=rm_role)
+        job = enqueue(add, user=owner, a=1, b=2)
+        client = Client()
+
+        client.login(username="other", password="test123")
+        self.assertEqual(client.get(reverse('jobs:job_status', args=[job.id])).status_code, 404)
+
+        client.login(username="owner", password="test123")
+        data = client.get(reverse('jobs:job_status', args=[job.id])).json()
+        self.assertEqual(data['status'], Job.Status.PENDING)
+        self.assertFalse(data['finished'])
+
+
+class HeartbeatTest(TransactionTestCase):
+    """Signal de vie envoyé par un thread pendant l'exécution (connexion séparée)"""
+
+    def test_heartbeat_updates_running_job(self):
+        """heartbeat_at avance tant que le bloc s'exécute"""
+        enqueue(add, a=1, b=1)
+        job = claim_next('worker-1')
+        claimed_at = job.heartbeat_at
+        with heartbeat(job, interval=0.05):
+            time.sleep(0.3)
+        job.refresh_from_db()
+        self.assertGreater(job.heartbeat_at, claimed_at)
+
+
+class ProductionSettingsTest(TestCase):
+    """Cohérence des réglages de production avec les réglages de développement"""
+
+    def test_local_apps_and_middleware_installed(self):
+        """Les apps locales (dont jobs) et les middlewares sont aussi déclarés en production"""
+        production = importlib.import_module('dreamslabs_manager.settings_production')
+        self.assertIn('jobs', production.INSTALLED_APPS)
+        for app in settings.INSTALLED_APPS:
+            if not app.startswith('django.'):
+                self.assertIn(app, production.INSTALLED_APPS)
+        for middleware in settings.MIDDLEWARE:
+            self.assertIn(middleware, production.MIDDLEWARE)
@@ -0,0 +1,71 @@
+from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from accounts.decorators import role_required
+from accounts.models import Role
+from .models import Job
+
+
+def _visible_jobs(user):
+    """Le General Manager voit toutes les tâches, les autres uniquement les leurs"""
+    if user.is_superuser or user.is_general_manager():
+        return Job.objects.all()
+    return Job.objects.filter(created_by=user)
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+def job_list(request):
+    """Page de suivi des tâches en segundo plano"""
+    jobs = _visible_jobs(request.user).select_related('created_by')
+    selected_status = request.GET.get('status')
+    if selected_status in Job.Status.values:
+        jobs = jobs.filter(status=selected_status)
+    else:
+        selected_status = None
+
+    context = {
+        'jobs': jobs[:100],
+        'statuses': Job.Status.choices,
+        'selected_status': selected_status,
+    }
+    return render(request, 'jobs/job_list.html', context)
+
+
+@login_required
+def job_detail(request, job_id):
+    """Détail d'une tâche (la page interroge job_status tant qu'elle n'est pas terminée)"""
+    job = get_object_or_404(_visible_jobs(request.user), id=job_id)
+    return render(request, 'jobs/job_detail.html', {'job': job})
+
+
+@login_required
+def job_status(request, job_id):
+    """État JSON d'une tâche (interrogé périodiquement par l'interface)"""
+    job = get_object_or_404(_visible_jobs(request.user), id=job_id)
+    return JsonResponse({
+        'success': True,
+        'id': job.id,
+        'status': job.status,
+        'status_display': str(job.get_status_display()),
+        'finished': job.is_finished,
+        'attempts': job.attempts,
+        'result': job.result,
+        'error': job.error.strip().splitlines()[-1] if job.error else '',
+    })
+
+
+@role_required(Role.RoleType.GENERAL_MANAGER)
+def job_retry(request, job_id):
+    """Relance une tâche en échec"""
+    job = get_object_or_404(Job, id=job_id, status=Job.Status.FAILED)
+    if request.method == 'POST':
+        job.status = Job.Status.PENDING
+        job.attempts = 0
+        job.run_after = timezone.now()
+        job.finished_at = None
+        job.save(update_fields=['status', 'attempts', 'run_after', 'finished_at'])
+        messages.success(request, _('Tarea #{} reprogramada.').format(job.id))
+    return redirect('jobs:job_detail', job_id=job.id)
@@ -7,13 +7,14 @@ from .models import Model, ModelGain, WorkedHours, Schedule, ScheduleAssignment,
 class ModelAdmin(admin.ModelAdmin):
     list_display = ['full_name', 'agency', 'status', 'email', 'phone', 'created_at']
     list_filter = ['status', 'agency', 'created_at']
-    search_fields = ['first_name', 'last_name', 'email', 'phone']
+    search_fields = ['first_name', 'last_name', 'cedula', 'email', 'phone']
+    autocomplete_fields = ['referred_by']
     readonly_fields = ['created_at', 'updated_at']
     date_hierarchy = 'created_at'
     
     fieldsets = (
         (_('Información personal'), {
-            'fields': ('first_name', 'last_name', 'email', 'phone', 'agency', 'status')
+            'fields': ('first_name', 'last_name', 'email', 'phone', 'agency', 'status', 'referred_by')
         }),
         (_('Información del sistema'), {
             'fields': ('created_at', 'updated_at'),
@@ -33,6 +34,7 @@ class ModelGainAdmin(admin.ModelAdmin):
     list_display = ['model', 'date', 'amount', 'created_at']
     list_filter = ['date', 'created_at', 'model__agency']
     search_fields = ['model__first_name', 'model__last_name']
+    autocomplete_fields = ['model']
     readonly_fields = ['created_at', 'updated_at']
     date_hierarchy = 'date'
     
@@ -58,6 +60,7 @@ class WorkedHoursAdmin(admin.ModelAdmin):
     list_display = ['model', 'date', 'hours', 'created_at']
     list_filter = ['date', 'created_at', 'model__agency']
     search_fields = ['model__first_name', 'model__last_name']
+    autocomplete_fields = ['model']
     readonly_fields = ['created_at', 'updated_at']
     date_hierarchy = 'date'
     
@@ -112,6 +115,7 @@ class ScheduleAssignmentAdmin(admin.ModelAdmin):
     list_display = ['model', 'schedule', 'is_active', 'created_at']
     list_filter = ['is_active', 'created_at', 'schedule__agency']
     search_fields = ['model__first_name', 'model__last_name', 'schedule__name']
+    autocomplete_fields = ['model']
     readonly_fields = ['created_at']
     
     fieldsets = (
@@ -139,8 +143,9 @@ class ScheduleAssignmentAdmin(admin.ModelAdmin):
 @admin.register(WorkSession)
 class WorkSessionAdmin(admin.ModelAdmin):
     list_display = ['model', 'date', 'status', 'total_worked_hours', 'session_gain_amount_usd', 'session_gain_amount', 'late_penalty_amount', 'absence_penalty_amount', 'created_at']
-    list_filter = ['status', 'date', 'created_at', 'model__agency']
+    list_filter = ['status', 'date', 'created_at', 'agency']
     search_fields = ['model__first_name', 'model__last_name']
+    autocomplete_fields = ['model']
     readonly_fields = ['created_at', 'updated_at', 'total_worked_hours']
     date_hierarchy = 'date'
     
@@ -169,7 +174,7 @@ class WorkSessionAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         if request.user.is_regional_manager() and request.user.agency:
-            return qs.filter(model__agency=request.user.agency)
+            return qs.filter(agency=request.user.agency)
         return qs
     
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
@@ -0,0 +1,191 @@
+"""
+Moteur de calcul des bonus par période (quotidienne, hebdomadaire, quinzaine, mensuelle).
+
+Utilisé par la fiche du modèle et par les rapports consolidés. Le calcul est pur : les
+sessions, les règles et les jours des horaires actifs sont fournis par l'appelant, ce qui
+permet de charger les données de plusieurs modèles en quelques requêtes.
+"""
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+from calendar import monthrange
+from decimal import Decimal
+
+from accounts.refdata import get_bonus_rules_by_agency
+from agencies.models import BonusRule
+from .models import ScheduleAssignment, WorkSession
+from .utils import count_scheduled_days
+
+# Gains d'une session nécessaires au calcul (compatible avec les instances de WorkSession)
+SessionGain = namedtuple('SessionGain', ['id', 'date', 'session_gain_amount', 'session_gain_amount_usd'])
+
+
+def get_period_bounds(period_type, day):
+    """
+    Retourne les bornes de la période d'un type donné contenant une date.
+
+    Returns:
+        tuple: (début, fin)
+    """
+    if period_type == BonusRule.PeriodType.DAILY:
+        return day, day
+    if period_type == BonusRule.PeriodType.WEEKLY:
+        week_start = day - timedelta(days=day.weekday())
+        return week_start, week_start + timedelta(days=6)
+    last_day = monthrange(day.year, day.month)[1]
+    if period_type == BonusRule.PeriodType.BIWEEKLY:
+        if day.day <= 15:
+            return day.replace(day=1), day.replace(day=15)
+        return day.replace(day=16), day.replace(day=last_day)
+    return day.replace(day=1), day.replace(day=last_day)
+
+
+def compute_period_bonuses(sessions, bonus_rules, week_days_values):
+    """
+    Calcule les bonus d'un modèle, une seule fois par période, au dernier jour réel de la période.
+
+    Pour chaque période, les règles sont appliquées dans l'ordre croissant ; la moyenne
+    journalière (somme des gains / jours planifiés par l'horaire) doit atteindre l'objectif
+    et une session doit exister au dernier jour de la période. stop_on_match arrête
+    l'évaluation des règles suivantes de la période.
+
+    Args:
+        sessions: Sessions complétées du modèle (WorkSession ou SessionGain)
+        bonus_rules (list): Règles actives de l'agence triées par ordre
+        week_days_values: Valeurs week_days des horaires actifs du modèle
+
+    Returns:
+        dict: {(rule_id, period_key): {'bonus', 'target_date', 'session', 'rule',
+               'period_gain', 'avg_period_gain', 'worked_days_count'}}
+    """
+    period_bonuses = {}
+    if not bonus_rules:
+        return period_bonuses
+    week_days_values = list(week_days_values)
+
+    # Regrouper les sessions par période pour chaque type de période
+    all_periods = {}
+    for session in sessions:
+        for period_type in BonusRule.PeriodType.values:
+            period_start, period_end = get_period_bounds(period_type, session.date)
+            period_key = f"{period_type}_{period_start.isoformat()}"
+            period = all_periods.setdefault(period_key, {
+                'period_type': period_type,
+                'period_start': period_start,
+                'period_end': period_end,
+                'sessions': [],
+            })
+            period['sessions'].append(session)
+
+    for period_key, period_data in all_periods.items():
+        period_sessions = period_data['sessions']
+        period_start = period_data['period_start']
+        period_end = period_data['period_end']
+
+        # Compter le nombre de jours travaillés dans la période selon l'horaire
+        worked_days_count = count_scheduled_days(week_days_values, period_start, period_end)
+        if worked_days_count == 0:
+            continue
+
+        for rule in bonus_rules:
+            if rule.period_type != period_data['period_type']:
+                continue
+
+            # Utiliser USD ou COP selon la devise de l'objectif
+            if rule.target_currency == BonusRule.TargetCurrency.USD:
+                total_period_gain = sum(s.session_gain_amount_usd or Decimal('0.00') for s in period_sessions)
+            else:
+                total_period_gain = sum(s.session_gain_amount or Decimal('0.00') for s in period_sessions)
+
+            avg_daily_gain = total_period_gain / Decimal(str(worked_days_count))
+            if avg_daily_gain < rule.target_amount:
+                continue
+
+            # Le bonus est toujours calculé en COP
+            if rule.bonus_type == BonusRule.BonusType.PERCENTAGE:
+                total_period_gain_cop = sum(s.session_gain_amount or Decimal('0.00') for s in period_sessions)
+                bonus_amount = total_period_gain_cop * rule.bonus_value / Decimal('100.00')
+            else:
+                bonus_amount = rule.bonus_value
+
+            # Le bonus n'est attribué que si une session existe exactement au dernier jour réel
+            target_session = next((s for s in period_sessions if s.date == period_end), None)
+            if target_session:
+                period_bonuses[(rule.id, period_key)] = {
+                    'bonus': bonus_amount,
+                    'target_date': period_end,
+                    'session': target_session,
+                    'rule': rule,
+                    'period_gain': total_period_gain,
+                    'avg_period_gain': avg_daily_gain,
+                    'worked_days_count': worked_days_count,
+                }
+                if rule.stop_on_match:
+                    break
+
+    return period_bonuses
+
+
+def bonus_fetch_start(start):
+    """
+    Première date de session lue pour les bonus attribués à partir de start : début de la
+    plus longue période (mois ou semaine) contenant start.
+    """
+    return min(start.replace(day=1), start - timedelta(days=start.weekday()))
+
+
+def compute_bonuses_by_model(start, end, agency_ids=None):
+    """
+    Bonus attribués entre start et end pour tous les modèles, en deux requêtes (les
+    règles actives viennent du cache des données de référence).
+
+    Un bonus est rattaché au dernier jour de sa période ; les sessions sont donc chargées
+    depuis le début de la plus longue période (mois ou semaine) contenant start.
+
+    Args:
+        start (date): Début de la période (inclus)
+        end (date): Fin de la période (incluse)
+        agency_ids (list, optional): Agences à inclure (toutes par défaut)
+
+    Returns:
+        dict: {(agency_id, model_id): montant des bonus en COP}
+    """
+    rules_by_agency = get_bonus_rules_by_agency(agency_ids)
+    if not rules_by_agency:
+        return {}
+
+    fetch_start = bonus_fetch_start(start)
+    sessions_by_model = defaultdict(list)
+    agency_by_model = {}
+    rows = (
+        WorkSession.objects.filter(
+            status=WorkSession.Status.COMPLETED,
+            date__gte=fetch_start,
+            date__lte=end,
+            agency_id__in=list(rules_by_agency),
+        )
+        .order_by('date')
+        .values_list('id', 'date', 'session_gain_amount', 'session_gain_amount_usd', 'model_id', 'agency_id')
+    )
+    for session_id, day, gain_cop, gain_usd, model_id, agency_id in rows:
+        sessions_by_model[model_id].append(SessionGain(session_id, day, gain_cop, gain_usd))
+        agency_by_model[model_id] = agency_id
+    if not sessions_by_model:
+        return {}
+
+    week_days_by_model = defaultdict(list)
+    for model_id, week_days in ScheduleAssignment.objects.filter(
+        model_id__in=list(sessions_by_model), is_active=True
+    ).values_list('model_id', 'schedule__week_days'):
+        week_days_by_model[model_id].append(week_days)
+
+    bonuses = {}
+    for model_id, sessions in sessions_by_model.items():
+        agency_id = agency_by_model[model_id]
+        period_bonuses = compute_period_bonuses(sessions, rules_by_agency[agency_id], week_days_by_model[model_id])
+        amount = sum(
+            (bonus['bonus'] for bonus in period_bonuses.values() if start <= bonus['target_date'] <= end),
+            Decimal('0.00'),
+        )
+        if amount:
+            bonuses[(agency_id, model_id)] = amount
+    return bonuses
@@ -0,0 +1,199 @@
+"""
+Opérations d'écriture groupées (upsert) pour les saisies en masse des modèles.
+"""
+from decimal import Decimal, InvalidOperation
+from functools import partial
+from django.db import transaction
+from django.utils import timezone
+
+from reports.signals import ledger_bulk_changed
+from .models import ModelGain, WorkSession, WorkedHours
+
+# Sessions en cours pouvant être complétées lors de la saisie groupée des gains
+IN_PROGRESS_STATUSES = [
+    WorkSession.Status.STARTED,
+    WorkSession.Status.ON_BREAK,
+    WorkSession.Status.ON_MEAL,
+    WorkSession.Status.ON_COACHING,
+]
+
+# Montant maximal enregistrable (ModelGain.amount : 10 chiffres dont 2 décimales)
+MAX_AMOUNT = Decimal('99999999.99')
+
+
+def parse_hours(value):
+    """
+    Convertit une saisie d'heures en Decimal.
+
+    Returns:
+        Decimal ou None si la valeur est vide
+
+    Raises:
+        ValueError: Si la valeur n'est pas un nombre entre 0 et 24
+    """
+    value = (value or '').strip().replace(',', '.')
+    if not value:
+        return None
+    try:
+        hours = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(value)
+    if hours < 0 or hours > 24:
+        raise ValueError(value)
+    return hours.quantize(Decimal('0.01'))
+
+
+def parse_amount(value):
+    """
+    Convertit une saisie de montant en Decimal.
+
+    Returns:
+        Decimal ou None si la valeur est vide
+
+    Raises:
+        ValueError: Si la valeur n'est pas un nombre entre 0 et MAX_AMOUNT
+    """
+    value = (value or '').strip().replace(',', '.')
+    if not value:
+        return None
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(value)
+    if not amount.is_finite() or amount < 0 or amount > MAX_AMOUNT:
+        raise ValueError(value)
+    return amount.quantize(Decimal('0.01'))
+
+
+def to_cop(gain_usd, trm_rate):
+    """
+    Convertit un gain USD en COP avec le taux TRM.
+
+    Raises:
+        ValueError: Si le montant COP dépasse MAX_AMOUNT
+    """
+    amount = (gain_usd * trm_rate).quantize(Decimal('0.01'))
+    if amount > MAX_AMOUNT:
+        raise ValueError(amount)
+    return amount
+
+
+def upsert_worked_hours(entries, user, batch_size=500):
+    """
+    Enregistre des heures travaillées en une seule instruction INSERT ... ON CONFLICT
+    par lot, dans une transaction.
+
+    Args:
+        entries: Itérable de tuples (model_id, date, hours)
+        user: Utilisateur à l'origine de la saisie (created_by des nouvelles lignes)
+        batch_size (int): Taille des lots d'insertion
+
+    Returns:
+        int: Nombre de lignes enregistrées
+    """
+    objs = [
+        WorkedHours(model_id=model_id, date=day, hours=hours, created_by=user)
+        for model_id, day, hours in entries
+    ]
+    if not objs:
+        return 0
+
+    with transaction.atomic():
+        WorkedHours.objects.bulk_create(
+            objs,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['model', 'date'],
+            update_fields=['hours', 'updated_at'],
+        )
+    return len(objs)
+
+
+def upsert_gains(entries, day, trm_rate, user, complete_sessions=False, batch_size=500):
+    """
+    Enregistre les gains USD de plusieurs modèles pour une date, convertis en COP avec
+    un seul taux TRM, et complète éventuellement les sessions correspondantes.
+
+    Les gains sont écrits par un upsert groupé ; les sessions sont chargées en une requête
+    (pauses préchargées) puis mises à jour par un bulk_update, le tout dans une transaction.
+
+    Args:
+        entries: Itérable de tuples (model_id, gain_usd, description) ; le montant COP
+                 de chaque gain doit tenir dans MAX_AMOUNT (voir to_cop)
+        day (date): Date des gains
+        trm_rate (Decimal): Taux TRM de la date
+        user: Utilisateur à l'origine de la saisie (created_by des nouveaux gains)
+        complete_sessions (bool): Compléter les sessions en cours et recalculer les
+            sessions déjà complétées avec leurs snapshots financiers
+        batch_size (int): Taille des lots d'écriture
+
+    Returns:
+        tuple: (nombre de gains enregistrés, nombre de sessions mises à jour)
+    """
+    entries = list(entries)
+    if not entries:
+        return 0, 0
+
+    gains = [
+        ModelGain(
+            model_id=model_id,
+            date=day,
+            amount=to_cop(gain_usd, trm_rate),
+            description=description,
+            created_by=user,
+        )
+        for model_id, gain_usd, description in entries
+    ]
+
+    with transaction.atomic():
+        ModelGain.objects.bulk_create(
+            gains,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['model', 'date'],
+            update_fields=['amount', 'description', 'updated_at'],
+        )
+
+        sessions_count = 0
+        if complete_sessions:
+            gains_usd = {model_id: gain_usd for model_id, gain_usd, _description in entries}
+            sessions = list(
+                WorkSession.objects.filter(
+                    model_id__in=gains_usd.keys(),
+                    date=day,
+                    status__in=IN_PROGRESS_STATUSES + [WorkSession.Status.COMPLETED],
+                ).select_related('model__agency').prefetch_related('pauses')
+            )
+            now = timezone.now()
+            for session in sessions:
+                # Une session déjà complétée garde les pourcentages figés à sa complétion
+                already_completed = session.status == WorkSession.Status.COMPLETED
+                if not already_completed:
+                    session.end_time = now
+                    session.status = WorkSession.Status.COMPLETED
+                    worked_hours = session.calculate_worked_hours()
+                    if worked_hours is not None:
+                        session.total_worked_hours = Decimal(str(worked_hours))
+                session.apply_financials(
+                    gains_usd[session.model_id], trm_rate, keep_snapshot=already_completed
+                )
+                session.updated_at = now
+            WorkSession.objects.bulk_update(
+                sessions,
+                [
+                    'end_time', 'status', 'total_worked_hours',
+                    'model_gain_percentage_snapshot', 'bank_fee_percentage_snapshot',
+                    'session_gain_amount_usd', 'session_gain_amount', 'trm_rate',
+                    'session_bank_fees', 'session_model_ganancia', 'updated_at',
+                ],
+                batch_size=batch_size,
+            )
+            sessions_count = len(sessions)
+            # Après le commit : un P&L lu pendant la transaction ne reconstruit pas un cube périmé
+            transaction.on_commit(partial(
+                ledger_bulk_changed.send,
+                sender=WorkSession,
+                items=[(session.model.agency_id, session.date) for session in sessions],
+            ))
+
+    return len(gains), sessions_count
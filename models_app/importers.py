@@ -0,0 +1,248 @@
+"""
+Import groupé des gains de plateforme (exports Flirtify) depuis un fichier CSV ou JSON Lines.
+
+Le fichier est lu ligne par ligne et traité par lots : les modèles sont résolus via un
+index en mémoire, chaque date distincte ne déclenche qu'une seule consultation TRM et
+chaque lot est écrit dans une transaction (upsert des ModelGain, bulk_update des
+valeurs financières des sessions complétées).
+
+Un fichier mal encodé est détecté en cours de lecture : les lignes lues jusque-là sont
+écrites et le résultat indique la première ligne non lue (decode_error_line).
+"""
+import csv
+import json
+from datetime import datetime
+from functools import partial
+from django.db import transaction
+from django.utils import timezone
+
+from reports.signals import ledger_bulk_changed
+from .bulk import parse_amount, to_cop
+from .models import Model, ModelGain, WorkSession
+from .utils import get_trm_rate
+
+REJECT_REPORT_HEADER = ['line', 'model_id', 'cedula', 'email', 'date', 'amount_usd', 'reason']
+
+# Nombre maximal de rejets conservés dans le résultat (le rapport complet est écrit à part)
+MAX_KEPT_REJECTS = 100
+
+SESSION_FINANCIAL_FIELDS = [
+    'model_gain_percentage_snapshot', 'bank_fee_percentage_snapshot',
+    'session_gain_amount_usd', 'session_gain_amount', 'trm_rate',
+    'session_bank_fees', 'session_model_ganancia', 'updated_at',
+]
+
+
+def detect_format(filename):
+    """
+    Détermine le format d'un fichier d'import à partir de son extension.
+
+    Un .json est refusé : il contient en général un tableau JSON unique, que iter_rows
+    (un objet par ligne) ne sait pas lire.
+
+    Returns:
+        str: 'csv' ou 'jsonl'
+
+    Raises:
+        ValueError: Si l'extension n'est pas prise en charge
+    """
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    raise ValueError(filename)
+
+
+def iter_rows(stream, file_format):
+    """
+    Itère sur les lignes d'un fichier texte sans le charger entièrement en mémoire.
+
+    Args:
+        stream: Fichier texte ouvert
+        file_format (str): 'csv' ou 'jsonl' (un objet JSON par ligne)
+
+    Yields:
+        tuple: (numéro de ligne, dict de la ligne ou None si la ligne est illisible)
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+class ModelIndex:
+    """Index en mémoire des modèles par id, cédula et email (une seule requête)"""
+
+    def __init__(self, agency=None):
+        queryset = Model.objects.all()
+        if agency is not None:
+            queryset = queryset.filter(agency=agency)
+        self.ids = set()
+        self.by_cedula = {}
+        self.by_email = {}
+        for model_id, cedula, email in queryset.values_list('id', 'cedula', 'email'):
+            self.ids.add(model_id)
+            if cedula:
+                self.by_cedula[cedula.strip()] = model_id
+            if email:
+                self.by_email[email.strip().lower()] = model_id
+
+    def resolve(self, row):
+        """Retourne l'id du modèle désigné par la ligne (model_id, puis cedula, puis email), ou None"""
+        model_id = str(row.get('model_id') or '').strip()
+        if model_id:
+            return int(model_id) if model_id.isdigit() and int(model_id) in self.ids else None
+        cedula = str(row.get('cedula') or '').strip()
+        if cedula:
+            return self.by_cedula.get(cedula)
+        email = str(row.get('email') or '').strip().lower()
+        if email:
+            return self.by_email.get(email)
+        return None
+
+
+def import_earnings(stream, file_format, user, agency=None, chunk_size=1000, reject_writer=None):
+    """
+    Importe les gains USD d'un fichier (model_id/cedula/email, date, amount_usd[, description]).
+
+    Args:
+        stream: Fichier texte ouvert
+        file_format (str): 'csv' ou 'jsonl'
+        user: Utilisateur à l'origine de l'import (created_by des nouveaux gains)
+        agency (Agency, optional): Limite l'import aux modèles de cette agence
+        chunk_size (int): Nombre de lignes écrites par transaction
+        reject_writer (csv.writer, optional): Reçoit chaque ligne rejetée (REJECT_REPORT_HEADER)
+
+    Returns:
+        dict: {'rows', 'gains', 'sessions', 'rejected', 'rejects', 'decode_error_line'}
+              (decode_error_line : None, ou première ligne non lue après un octet
+              non UTF-8 ; les gains des lignes précédentes sont enregistrés)
+    """
+    index = ModelIndex(agency)
+    trm_cache = {}
+    result = {'rows': 0, 'gains': 0, 'sessions': 0, 'rejected': 0, 'rejects': [], 'decode_error_line': None}
+
+    def reject(line_number, row, reason):
+        row = row or {}
+        values = [line_number] + [row.get(key, '') for key in REJECT_REPORT_HEADER[1:-1]] + [reason]
+        result['rejected'] += 1
+        if len(result['rejects']) < MAX_KEPT_REJECTS:
+            result['rejects'].append(dict(zip(REJECT_REPORT_HEADER, values)))
+        if reject_writer is not None:
+            reject_writer.writerow(values)
+
+    chunk = {}
+    rows = iter_rows(stream, file_format)
+    last_line = 0
+    while True:
+        try:
+            line_number, row = next(rows)
+        except StopIteration:
+            break
+        except UnicodeDecodeError:
+            result['decode_error_line'] = last_line + 1
+            break
+        last_line = line_number
+        result['rows'] += 1
+        if row is None:
+            reject(line_number, None, 'Línea ilegible')
+            continue
+
+        model_id = index.resolve(row)
+        if model_id is None:
+            reject(line_number, row, 'Modelo no encontrado')
+            continue
+        try:
+            day = datetime.strptime(str(row.get('date') or '').strip(), '%Y-%m-%d').date()
+        except ValueError:
+            reject(line_number, row, 'Fecha inválida')
+            continue
+        try:
+            gain_usd = parse_amount(str(row.get('amount_usd') or ''))
+        except ValueError:
+            gain_usd = None
+        if gain_usd is None:
+            reject(line_number, row, 'Monto inválido')
+            continue
+
+        # Une seule consultation TRM par date distincte du fichier
+        if day not in trm_cache:
+            trm_cache[day] = get_trm_rate(day)
+        if trm_cache[day] is None:
+            reject(line_number, row, 'TRM no disponible')
+            continue
+        try:
+            to_cop(gain_usd, trm_cache[day])
+        except ValueError:
+            reject(line_number, row, 'Monto fuera de rango')
+            continue
+
+        # La dernière ligne d'un même couple (modèle, date) l'emporte
+        chunk[(model_id, day)] = (gain_usd, str(row.get('description') or '').strip())
+        if len(chunk) >= chunk_size:
+            _write_chunk(chunk, trm_cache, user, result)
+            chunk = {}
+
+    if chunk:
+        _write_chunk(chunk, trm_cache, user, result)
+    return result
+
+
+def _write_chunk(chunk, trm_cache, user, result):
+    """Écrit un lot de gains et met à jour les sessions complétées correspondantes"""
+    gains = [
+        ModelGain(
+            model_id=model_id,
+            date=day,
+            amount=to_cop(gain_usd, trm_cache[day]),
+            description=description,
+            created_by=user,
+        )
+        for (model_id, day), (gain_usd, description) in chunk.items()
+    ]
+
+    with transaction.atomic():
+        ModelGain.objects.bulk_create(
+            gains,
+            update_conflicts=True,
+            unique_fields=['model', 'date'],
+            update_fields=['amount', 'description', 'updated_at'],
+        )
+
+        # Filtre large (modèles × dates du lot) puis sélection exacte des couples en mémoire
+        sessions = [
+            session for session in WorkSession.objects.filter(
+                model_id__in={model_id for model_id, _day in chunk},
+                date__in={day for _model_id, day in chunk},
+                status=WorkSession.Status.COMPLETED,
+            ).select_related('model__agency')
+            if (session.model_id, session.date) in chunk
+        ]
+        now = timezone.now()
+        for session in sessions:
+            gain_usd, _description = chunk[(session.model_id, session.date)]
+            # Sessions complétées : recalcul avec les pourcentages figés à la complétion
+            session.apply_financials(gain_usd, trm_cache[session.date], keep_snapshot=True)
+            session.updated_at = now
+        WorkSession.objects.bulk_update(sessions, SESSION_FINANCIAL_FIELDS)
+        # Après le commit : un P&L lu pendant la transaction ne reconstruit pas un cube périmé
+        transaction.on_commit(partial(
+            ledger_bulk_changed.send,
+            sender=WorkSession,
+            items=[(session.model.agency_id, session.date) for session in sessions],
+        ))
+
+    result['gains'] += len(gains)
+    result['sessions'] += len(sessions)
@@ -0,0 +1,56 @@
+"""
+Indicateurs de performance récents des modèles, calculés en sous-requêtes corrélées.
+
+Les indicateurs sont ajoutés comme annotations d'un queryset de Model : la page d'une
+liste paginée est lue en une seule requête, quel que soit le nombre de modèles affichés.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Avg, Count, DecimalField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import WorkSession
+from .utils import get_quincena_bounds
+
+# Fenêtre des indicateurs récents (jours)
+KPI_DAYS = 30
+
+
+def _session_aggregate(aggregate, output_field, **filters):
+    """Sous-requête agrégeant les sessions complétées du modèle courant"""
+    sessions = (
+        WorkSession.objects.filter(model=OuterRef('pk'), status=WorkSession.Status.COMPLETED, **filters)
+        .order_by()
+        .values('model')
+        .annotate(value=aggregate)
+        .values('value')
+    )
+    return Subquery(sessions, output_field=output_field)
+
+
+def annotate_kpis(queryset, today):
+    """
+    Ajoute les indicateurs des KPI_DAYS derniers jours et de la quinzaine en cours.
+
+    Annotations : gain_30d_cop, gain_30d_usd, hours_30d, sessions_30d, late_30d
+    (sessions avec retard) et quincena_avg (gain moyen par session de la quinzaine,
+    None sans session).
+    """
+    since = today - timedelta(days=KPI_DAYS - 1)
+    quincena_start, quincena_end = get_quincena_bounds(today)
+    recent = {'date__gte': since, 'date__lte': today}
+    amount = DecimalField(max_digits=14, decimal_places=2)
+    zero = Value(Decimal('0.00'), output_field=amount)
+    count = IntegerField()
+
+    return queryset.annotate(
+        gain_30d_cop=Coalesce(_session_aggregate(Sum('session_gain_amount'), amount, **recent), zero),
+        gain_30d_usd=Coalesce(_session_aggregate(Sum('session_gain_amount_usd'), amount, **recent), zero),
+        hours_30d=Coalesce(_session_aggregate(Sum('total_worked_hours'), amount, **recent), zero),
+        sessions_30d=Coalesce(_session_aggregate(Count('id'), count, **recent), 0),
+        late_30d=Coalesce(_session_aggregate(Count('id'), count, late_minutes__gt=0, **recent), 0),
+        quincena_avg=_session_aggregate(
+            Avg('session_gain_amount'), amount, date__gte=quincena_start, date__lte=quincena_end
+        ),
+    )
@@ -0,0 +1,60 @@
+import csv
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from agencies.models import Agency
+from models_app.importers import REJECT_REPORT_HEADER, detect_format, import_earnings
+
+
+class Command(BaseCommand):
+    help = 'Importa las ganancias USD de los modelos desde un archivo CSV o JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='Archivo CSV (.csv) o JSON Lines (.jsonl, .ndjson)')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Formato del archivo (por defecto según la extensión)')
+        parser.add_argument('--agency', help='Código de la agencia a la que se limita el import')
+        parser.add_argument('--rejects', help='Archivo CSV donde escribir las líneas rechazadas (por defecto la salida estándar)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Líneas escritas por transacción')
+
+    def handle(self, *args, **options):
+        try:
+            file_format = options['format'] or detect_format(options['file'])
+        except ValueError:
+            raise CommandError(f"Formato de archivo no soportado: {options['file']}")
+
+        agency = None
+        if options['agency']:
+            agency = Agency.objects.filter(code=options['agency']).first()
+            if agency is None:
+                raise CommandError(f"Agencia no encontrada: {options['agency']}")
+
+        rejects_file = open(options['rejects'], 'w', newline='', encoding='utf-8') if options['rejects'] else sys.stdout
+        try:
+            reject_writer = csv.writer(rejects_file)
+            reject_writer.writerow(REJECT_REPORT_HEADER)
+            with open(options['file'], newline='', encoding='utf-8-sig') as stream:
+                result = import_earnings(
+                    stream,
+                    file_format,
+                    user=None,
+                    agency=agency,
+                    chunk_size=options['chunk_size'],
+                    reject_writer=reject_writer,
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+        finally:
+            if rejects_file is not sys.stdout:
+                rejects_file.close()
+
+        if result['decode_error_line']:
+            self.stderr.write(self.style.ERROR(
+                f"Archivo no UTF-8: importación detenida en la línea {result['decode_error_line']} "
+                f"(las líneas anteriores fueron registradas)"
+            ))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n{result['rows']} línea(s) leída(s): {result['gains']} ganancia(s) registrada(s), "
+                f"{result['sessions']} sesión(es) actualizada(s), {result['rejected']} rechazada(s)"
+            )
+        )
@@ -0,0 +1,56 @@
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from accounts.models import Role
+from agencies.models import Agency
+from models_app.onboarding import onboard_models
+
+
+class Command(BaseCommand):
+    help = 'Crea los modelos de una agencia (y sus cuentas de usuario) desde un archivo CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='Archivo CSV (first_name, last_name, fecha_ingreso, ...)')
+        parser.add_argument('--agency', required=True, help='Código de la agencia de los modelos')
+        parser.add_argument('--no-users', action='store_true', help='No crear cuentas de usuario (salvo columna create_user)')
+        parser.add_argument('--workers', type=int, help='Procesos para el hash de contraseñas (1 = sin paralelismo)')
+        parser.add_argument('--credentials', help='Archivo CSV donde escribir los usuarios y contraseñas temporales')
+
+    def handle(self, *args, **options):
+        agency = Agency.objects.filter(code=options['agency']).first()
+        if agency is None:
+            raise CommandError(f"Agencia no encontrada: {options['agency']}")
+
+        try:
+            with open(options['file'], newline='', encoding='utf-8-sig') as stream:
+                result = onboard_models(
+                    stream, agency, create_users=not options['no_users'], workers=options['workers']
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+        except Role.DoesNotExist:
+            raise CommandError('El rol MODELE no existe')
+        except IntegrityError:
+            raise CommandError('Un usuario se creó al mismo tiempo; no se importó ningún modelo. Intente de nuevo.')
+
+        for error in result['errors']:
+            self.stdout.write(self.style.WARNING(f"Línea {error['line']}: {', '.join(error['errors'])}"))
+
+        if result['accounts']:
+            if options['credentials']:
+                with open(options['credentials'], 'w', newline='', encoding='utf-8') as credentials_file:
+                    writer = csv.DictWriter(credentials_file, fieldnames=['model', 'username', 'password'])
+                    writer.writeheader()
+                    writer.writerows(result['accounts'])
+            else:
+                self.stdout.write(self.style.WARNING(
+                    'Cuentas creadas sin --credentials: las contraseñas temporales no se guardaron '
+                    '(restablecerlas desde la ficha del modelo)'
+                ))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n{result['rows']} línea(s) leída(s): {result['created']} modelo(s) creado(s), "
+                f"{len(result['accounts'])} cuenta(s) de usuario, {len(result['errors'])} línea(s) con errores"
+            )
+        )
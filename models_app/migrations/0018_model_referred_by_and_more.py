@@ -0,0 +1,60 @@
+# Generated by Django 6.0.1 on 2026-10-19 17:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("agencies", "0008_alter_bonusrule_options_alter_bonusrule_order_and_more"),
+        ("models_app", "0017_worksession_session_gain_amount_usd_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="model",
+            name="referred_by",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Modelo que refirió a este modelo",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="referred_models",
+                to="models_app.model",
+                verbose_name="Referido por",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="worksession",
+            name="bank_fee_percentage_snapshot",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=2,
+                help_text="Porcentaje sauvegardé au moment de la complétion",
+                max_digits=5,
+                null=True,
+                verbose_name="Porcentaje de Impuestos (Snapshot)",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="worksession",
+            name="session_bank_fees",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0,
+                help_text="Impuestos calculados para esta session",
+                max_digits=12,
+                verbose_name="Impuestos de la Sesión (COP)",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="model",
+            index=models.Index(
+                fields=["fecha_ingreso", "fecha_retiro"],
+                name="models_app__fecha_i_0faa32_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-19 19:02
+
+from django.db import migrations
+
+INDEX_NAME = "models_app_model_search_trgm"
+
+
+def create_trigram_index(apps, schema_editor):
+    # Index trigramme réservé à PostgreSQL (les autres bases cherchent sans index)
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON models_app_model USING gin ("
+        "UPPER(first_name::text) gin_trgm_ops, "
+        "UPPER(last_name::text) gin_trgm_ops, "
+        "UPPER(cedula::text) gin_trgm_ops, "
+        "UPPER(email::text) gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("models_app", "0018_model_referred_by_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
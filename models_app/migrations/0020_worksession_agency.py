@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-19 18:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_agency(apps, schema_editor):
+    """Recopier l'agence du modèle sur ses sessions (une seule requête UPDATE)"""
+    Model = apps.get_model("models_app", "Model")
+    WorkSession = apps.get_model("models_app", "WorkSession")
+    WorkSession.objects.filter(agency__isnull=True).update(
+        agency_id=models.Subquery(
+            Model.objects.filter(pk=models.OuterRef("model_id")).values("agency_id")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("agencies", "0008_alter_bonusrule_options_alter_bonusrule_order_and_more"),
+        ("models_app", "0019_model_search_trgm_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="worksession",
+            name="agency",
+            field=models.ForeignKey(
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="work_sessions",
+                to="agencies.agency",
+                verbose_name="Agencia",
+            ),
+        ),
+        migrations.RunPython(populate_agency, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0.1 on 2026-10-19 18:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("models_app", "0020_worksession_agency"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="worksession",
+            name="agency",
+            field=models.ForeignKey(
+                editable=False,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="work_sessions",
+                to="agencies.agency",
+                verbose_name="Agencia",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="worksession",
+            index=models.Index(
+                fields=["agency", "date"], name="models_app__agency__ebe3ae_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="worksession",
+            index=models.Index(
+                fields=["agency", "status", "date"],
+                name="models_app__agency__84b2a6_idx",
+            ),
+        ),
+    ]
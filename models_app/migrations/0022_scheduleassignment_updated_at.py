@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-19 22:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("models_app", "0021_worksession_agency_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scheduleassignment",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                default=django.utils.timezone.now,
+                verbose_name="Fecha de actualización",
+            ),
+            preserve_default=False,
+        ),
+    ]
@@ -1,25 +1,35 @@
-from django.db import models
+from functools import partial
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from django.db.models import Q
+from accounts.tenancy import TenantManager
 
 User = get_user_model()
 
 
+def active_by_dates_q(today=None):
+    """
+    Condition « actif selon les dates » (voir Model.is_active_by_dates), utilisable dans un
+    filtre ou une annotation conditionnelle.
+    """
+    if today is None:
+        today = timezone.now().date()
+    return (
+        Q(status='ACTIVE')  # Utiliser la valeur directement pour éviter la référence circulaire
+        & Q(fecha_ingreso__lt=today)  # Date actuelle > fecha_ingreso
+        & (Q(fecha_retiro__isnull=True) | Q(fecha_retiro__gte=today))  # fecha_retiro est None OU date actuelle <= fecha_retiro
+    )
+
+
 class ActiveModelManager(models.Manager):
     """Manager personnalisé pour filtrer les modèles actifs selon les dates"""
     
     def get_queryset(self):
         """Retourne uniquement les modèles actifs selon les dates"""
-        today = timezone.now().date()
-        return super().get_queryset().filter(
-            status='ACTIVE',  # Utiliser la valeur directement pour éviter la référence circulaire
-            fecha_ingreso__lt=today,  # Date actuelle > fecha_ingreso
-        ).filter(
-            Q(fecha_retiro__isnull=True) | Q(fecha_retiro__gte=today)  # fecha_retiro est None OU date actuelle <= fecha_retiro
-        )
+        return super().get_queryset().filter(active_by_dates_q())
 
 
 class Model(models.Model):
@@ -176,6 +186,7 @@ class Model(models.Model):
     # Managers
     objects = models.Manager()  # Manager par défaut
     active_by_dates = ActiveModelManager()  # Manager pour les modèles actifs selon les dates
+    scoped = TenantManager()  # Manager filtré sur l'agence de la requête
     
     class Meta:
         verbose_name = _('Modelo')
@@ -190,6 +201,22 @@ class Model(models.Model):
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
     
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        # Changement d'agence : les sessions suivent le modèle (agence dénormalisée) ; les
+        # cubes des deux agences sont invalidés pour les dates déplacées, après le commit
+        update_fields = kwargs.get('update_fields')
+        if not adding and (update_fields is None or {'agency', 'agency_id'} & set(update_fields)):
+            from reports.signals import ledger_bulk_changed
+
+            moved = self.work_sessions.exclude(agency_id=self.agency_id)
+            items = set(moved.order_by().values_list('agency_id', 'date').distinct())
+            if items:
+                moved.update(agency_id=self.agency_id)
+                items |= {(self.agency_id, day) for _agency_id, day in items}
+                transaction.on_commit(partial(ledger_bulk_changed.send, sender=WorkSession, items=items))
+    
     @property
     def full_name(self):
         """Retourne le nom complet"""
@@ -407,6 +434,9 @@ class Schedule(models.Model):
         verbose_name=_('Creado por')
     )
     
+    objects = models.Manager()  # Manager par défaut
+    scoped = TenantManager()  # Manager filtré sur l'agence de la requête
+    
     class Meta:
         verbose_name = _('Horario')
         verbose_name_plural = _('Horarios')
@@ -468,6 +498,10 @@ class ScheduleAssignment(models.Model):
         auto_now_add=True,
         verbose_name=_('Fecha de creación')
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name=_('Fecha de actualización')
+    )
     created_by = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
@@ -571,6 +605,14 @@ class WorkSession(models.Model):
         related_name='work_sessions',
         verbose_name=_('Modelo')
     )
+    # Agence du modèle, dénormalisée pour filtrer par agence sans jointure
+    agency = models.ForeignKey(
+        'agencies.Agency',
+        on_delete=models.PROTECT,
+        related_name='work_sessions',
+        editable=False,
+        verbose_name=_('Agencia')
+    )
     schedule_assignment = models.ForeignKey(
         ScheduleAssignment,
         on_delete=models.CASCADE,
@@ -741,6 +783,16 @@ class WorkSession(models.Model):
         verbose_name=_('Creado por')
     )
     
+    objects = models.Manager()  # Manager par défaut
+    scoped = TenantManager()  # Manager filtré sur l'agence de la requête
+    
+    # Champs repris par le compte de résultats (reports) : une sauvegarde qui ne les
+    # modifie pas n'invalide pas les cubes mensuels
+    LEDGER_FIELDS = (
+        'agency_id', 'date', 'status', 'session_gain_amount', 'session_gain_amount_usd',
+        'session_bank_fees', 'session_model_ganancia', 'late_penalty_amount', 'absence_penalty_amount',
+    )
+    
     class Meta:
         verbose_name = _('Sesión de Trabajo')
         verbose_name_plural = _('Sesiones de Trabajo')
@@ -750,11 +802,34 @@ class WorkSession(models.Model):
             models.Index(fields=['model', 'date']),
             models.Index(fields=['date']),
             models.Index(fields=['status']),
+            models.Index(fields=['agency', 'date']),
+            models.Index(fields=['agency', 'status', 'date']),
         ]
     
     def __str__(self):
         return f"{self.model.full_name} - {self.date} - {self.get_status_display()}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_ledger_state = instance.get_ledger_state()
+        return instance
+    
+    def get_ledger_state(self):
+        """
+        Valeurs des LEDGER_FIELDS (champs repris par le compte de résultats), ou None si
+        l'un d'eux n'est pas chargé.
+        """
+        if any(name not in self.__dict__ for name in self.LEDGER_FIELDS):
+            return None
+        return {name: self.__dict__[name] for name in self.LEDGER_FIELDS}
+    
+    def save(self, *args, **kwargs):
+        """Recopie l'agence du modèle (chargé, ou lu si l'agence n'est pas encore connue)"""
+        if self.model_id is not None and (self.agency_id is None or WorkSession.model.is_cached(self)):
+            self.agency_id = self.model.agency_id
+        super().save(*args, **kwargs)
+    
     def calculate_total_break_time(self):
         """Calcule le temps total de pause (toutes les pauses de tous types) en heures"""
         from datetime import timedelta
@@ -807,6 +882,59 @@ class WorkSession(models.Model):
         total_hours = total_time.total_seconds() / 3600
         return round(total_hours, 2)
     
+    def snapshot_financial_settings(self):
+        """Sauvegarde les paramètres financiers de l'agence au moment de la complétion"""
+        from decimal import Decimal
+
+        if self.model.agency:
+            agency = self.model.agency
+            self.model_gain_percentage_snapshot = agency.model_gain_percentage or Decimal('0.00')
+            self.bank_fee_percentage_snapshot = agency.bank_fee_percentage or Decimal('0.00')
+
+    def apply_financials(self, gain_usd, trm_rate, keep_snapshot=False):
+        """
+        Calcule les valeurs financières de la session à partir de sa ganancia USD
+        (sans enregistrer).
+
+        Args:
+            gain_usd (Decimal): Ganancia de la session en USD
+            trm_rate (Decimal): Taux TRM utilisé pour la conversion en COP
+            keep_snapshot (bool): Recalculer avec les pourcentages figés à la complétion
+                plutôt qu'avec ceux de l'agence (session déjà complétée)
+
+        Returns:
+            Decimal: Ganancia de la session en COP
+        """
+        from decimal import Decimal
+
+        has_snapshot = (
+            self.model_gain_percentage_snapshot is not None
+            and self.bank_fee_percentage_snapshot is not None
+        )
+        if not (keep_snapshot and has_snapshot):
+            self.snapshot_financial_settings()
+        session_gain_cop = gain_usd * trm_rate
+        self.session_gain_amount_usd = gain_usd
+        self.session_gain_amount = session_gain_cop
+        self.trm_rate = trm_rate
+
+        # Calculer les impuestos (basé sur COP)
+        if self.bank_fee_percentage_snapshot:
+            self.session_bank_fees = session_gain_cop * self.bank_fee_percentage_snapshot / Decimal('100.00')
+        else:
+            self.session_bank_fees = Decimal('0.00')
+
+        # Calculer la ganancia del modelo
+        ganancia_after_bank_fees = session_gain_cop - self.session_bank_fees
+        if self.model_gain_percentage_snapshot:
+            ganancia_porcentaje = ganancia_after_bank_fees * self.model_gain_percentage_snapshot / Decimal('100.00')
+        else:
+            ganancia_porcentaje = Decimal('0.00')
+
+        total_multas = (self.late_penalty_amount or Decimal('0.00')) + (self.absence_penalty_amount or Decimal('0.00'))
+        self.session_model_ganancia = ganancia_porcentaje - total_multas
+        return session_gain_cop
+
     def get_active_pause(self):
         """Retourne la pause active (en cours) si elle existe"""
         return self.pauses.filter(end_time__isnull=True).first()
@@ -0,0 +1,279 @@
+"""
+Création groupée des modèles d'une agence (et de leurs comptes utilisateur) depuis un CSV.
+
+Les noms d'utilisateur libres sont résolus par une requête sur les préfixes candidats
+(au lieu d'un test d'existence par essai), les mots de passe générés sont hachés dans un
+pool de processus (PBKDF2 coûte plusieurs centaines de millisecondes par mot de passe),
+puis les utilisateurs et les modèles sont insérés par bulk_create dans une transaction.
+
+Le pool n'est utilisé que par la commande onboard_models ; la vue hache dans le processus
+de la requête (workers=1) pour ne pas lancer de processus depuis un worker gunicorn.
+"""
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import Q
+from django.utils.crypto import get_random_string
+
+from accounts.models import Role
+from accounts.refdata import get_role
+from .models import Model
+
+User = get_user_model()
+
+ONBOARDING_COLUMNS = [
+    'first_name', 'last_name', 'fecha_ingreso', 'email', 'phone', 'cedula', 'edad', 'eps',
+    'referred_by', 'create_user',
+]
+
+# Préfixes par requête de résolution des noms d'utilisateur (borne la taille du OR)
+USERNAME_PREFIX_CHUNK = 200
+
+# En dessous de ce nombre de mots de passe, le démarrage du pool coûte plus que le hachage
+MIN_PARALLEL_HASHES = 8
+
+TEMP_PASSWORD_LENGTH = 12
+
+# Champs texte dont la longueur est contrôlée (bulk_create ne valide pas les modèles)
+LENGTH_CHECKED_FIELDS = ('first_name', 'last_name', 'phone', 'cedula', 'email')
+
+# Âge maximal accepté (colonne entière)
+MAX_EDAD = 120
+
+# Chiffres réservés au suffixe des noms d'utilisateur déjà pris (nombre.apellido123)
+USERNAME_SUFFIX_DIGITS = 4
+
+TRUE_VALUES = {'1', 'si', 'sí', 'true', 'yes', 'x'}
+FALSE_VALUES = {'0', 'no', 'false'}
+
+
+def username_base(first_name, last_name):
+    """Nom d'utilisateur souhaité d'un modèle (nombre.apellido)"""
+    return f"{first_name.lower()}.{last_name.lower()}"
+
+
+def resolve_usernames(bases):
+    """
+    Attribue un nom d'utilisateur libre à chaque base : la base elle-même, sinon la base
+    suivie du premier numéro libre (1, 2, ...). Les noms attribués dans la liste ne sont
+    pas réutilisés.
+
+    Les noms existants commençant par les bases sont lus en une requête (par tranche de
+    USERNAME_PREFIX_CHUNK bases).
+
+    Returns:
+        list: Noms d'utilisateur, dans l'ordre des bases
+    """
+    unique = sorted(set(bases))
+    taken = set()
+    for start in range(0, len(unique), USERNAME_PREFIX_CHUNK):
+        prefixes = Q()
+        for base in unique[start:start + USERNAME_PREFIX_CHUNK]:
+            prefixes |= Q(username__startswith=base)
+        taken.update(User.objects.filter(prefixes).values_list('username', flat=True))
+
+    usernames = []
+    for base in bases:
+        username, counter = base, 1
+        while username in taken:
+            username = f"{base}{counter}"
+            counter += 1
+        taken.add(username)
+        usernames.append(username)
+    return usernames
+
+
+def _init_worker():
+    """Initialisation d'un processus du pool (nécessaire hors fork)"""
+    django.setup()
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    Hache des mots de passe avec le hacheur configuré, en parallèle.
+
+    Args:
+        passwords (list): Mots de passe en clair
+        workers (int, optional): Nombre de processus (par défaut un par CPU, au plus 8) ;
+                                 1 hache tout dans le processus courant
+
+    Returns:
+        list: Hachages, dans l'ordre des mots de passe
+    """
+    if workers is None:
+        workers = min(os.cpu_count() or 1, 8)
+    if workers <= 1 or len(passwords) < MIN_PARALLEL_HASHES:
+        return [make_password(password) for password in passwords]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        return list(executor.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+def _flag(value, default):
+    value = (value or '').strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    return default
+
+
+def validate_row(row, referrers, seen_cedulas, create_users=True):
+    """
+    Valide une ligne d'onboarding.
+
+    Args:
+        row (dict): Ligne du CSV
+        referrers (dict): {cédula: id} des modèles existants de l'agence
+        seen_cedulas (set): Cédulas déjà présentes dans l'agence ou dans le fichier
+        create_users (bool): Création du compte par défaut (colonne create_user vide)
+
+    Returns:
+        tuple: (dict des champs du modèle, création du compte, liste des erreurs)
+    """
+    errors = []
+    cleaned = {}
+    for field in ('first_name', 'last_name', 'phone'):
+        cleaned[field] = (row.get(field) or '').strip()
+    if not cleaned['first_name']:
+        errors.append('Nombre obligatorio')
+    if not cleaned['last_name']:
+        errors.append('Apellido obligatorio')
+
+    try:
+        cleaned['fecha_ingreso'] = datetime.strptime((row.get('fecha_ingreso') or '').strip(), '%Y-%m-%d').date()
+    except ValueError:
+        errors.append('Fecha de ingreso inválida')
+
+    email = (row.get('email') or '').strip()
+    if email:
+        try:
+            validate_email(email)
+        except ValidationError:
+            errors.append('Email inválido')
+    cleaned['email'] = email or None
+
+    cedula = (row.get('cedula') or '').strip()
+    if cedula and cedula in seen_cedulas:
+        errors.append('Cédula ya registrada')
+    cleaned['cedula'] = cedula or None
+
+    edad = (row.get('edad') or '').strip()
+    cleaned['edad'] = None
+    if edad:
+        if edad.isdecimal() and int(edad) <= MAX_EDAD:
+            cleaned['edad'] = int(edad)
+        else:
+            errors.append('Edad inválida')
+
+    eps = (row.get('eps') or '').strip().upper().replace(' ', '_')
+    if eps and eps not in Model.EPS.values:
+        errors.append('EPS no reconocida')
+    cleaned['eps'] = eps or None
+
+    referred_by = (row.get('referred_by') or '').strip()
+    cleaned['referred_by_id'] = None
+    if referred_by:
+        cleaned['referred_by_id'] = referrers.get(referred_by)
+        if cleaned['referred_by_id'] is None:
+            errors.append('Modelo referente no encontrado')
+
+    for field in LENGTH_CHECKED_FIELDS:
+        max_length = Model._meta.get_field(field).max_length
+        if cleaned[field] and len(cleaned[field]) > max_length:
+            errors.append(f"{Model._meta.get_field(field).verbose_name}: máximo {max_length} caracteres")
+
+    with_user = _flag(row.get('create_user'), create_users)
+    username_max_length = User._meta.get_field('username').max_length - USERNAME_SUFFIX_DIGITS
+    if with_user and len(username_base(cleaned['first_name'], cleaned['last_name'])) > username_max_length:
+        errors.append('Nombre de usuario demasiado largo')
+
+    if not errors and cedula:
+        seen_cedulas.add(cedula)
+    return cleaned, with_user, errors
+
+
+def onboard_models(stream, agency, create_users=True, workers=None, batch_size=500):
+    """
+    Crée les modèles d'une agence depuis un CSV (colonnes de ONBOARDING_COLUMNS, seuls
+    first_name, last_name et fecha_ingreso sont obligatoires).
+
+    Les lignes valides sont insérées dans une seule transaction ; les lignes invalides sont
+    ignorées et décrites dans le rapport. Les mots de passe générés ne sont conservés que
+    dans le résultat : ils doivent être remis aux modèles (changement à la première
+    connexion).
+
+    Args:
+        stream: Fichier texte ouvert
+        agency (Agency): Agence des modèles
+        create_users (bool): Créer un compte utilisateur (rôle MODELE) quand la colonne
+                             create_user est vide
+        workers (int, optional): Processus de hachage des mots de passe
+        batch_size (int): Taille des lots d'insertion
+
+    Returns:
+        dict: {'rows', 'created', 'accounts': [{'model', 'username', 'password'}],
+               'errors': [{'line', 'errors'}]}
+
+    Raises:
+        Role.DoesNotExist: Si des comptes sont demandés et que le rôle MODELE n'existe pas
+        IntegrityError: Si un nom d'utilisateur attribué a été pris entre-temps (création
+                        concurrente) ; rien n'est enregistré
+    """
+    referrers = dict(
+        Model.objects.filter(agency=agency, cedula__isnull=False).exclude(cedula='').values_list('cedula', 'id')
+    )
+    seen_cedulas = set(referrers)
+    result = {'rows': 0, 'created': 0, 'accounts': [], 'errors': []}
+
+    rows = []
+    reader = csv.DictReader(stream)
+    for row in reader:
+        result['rows'] += 1
+        cleaned, with_user, errors = validate_row(row, referrers, seen_cedulas, create_users)
+        if errors:
+            result['errors'].append({'line': reader.line_num, 'errors': errors})
+            continue
+        rows.append((cleaned, with_user))
+    if not rows:
+        return result
+
+    with_users = [cleaned for cleaned, with_user in rows if with_user]
+    role = get_role(Role.RoleType.MODELE) if with_users else None
+    # Hachage (long) avant la transaction ; noms d'utilisateur résolus juste avant l'insertion
+    passwords = [get_random_string(length=TEMP_PASSWORD_LENGTH) for _ in with_users]
+    hashes = hash_passwords(passwords, workers=workers)
+
+    with transaction.atomic():
+        usernames = resolve_usernames([username_base(c['first_name'], c['last_name']) for c in with_users])
+        users = [
+            User(
+                username=username,
+                email=User.objects.normalize_email(cleaned['email'] or f"{username}@dreamslabs.com"),
+                password=password_hash,
+                role=role,
+                agency=agency,
+            )
+            for cleaned, username, password_hash in zip(with_users, usernames, hashes)
+        ]
+        User.objects.bulk_create(users, batch_size=batch_size)
+        user_by_row = {id(cleaned): user for cleaned, user in zip(with_users, users)}
+        models = [
+            Model(agency=agency, status=Model.Status.ACTIVE, user=user_by_row.get(id(cleaned)), **cleaned)
+            for cleaned, _with_user in rows
+        ]
+        Model.objects.bulk_create(models, batch_size=batch_size)
+
+    result['created'] = len(models)
+    result['accounts'] = [
+        {'model': f"{cleaned['first_name']} {cleaned['last_name']}", 'username': username, 'password': password}
+        for cleaned, username, password in zip(with_users, usernames, passwords)
+    ]
+    return result
@@ -0,0 +1,245 @@
+"""
+Réseau de parrainage des modèles (Model.referred_by).
+
+Les filleuls d'un modèle à toutes les profondeurs, sa chaîne de parrains et les gains
+générés par son réseau sont lus par une seule requête WITH RECURSIVE, au lieu d'une
+requête par niveau de l'arbre. Les bases sans CTE récursive utilisent un parcours en
+largeur en Python (une requête par niveau) qui renvoie les mêmes résultats.
+
+Rien n'empêche en base une boucle de parrainage (A parraine B qui parraine A) : la
+récursion est bornée par MAX_DEPTH et chaque modèle n'est compté qu'une fois, à sa plus
+faible profondeur ; le modèle de départ n'est jamais son propre filleul.
+
+Un parrain et ses filleuls peuvent appartenir à des agences différentes : referred_revenue
+peut ne compter que les filleuls d'une agence (vue d'un Regional Manager).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Count, Sum
+
+from .models import Model, WorkSession
+
+# Profondeur maximale parcourue (garde-fou contre les boucles)
+MAX_DEPTH = 20
+
+# Bases exécutant la CTE récursive (SQLite la supporte depuis 3.8.3)
+RECURSIVE_CTE_VENDORS = {'postgresql', 'sqlite'}
+
+ZERO = Decimal('0.00')
+
+
+def _use_cte():
+    return connection.vendor in RECURSIVE_CTE_VENDORS
+
+
+def _tables():
+    """Noms SQL (quotés) des tables et colonnes utilisées par les CTE"""
+    quote = connection.ops.quote_name
+    session_field = WorkSession._meta.get_field
+    return {
+        'model': quote(Model._meta.db_table),
+        'referred_by': quote(Model._meta.get_field('referred_by').column),
+        'agency': quote(Model._meta.get_field('agency').column),
+        'session': quote(WorkSession._meta.db_table),
+        'session_model': quote(session_field('model').column),
+        'status': quote(session_field('status').column),
+        'date': quote(session_field('date').column),
+        'gain_cop': quote(session_field('session_gain_amount').column),
+        'gain_usd': quote(session_field('session_gain_amount_usd').column),
+    }
+
+
+def _descendants_cte_sql():
+    """CTE des filleuls (id, profondeur minimale) ; paramètres : racine, profondeur, racine"""
+    return (
+        'WITH RECURSIVE tree (id, depth) AS ('
+        ' SELECT m.id, 1 FROM {model} m WHERE m.{referred_by} = %s'
+        ' UNION'
+        ' SELECT m.id, tree.depth + 1 FROM {model} m JOIN tree ON m.{referred_by} = tree.id'
+        ' WHERE tree.depth < %s'
+        '), levels (id, depth) AS ('
+        ' SELECT id, MIN(depth) FROM tree WHERE id <> %s GROUP BY id'
+        ')'
+    ).format(**_tables())
+
+
+def _descendants_cte(model_id, max_depth):
+    sql = _descendants_cte_sql() + ' SELECT id, depth FROM levels'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [model_id, max_depth, model_id])
+        return dict(cursor.fetchall())
+
+
+def _descendants_bfs(model_id, max_depth):
+    descendants = {}
+    frontier = [model_id]
+    depth = 0
+    while frontier and depth < max_depth:
+        depth += 1
+        children = Model.objects.filter(referred_by_id__in=frontier).values_list('id', flat=True)
+        frontier = [child for child in children if child != model_id and child not in descendants]
+        for child in frontier:
+            descendants[child] = depth
+    return descendants
+
+
+def get_descendants(model_id, max_depth=MAX_DEPTH):
+    """
+    Filleuls directs et indirects d'un modèle.
+
+    Returns:
+        dict: {model_id: profondeur} (1 pour un filleul direct)
+    """
+    max_depth = min(max_depth, MAX_DEPTH)
+    if max_depth < 1:
+        return {}
+    if _use_cte():
+        return _descendants_cte(model_id, max_depth)
+    return _descendants_bfs(model_id, max_depth)
+
+
+def _ancestors_cte(model_id):
+    sql = (
+        'WITH RECURSIVE chain (id, parent, depth) AS ('
+        ' SELECT m.id, m.{referred_by}, 0 FROM {model} m WHERE m.id = %s'
+        ' UNION ALL'
+        ' SELECT m.id, m.{referred_by}, chain.depth + 1 FROM {model} m JOIN chain ON m.id = chain.parent'
+        ' WHERE chain.depth < %s'
+        ') SELECT id FROM chain WHERE depth > 0 ORDER BY depth'
+    ).format(**_tables())
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [model_id, MAX_DEPTH])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _ancestors_bfs(model_id):
+    ancestors = []
+    parent = Model.objects.filter(id=model_id).values_list('referred_by_id', flat=True).first()
+    while parent is not None and len(ancestors) < MAX_DEPTH:
+        ancestors.append(parent)
+        parent = Model.objects.filter(id=parent).values_list('referred_by_id', flat=True).first()
+    return ancestors
+
+
+def get_ancestors(model_id):
+    """
+    Chaîne des parrains d'un modèle, du parrain direct jusqu'à la racine de l'arbre.
+
+    La profondeur du modèle dans l'arbre est la longueur de la liste. En cas de boucle,
+    la chaîne s'arrête au premier modèle déjà rencontré.
+
+    Returns:
+        list: Identifiants des parrains
+    """
+    chain = _ancestors_cte(model_id) if _use_cte() else _ancestors_bfs(model_id)
+    seen = {model_id}
+    ancestors = []
+    for ancestor_id in chain:
+        if ancestor_id in seen:
+            break
+        seen.add(ancestor_id)
+        ancestors.append(ancestor_id)
+    return ancestors
+
+
+def _amount(value):
+    # SQLite renvoie des flottants pour SUM sur une colonne décimale
+    return Decimal(str(value if value is not None else 0)).quantize(Decimal('0.01'))
+
+
+def _revenue_cte(model_id, start, end, max_depth, agency_id=None):
+    agency_filter = ''
+    if agency_id is not None:
+        agency_filter = ' WHERE levels.id IN (SELECT m.id FROM {model} m WHERE m.{agency} = %s)'
+    sql = _descendants_cte_sql() + (
+        ' SELECT levels.depth, COUNT(DISTINCT levels.id), COUNT(s.id), SUM(s.{gain_cop}), SUM(s.{gain_usd})'
+        ' FROM levels LEFT JOIN {session} s ON s.{session_model} = levels.id'
+        ' AND s.{status} = %s AND s.{date} >= %s AND s.{date} <= %s'
+        + agency_filter +
+        ' GROUP BY levels.depth ORDER BY levels.depth'
+    ).format(**_tables())
+    adapt = connection.ops.adapt_datefield_value
+    params = [model_id, max_depth, model_id, WorkSession.Status.COMPLETED.value, adapt(start), adapt(end)]
+    if agency_id is not None:
+        params.append(agency_id)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _revenue_bfs(model_id, start, end, max_depth, agency_id=None):
+    descendants = _descendants_bfs(model_id, max_depth)
+    if agency_id is not None:
+        in_agency = set(
+            Model.objects.filter(id__in=list(descendants), agency_id=agency_id).values_list('id', flat=True)
+        )
+        descendants = {key: depth for key, depth in descendants.items() if key in in_agency}
+    totals = {
+        row['model_id']: row
+        for row in WorkSession.objects.filter(
+            model_id__in=list(descendants),
+            status=WorkSession.Status.COMPLETED,
+            date__gte=start,
+            date__lte=end,
+        ).order_by().values('model_id').annotate(
+            sessions=Count('id'), gain_cop=Sum('session_gain_amount'), gain_usd=Sum('session_gain_amount_usd')
+        )
+    }
+    levels = defaultdict(lambda: [0, 0, ZERO, ZERO])
+    for descendant_id, depth in descendants.items():
+        level = levels[depth]
+        level[0] += 1
+        row = totals.get(descendant_id)
+        if row:
+            level[1] += row['sessions']
+            level[2] += row['gain_cop'] or ZERO
+            level[3] += row['gain_usd'] or ZERO
+    return [(depth, *levels[depth]) for depth in sorted(levels)]
+
+
+def referred_revenue(model_id, start, end, max_depth=MAX_DEPTH, agency_id=None):
+    """
+    Gains des sessions complétées du réseau de filleuls d'un modèle sur une période.
+
+    Le modèle lui-même n'est pas compté. Avec agency_id, seuls les filleuls de cette
+    agence sont comptés (le parcours passe toujours par les autres, profondeurs inchangées).
+
+    Args:
+        model_id (int): Modèle parrain
+        start (date): Début de la période (inclus)
+        end (date): Fin de la période (incluse)
+        max_depth (int, optional): Profondeur maximale (1 pour les filleuls directs)
+        agency_id (int, optional): Agence des filleuls comptés (toutes par défaut)
+
+    Returns:
+        dict: {'models', 'depth' (profondeur du réseau), 'sessions', 'gain_cop', 'gain_usd',
+               'levels': [{'depth', 'models', 'sessions', 'gain_cop', 'gain_usd'}]}
+    """
+    max_depth = min(max_depth, MAX_DEPTH)
+    rows = []
+    if max_depth >= 1:
+        if _use_cte():
+            rows = _revenue_cte(model_id, start, end, max_depth, agency_id)
+        else:
+            rows = _revenue_bfs(model_id, start, end, max_depth, agency_id)
+
+    levels = [
+        {
+            'depth': depth,
+            'models': models,
+            'sessions': sessions,
+            'gain_cop': _amount(gain_cop),
+            'gain_usd': _amount(gain_usd),
+        }
+        for depth, models, sessions, gain_cop, gain_usd in rows
+    ]
+    return {
+        'models': sum(level['models'] for level in levels),
+        'depth': levels[-1]['depth'] if levels else 0,
+        'sessions': sum(level['sessions'] for level in levels),
+        'gain_cop': sum((level['gain_cop'] for level in levels), ZERO),
+        'gain_usd': sum((level['gain_usd'] for level in levels), ZERO),
+        'levels': levels,
+    }
@@ -10,6 +10,7 @@ from .models import Schedule, ScheduleAssignment, WorkSession, Model, ModelGain,
 from agencies.models import Agency
 from accounts.decorators import role_required, agency_required
 from accounts.models import Role
+from accounts.refdata import get_agencies
 
 
 # ==================== SCHEDULES (HORAIRES) ====================
@@ -33,7 +34,7 @@ def schedule_list(request):
             schedules = Schedule.objects.filter(agency=agency).order_by('start_time')
         else:
             schedules = Schedule.objects.all().order_by('agency__name', 'start_time')
-        agencies = Agency.objects.all()
+        agencies = get_agencies()
     elif agency:
         schedules = Schedule.objects.filter(agency=agency).order_by('start_time')
         agencies = []
@@ -98,7 +99,7 @@ def schedule_create(request):
                 messages.error(request, _('Error al crear el horario: {}').format(str(e)))
     
     if request.user.is_superuser or request.user.is_general_manager():
-        agencies = Agency.objects.all()
+        agencies = get_agencies()
     else:
         agencies = []
     
@@ -164,7 +165,7 @@ def schedule_update(request, schedule_id):
             messages.error(request, _('Error al actualizar el horario: {}').format(str(e)))
     
     if request.user.is_superuser or request.user.is_general_manager():
-        agencies = Agency.objects.all()
+        agencies = get_agencies()
     else:
         agencies = []
     
@@ -235,7 +236,7 @@ def schedule_assignment_list(request):
         assignments = ScheduleAssignment.objects.all().select_related('model', 'schedule').order_by('schedule__start_time', 'model__first_name')
     
     if request.user.is_superuser or request.user.is_general_manager():
-        agencies = Agency.objects.all()
+        agencies = get_agencies()
     else:
         agencies = []
     
@@ -320,7 +321,7 @@ def schedule_assignment_create(request):
         schedules = Schedule.objects.none()
     
     if request.user.is_superuser or request.user.is_general_manager():
-        agencies = Agency.objects.all()
+        agencies = get_agencies()
     else:
         agencies = []
     
@@ -388,7 +389,7 @@ def work_session_list(request):
         ).select_related('model', 'model__agency', 'schedule_assignment', 'schedule_assignment__schedule').order_by('model__agency__name', 'schedule_assignment__schedule__start_time', 'model__first_name')
         
         # Créer les sessions manquantes pour toutes les agences
-        all_agencies = Agency.objects.all()
+        all_agencies = get_agencies()
         for ag in all_agencies:
             assignments = ScheduleAssignment.objects.filter(
                 schedule__agency=ag,
@@ -464,7 +465,7 @@ def work_session_list(request):
         sessions = []
     
     if request.user.is_superuser or request.user.is_general_manager():
-        agencies = Agency.objects.all()
+        agencies = get_agencies()
     else:
         agencies = []
     
@@ -747,7 +748,7 @@ def work_session_end_coaching(request, session_id):
 def work_session_complete(request, session_id):
     """Complète une session de travail"""
     from decimal import Decimal
-    from .utils import convert_usd_to_cop
+    from .utils import get_trm_rate
     
     session = get_object_or_404(WorkSession, id=session_id)
     
@@ -760,43 +761,21 @@ def work_session_complete(request, session_id):
         session.total_worked_hours = float(session.calculate_worked_hours())
         
         # Sauvegarder les paramètres financiers au moment de la complétion
-        if session.model.agency:
-            agency = session.model.agency
-            session.model_gain_percentage_snapshot = agency.model_gain_percentage or Decimal('0.00')
-            session.bank_fee_percentage_snapshot = agency.bank_fee_percentage or Decimal('0.00')
+        session.snapshot_financial_settings()
         
         # Calculer et sauvegarder les valeurs financières de la session
         if gain_amount_usd:
             try:
                 session_gain_usd = Decimal(str(gain_amount_usd))
-                session.session_gain_amount_usd = session_gain_usd
                 
                 # Convertir USD en COP en utilisant le TRM
-                session_date = session.date
-                session_gain_cop, trm_rate = convert_usd_to_cop(session_gain_usd, session_date)
+                trm_rate = get_trm_rate(session.date)
                 
-                if session_gain_cop is None or trm_rate is None:
+                if trm_rate is None:
                     messages.error(request, _('Error al obtener el TRM. Por favor, intente nuevamente.'))
                     return redirect(_get_redirect_url_for_session(session, request))
                 
-                session.session_gain_amount = session_gain_cop
-                session.trm_rate = trm_rate
-                
-                # Calculer les impuestos (basé sur COP)
-                if session.bank_fee_percentage_snapshot:
-                    session.session_bank_fees = session_gain_cop * session.bank_fee_percentage_snapshot / Decimal('100.00')
-                else:
-                    session.session_bank_fees = Decimal('0.00')
-                
-                # Calculer la ganancia del modelo
-                ganancia_after_bank_fees = session_gain_cop - session.session_bank_fees
-                if session.model_gain_percentage_snapshot:
-                    ganancia_porcentaje = ganancia_after_bank_fees * session.model_gain_percentage_snapshot / Decimal('100.00')
-                else:
-                    ganancia_porcentaje = Decimal('0.00')
-                
-                total_multas = (session.late_penalty_amount or Decimal('0.00')) + (session.absence_penalty_amount or Decimal('0.00'))
-                session.session_model_ganancia = ganancia_porcentaje - total_multas
+                session_gain_cop = session.apply_financials(session_gain_usd, trm_rate)
                 
                 # Créer ou mettre à jour le gain (en COP)
                 ModelGain.objects.update_or_create(
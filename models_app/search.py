@@ -0,0 +1,49 @@
+"""
+Recherche rapide des modèles par nom, cédula ou email (autocomplétion).
+
+Chaque mot saisi doit apparaître dans l'un des champs (icontains). Sous PostgreSQL, la
+migration 0019 crée un index GIN pg_trgm sur UPPER(champ), l'expression produite par
+icontains : la recherche reste indexée même pour une sous-chaîne en milieu de nom.
+Les autres bases (SQLite en développement) exécutent la même requête sans index.
+"""
+from django.db.models import Case, IntegerField, Q, Value, When
+
+SEARCH_FIELDS = ['first_name', 'last_name', 'cedula', 'email']
+
+# Longueur minimale d'un terme (un trigramme)
+MIN_QUERY_LENGTH = 2
+
+MAX_RESULTS = 20
+
+
+def search_models(queryset, query, limit=10):
+    """
+    Filtre et classe un queryset de Model selon une saisie libre.
+
+    Les modèles dont le prénom, le nom ou la cédula commencent par le premier mot sont
+    placés en tête, puis l'ordre est alphabétique.
+
+    Returns:
+        QuerySet: Au plus ``limit`` modèles (aucun si la saisie est trop courte)
+    """
+    terms = query.split()
+    if not terms or len(query.strip()) < MIN_QUERY_LENGTH:
+        return queryset.none()
+
+    for term in terms:
+        matches = Q()
+        for field in SEARCH_FIELDS:
+            matches |= Q(**{f'{field}__icontains': term})
+        queryset = queryset.filter(matches)
+
+    first = terms[0]
+    rank = Case(
+        When(
+            Q(first_name__istartswith=first) | Q(last_name__istartswith=first) | Q(cedula__istartswith=first),
+            then=Value(0),
+        ),
+        default=Value(1),
+        output_field=IntegerField(),
+    )
+    limit = max(1, min(limit, MAX_RESULTS))
+    return queryset.annotate(rank=rank).order_by('rank', 'first_name', 'last_name', 'id')[:limit]
@@ -0,0 +1,116 @@
+"""
+Statistiques personnelles d'un modèle (tableau de bord Modèle et API de suivi mobile).
+
+Toutes les données financières proviennent de WorkSession, qui conserve les montants
+USD/COP et les snapshots calculés au moment de la complétion.
+"""
+from decimal import Decimal
+from django.db.models import Q, Sum, Avg, Count, F
+from django.utils import timezone
+
+from .models import WorkSession, ScheduleAssignment
+from .utils import get_quincena_bounds, count_scheduled_days
+
+
+def get_model_personal_stats(model, period_start, period_end, today=None, recent_limit=10):
+    """
+    Calcule les totaux, moyennes, l'activité récente et la progression de la quinzaine
+    courante d'un modèle.
+
+    Les totaux de la période et de la quinzaine sont calculés par une seule requête
+    d'agrégation conditionnelle ; l'activité récente et les jours planifiés ajoutent
+    chacune une requête légère.
+
+    Args:
+        model: Instance du modèle
+        period_start (date): Début de la période filtrée
+        period_end (date): Fin de la période filtrée
+        today (date, optional): Date de référence pour la quinzaine (aujourd'hui par défaut)
+        recent_limit (int): Nombre de sessions récentes à retourner
+
+    Returns:
+        dict: {'period_start', 'period_end', 'totals', 'averages', 'recent_sessions', 'quincena'}
+    """
+    if today is None:
+        today = timezone.now().date()
+    quincena_start, quincena_end = get_quincena_bounds(today)
+
+    completed = Q(status=WorkSession.Status.COMPLETED)
+    in_period = Q(date__gte=period_start, date__lte=period_end)
+    in_quincena = Q(date__gte=quincena_start, date__lte=quincena_end)
+
+    totals = WorkSession.objects.filter(
+        model=model,
+        date__gte=min(period_start, quincena_start),
+        date__lte=max(period_end, quincena_end),
+    ).aggregate(
+        gain_cop=Sum('session_gain_amount', filter=completed & in_period),
+        gain_usd=Sum('session_gain_amount_usd', filter=completed & in_period),
+        model_ganancia=Sum('session_model_ganancia', filter=completed & in_period),
+        bank_fees=Sum('session_bank_fees', filter=completed & in_period),
+        penalties=Sum(F('late_penalty_amount') + F('absence_penalty_amount'), filter=in_period),
+        hours=Sum('total_worked_hours', filter=completed & in_period),
+        avg_hours=Avg('total_worked_hours', filter=completed & in_period),
+        sessions=Count('id', filter=completed & in_period),
+        late_sessions=Count('id', filter=in_period & Q(late_minutes__gt=0)),
+        absences=Count('id', filter=in_period & Q(status=WorkSession.Status.ABSENT)),
+        quincena_gain_cop=Sum('session_gain_amount', filter=completed & in_quincena),
+        quincena_gain_usd=Sum('session_gain_amount_usd', filter=completed & in_quincena),
+        quincena_sessions=Count('id', filter=completed & in_quincena),
+    )
+    for key, value in totals.items():
+        if value is None:
+            totals[key] = Decimal('0.00')
+
+    sessions_count = totals['sessions']
+    averages = {
+        'hours_per_session': totals.pop('avg_hours'),
+        'gain_cop_per_session': totals['gain_cop'] / sessions_count if sessions_count else Decimal('0.00'),
+        'gain_usd_per_session': totals['gain_usd'] / sessions_count if sessions_count else Decimal('0.00'),
+    }
+
+    recent_sessions = list(
+        WorkSession.objects.filter(model=model)
+        .exclude(status=WorkSession.Status.PENDING)
+        .order_by('-date')
+        .values(
+            'id', 'date', 'status', 'late_minutes', 'total_worked_hours',
+            'session_gain_amount', 'session_gain_amount_usd', 'session_model_ganancia',
+        )[:recent_limit]
+    )
+    status_labels = dict(WorkSession.Status.choices)
+    for session in recent_sessions:
+        session['status_display'] = str(status_labels.get(session['status'], session['status']))
+
+    # Jours planifiés de la quinzaine selon les horaires actifs (pour la moyenne journalière)
+    week_days_values = list(
+        ScheduleAssignment.objects.filter(model=model, is_active=True)
+        .values_list('schedule__week_days', flat=True)
+    )
+    scheduled_days = count_scheduled_days(week_days_values, quincena_start, quincena_end)
+    elapsed_days = count_scheduled_days(week_days_values, quincena_start, min(today, quincena_end))
+
+    quincena = {
+        'start': quincena_start,
+        'end': quincena_end,
+        'gain_cop': totals.pop('quincena_gain_cop'),
+        'gain_usd': totals.pop('quincena_gain_usd'),
+        'sessions': totals.pop('quincena_sessions'),
+        'scheduled_days': scheduled_days,
+        'elapsed_scheduled_days': elapsed_days,
+        'avg_daily_gain_cop': Decimal('0.00'),
+        'avg_daily_gain_usd': Decimal('0.00'),
+        'progress_percentage': round(elapsed_days * 100 / scheduled_days) if scheduled_days else 0,
+    }
+    if scheduled_days:
+        quincena['avg_daily_gain_cop'] = quincena['gain_cop'] / Decimal(scheduled_days)
+        quincena['avg_daily_gain_usd'] = quincena['gain_usd'] / Decimal(scheduled_days)
+
+    return {
+        'period_start': period_start,
+        'period_end': period_end,
+        'totals': totals,
+        'averages': averages,
+        'recent_sessions': recent_sessions,
+        'quincena': quincena,
+    }
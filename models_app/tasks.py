@@ -0,0 +1,32 @@
+"""
+Tâches exécutées en segundo plano par le worker (voir jobs.queue).
+"""
+import io
+from django.contrib.auth import get_user_model
+
+from accounts.storage import private_storage
+from agencies.models import Agency
+from .importers import import_earnings
+
+
+def import_earnings_file(path, file_format, user_id=None, agency_id=None):
+    """
+    Importe un fichier de gains déposé dans le stockage privé par la vue d'import, puis le
+    supprime (y compris en cas d'erreur : la tâche n'est pas relancée).
+
+    Returns:
+        dict: Résultat de import_earnings (rejets limités aux premiers)
+    """
+    user = get_user_model().objects.filter(id=user_id).first() if user_id else None
+    agency = Agency.objects.get(id=agency_id) if agency_id else None
+    storage = private_storage()
+    try:
+        with storage.open(path, 'rb') as upload:
+            stream = io.TextIOWrapper(upload, encoding='utf-8-sig', newline='')
+            try:
+                result = import_earnings(stream, file_format, user, agency=agency)
+            finally:
+                stream.detach()
+    finally:
+        storage.delete(path)
+    return result
@@ -1,3 +1,651 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import Role
+from agencies.models import Agency
+from jobs.models import Job
+from jobs.queue import claim_next, run_job
+from . import importers, onboarding, referrals
+from .models import Model, ModelGain, WorkSession, WorkedHours
+from .stats import get_model_personal_stats
 
-# Create your tests here.
+User = get_user_model()
+
+
+class ModelPersonalStatsTest(TestCase):
+    """Tests des statistiques personnelles du modèle"""
+
+    def setUp(self):
+        """Créer un modèle avec quelques sessions"""
+        self.modele_role = Role.objects.create(name=Role.RoleType.MODELE)
+        self.agency = Agency.objects.create(name="Agencia Test", code="AGT001")
+        self.user = User.objects.create_user(
+            username="modele",
+            password="test123",
+            role=self.modele_role,
+            agency=self.agency
+        )
+        self.model = Model.objects.create(
+            first_name="Ana",
+            last_name="Test",
+            agency=self.agency,
+            user=self.user,
+            fecha_ingreso=date(2025, 1, 1)
+        )
+        self.today = date(2026, 3, 10)
+        for day, gain_usd in [(2, '100.00'), (3, '50.00')]:
+            WorkSession.objects.create(
+                model=self.model,
+                date=date(2026, 3, day),
+                status=WorkSession.Status.COMPLETED,
+                total_worked_hours=Decimal('6.00'),
+                session_gain_amount_usd=Decimal(gain_usd),
+                session_gain_amount=Decimal(gain_usd) * 4000,
+                late_penalty_amount=Decimal('5000.00') if day == 3 else 0,
+                late_minutes=10 if day == 3 else 0,
+            )
+        WorkSession.objects.create(
+            model=self.model,
+            date=date(2026, 3, 4),
+            status=WorkSession.Status.ABSENT,
+            absence_penalty_amount=Decimal('20000.00'),
+        )
+
+    def test_totals_and_quincena(self):
+        """Les totaux de la période et de la quinzaine viennent des sessions"""
+        stats = get_model_personal_stats(
+            self.model, date(2026, 3, 1), date(2026, 3, 31), today=self.today
+        )
+        self.assertEqual(stats['totals']['gain_usd'], Decimal('150.00'))
+        self.assertEqual(stats['totals']['gain_cop'], Decimal('600000.00'))
+        self.assertEqual(stats['totals']['hours'], Decimal('12.00'))
+        self.assertEqual(stats['totals']['sessions'], 2)
+        self.assertEqual(stats['totals']['late_sessions'], 1)
+        self.assertEqual(stats['totals']['absences'], 1)
+        self.assertEqual(stats['totals']['penalties'], Decimal('25000.00'))
+        self.assertEqual(stats['quincena']['start'], date(2026, 3, 1))
+        self.assertEqual(stats['quincena']['gain_usd'], Decimal('150.00'))
+        self.assertEqual(len(stats['recent_sessions']), 3)
+        self.assertEqual(stats['recent_sessions'][0]['date'], date(2026, 3, 4))
+
+    def test_stats_query_count(self):
+        """Les statistiques sont calculées en un nombre de requêtes constant"""
+        with self.assertNumQueries(3):
+            get_model_personal_stats(self.model, date(2026, 3, 1), date(2026, 3, 31), today=self.today)
+
+    def test_dashboard_stats_api(self):
+        """L'API JSON retourne les statistiques du modèle connecté"""
+        client = Client()
+        client.login(username="modele", password="test123")
+        response = client.get(
+            reverse('accounts:dashboard_stats'),
+            {'period_start': '2026-03-01', 'period_end': '2026-03-31'}
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['model_id'], self.model.id)
+        self.assertEqual(Decimal(data['totals']['gain_usd']), Decimal('150.00'))
+
+    def test_dashboard_modele_renders(self):
+        """Le tableau de bord Modèle s'affiche avec les sessions récentes"""
+        client = Client()
+        client.login(username="modele", password="test123")
+        response = client.get(
+            reverse('accounts:dashboard'),
+            {'period_start': '2026-03-01', 'period_end': '2026-03-31'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['recent_sessions']), 3)
+
+
+class WorkedHoursBulkCreateTest(TestCase):
+    """Tests de la saisie groupée des heures travaillées"""
+
+    def setUp(self):
+        """Créer une agence, un Regional Manager et des modèles actifs"""
+        self.client = Client()
+        self.rm_role = Role.objects.create(name=Role.RoleType.REGIONAL_MANAGER)
+        self.agency = Agency.objects.create(name="Agencia Test", code="AGT001")
+        self.rm_user = User.objects.create_user(
+            username="regional",
+            password="test123",
+            role=self.rm_role,
+            agency=self.agency
+        )
+        self.client.login(username="regional", password="test123")
+        self.day = date(2026, 3, 10)
+
+    def _create_models(self, count):
+        Model.objects.bulk_create([
+            Model(
+                first_name=f"Modelo{i}",
+                last_name="Test",
+                agency=self.agency,
+                fecha_ingreso=date(2025, 1, 1)
+            )
+            for i in range(count)
+        ])
+        return list(Model.objects.filter(agency=self.agency).values_list('id', flat=True))
+
+    def _post_hours(self, model_ids, hours):
+        data = {'date': self.day.isoformat()}
+        data.update({f'hours_{model_id}': hours for model_id in model_ids})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('models_app:worked_hours_bulk_create'), data)
+        self.assertEqual(response.status_code, 302)
+        return len(ctx.captured_queries)
+
+    def test_bulk_upsert_creates_and_updates(self):
+        """Les heures sont créées puis mises à jour sur le même couple (modèle, date)"""
+        model_ids = self._create_models(3)
+        self._post_hours(model_ids, '7.5')
+        self._post_hours(model_ids, '8')
+        self.assertEqual(WorkedHours.objects.filter(date=self.day).count(), 3)
+        self.assertEqual(
+            set(WorkedHours.objects.filter(date=self.day).values_list('hours', flat=True)),
+            {Decimal('8.00')}
+        )
+
+    def test_bulk_upsert_query_count_is_constant(self):
+        """Benchmark : le nombre de requêtes ne dépend pas du nombre de modèles"""
+        few_ids = self._create_models(5)
+        few_queries = self._post_hours(few_ids, '6')
+        WorkedHours.objects.all().delete()
+        many_ids = self._create_models(295)
+        many_queries = self._post_hours(many_ids, '6')
+        self.assertEqual(WorkedHours.objects.filter(date=self.day).count(), 300)
+        # Seuls les lots d'INSERT supplémentaires (limite de paramètres SQLite) s'ajoutent
+        self.assertLessEqual(many_queries, few_queries + 2)
+        self.assertLess(many_queries, 15)
+
+    def test_week_grid_saves_whole_matrix(self):
+        """La grille semaine × modèles est enregistrée en un seul envoi puis rechargée"""
+        model_ids = self._create_models(2)
+        week_start = date(2026, 3, 9)
+        data = {'week': week_start.isoformat()}
+        for model_id in model_ids:
+            for offset in range(7):
+                day = week_start + timedelta(days=offset)
+                data[f'hours_{model_id}_{day:%Y%m%d}'] = '' if offset == 6 else '5'
+        response = self.client.post(reverse('models_app:worked_hours_week_grid'), data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(WorkedHours.objects.count(), 12)
+
+        response = self.client.get(reverse('models_app:worked_hours_week_grid'), {'week': '2026-03-12'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['week_start'], week_start)
+        self.assertEqual(response.context['week_total'], Decimal('60.00'))
+        self.assertEqual(response.context['rows'][0]['total'], Decimal('30.00'))
+
+
+class GainBulkCreateTest(TestCase):
+    """Tests de la saisie groupée des gains"""
+
+    def setUp(self):
+        """Créer une agence avec des pourcentages, un Regional Manager et deux modèles"""
+        self.client = Client()
+        self.rm_role = Role.objects.create(name=Role.RoleType.REGIONAL_MANAGER)
+        self.agency = Agency.objects.create(
+            name="Agencia Test",
+            code="AGT001",
+            model_gain_percentage=Decimal('50.00'),
+            bank_fee_percentage=Decimal('10.00'),
+        )
+        User.objects.create_user(
+            username="regional",
+            password="test123",
+            role=self.rm_role,
+            agency=self.agency
+        )
+        self.client.login(username="regional", password="test123")
+        self.day = date(2026, 3, 10)
+        self.models = [
+            Model.objects.create(
+                first_name=f"Modelo{i}", last_name="Test", agency=self.agency, fecha_ingreso=date(2025, 1, 1)
+            )
+            for i in range(2)
+        ]
+        self.session = WorkSession.objects.create(
+            model=self.models[0],
+            date=self.day,
+            status=WorkSession.Status.STARTED,
+            late_penalty_amount=Decimal('1000.00'),
+        )
+
+    def _post(self, **extra):
+        data = {'date': self.day.isoformat(), **extra}
+        with mock.patch('models_app.views.get_trm_rate', return_value=Decimal('4000.00')) as trm:
+            response = self.client.post(reverse('models_app:gain_bulk_create'), data)
+        self.assertEqual(response.status_code, 302)
+        return trm
+
+    def test_single_trm_call_and_upsert(self):
+        """Un seul appel TRM pour toute la saisie ; les gains existants sont mis à jour"""
+        ModelGain.objects.create(model=self.models[1], date=self.day, amount=Decimal('1.00'))
+        trm = self._post(**{f'gain_{self.models[0].id}': '100', f'gain_{self.models[1].id}': '25.5'})
+        trm.assert_called_once_with(self.day)
+        self.assertEqual(ModelGain.objects.filter(date=self.day).count(), 2)
+        self.assertEqual(ModelGain.objects.get(model=self.models[1]).amount, Decimal('102000.00'))
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, WorkSession.Status.STARTED)
+
+    def test_complete_sessions_with_snapshots(self):
+        """Les sessions en cours sont complétées avec leurs valeurs financières"""
+        self._post(**{f'gain_{self.models[0].id}': '100', 'complete_sessions': 'on'})
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, WorkSession.Status.COMPLETED)
+        self.assertEqual(self.session.session_gain_amount, Decimal('400000.00'))
+        self.assertEqual(self.session.session_bank_fees, Decimal('40000.00'))
+        self.assertEqual(self.session.session_model_ganancia, Decimal('179000.00'))
+        self.assertEqual(self.session.model_gain_percentage_snapshot, Decimal('50.00'))
+
+    def test_completed_session_keeps_snapshot(self):
+        """Une nouvelle saisie sur une session complétée garde les pourcentages figés"""
+        self._post(**{f'gain_{self.models[0].id}': '100', 'complete_sessions': 'on'})
+        self.agency.model_gain_percentage = Decimal('80.00')
+        self.agency.bank_fee_percentage = Decimal('0.00')
+        self.agency.save()
+
+        self._post(**{f'gain_{self.models[0].id}': '200', 'complete_sessions': 'on'})
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.model_gain_percentage_snapshot, Decimal('50.00'))
+        self.assertEqual(self.session.bank_fee_percentage_snapshot, Decimal('10.00'))
+        self.assertEqual(self.session.session_gain_amount, Decimal('800000.00'))
+        self.assertEqual(self.session.session_model_ganancia, Decimal('359000.00'))
+
+
+class EarningsImportTest(TestCase):
+    """Tests de l'import des gains depuis un fichier"""
+
+    def setUp(self):
+        """Créer une agence, un Regional Manager, deux modèles et une session complétée"""
+        self.rm_role = Role.objects.create(name=Role.RoleType.REGIONAL_MANAGER)
+        self.agency = Agency.objects.create(
+            name="Agencia Test", code="AGT001", model_gain_percentage=Decimal('50.00')
+        )
+        User.objects.create_user(username="regional", password="test123", role=self.rm_role, agency=self.agency)
+        self.model_a = Model.objects.create(
+            first_name="Ana", last_name="Test", agency=self.agency, cedula="123", fecha_ingreso=date(2025, 1, 1)
+        )
+        self.model_b = Model.objects.create(
+            first_name="Bea", last_name="Test", agency=self.agency, email="bea@test.com", fecha_ingreso=date(2025, 1, 1)
+        )
+        self.session = WorkSession.objects.create(
+            model=self.model_a, date=date(2026, 3, 10), status=WorkSession.Status.COMPLETED
+        )
+
+    def test_command_imports_csv_and_reports_rejects(self):
+        """Une consultation TRM par date ; les lignes invalides sont rejetées dans le rapport"""
+        content = (
+            "cedula,email,date,amount_usd\n"
+            "123,,2026-03-10,100\n"
+            ",BEA@test.com,2026-03-10,50\n"
+            ",bea@test.com,2026-03-11,20\n"
+            "999,,2026-03-10,10\n"
+            "123,,2026-13-01,10\n"
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'earnings.csv')
+            rejects = os.path.join(tmp, 'rejects.csv')
+            with open(source, 'w', encoding='utf-8') as f:
+                f.write(content)
+            with mock.patch('models_app.importers.get_trm_rate', return_value=Decimal('4000.00')) as trm:
+                call_command('import_earnings', source, rejects=rejects, chunk_size=2, stdout=io.StringIO())
+            with open(rejects, encoding='utf-8') as f:
+                report = f.read().splitlines()
+
+        self.assertEqual(trm.call_count, 2)
+        self.assertEqual(ModelGain.objects.count(), 3)
+        self.assertEqual(ModelGain.objects.get(model=self.model_b, date=date(2026, 3, 10)).amount, Decimal('200000.00'))
+        self.assertEqual(len(report), 3)
+        self.assertIn('Modelo no encontrado', report[1])
+        self.assertIn('Fecha inválida', report[2])
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.session_gain_amount_usd, Decimal('100.00'))
+        self.assertEqual(self.session.session_model_ganancia, Decimal('200000.00'))
+
+    def test_upload_view_imports_json_lines(self):
+        """L'import par téléversement lit un fichier JSON Lines limité à l'agence du manager"""
+        client = Client()
+        client.login(username="regional", password="test123")
+        upload = SimpleUploadedFile(
+            'earnings.jsonl',
+            b'{"model_id": "%d", "date": "2026-03-10", "amount_usd": "10"}\nnot json\n' % self.model_b.id,
+        )
+        with mock.patch('models_app.importers.get_trm_rate', return_value=Decimal('4000.00')):
+            response = client.post(reverse('models_app:earnings_import'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result']['gains'], 1)
+        self.assertEqual(response.context['result']['rejected'], 1)
+        self.assertEqual(ModelGain.objects.get(model=self.model_b).amount, Decimal('40000.00'))
+
+    def test_upload_view_rejects_json_array(self):
+        """Un fichier .json (tableau JSON) est refusé au lieu d'être lu comme JSON Lines"""
+        client = Client()
+        client.login(username="regional", password="test123")
+        upload = SimpleUploadedFile(
+            'earnings.json',
+            b'[{"model_id": "%d", "date": "2026-03-10", "amount_usd": "10"}]' % self.model_b.id,
+        )
+        response = client.post(reverse('models_app:earnings_import'), {'file': upload}, follow=True)
+        self.assertContains(response, 'Formato de archivo no soportado')
+        self.assertFalse(ModelGain.objects.exists())
+
+    def test_upload_view_background_import(self):
+        """En segundo plano, le fichier est déposé et importé par le worker"""
+        client = Client()
+        client.login(username="regional", password="test123")
+        upload = SimpleUploadedFile('earnings.csv', b'cedula,date,amount_usd\n123,2026-03-10,5\n')
+        with tempfile.TemporaryDirectory() as media_root, tempfile.TemporaryDirectory() as private_root, \
+                self.settings(MEDIA_ROOT=media_root, PRIVATE_ROOT=private_root):
+            response = client.post(reverse('models_app:earnings_import'), {'file': upload, 'background': '1'})
+            job = Job.objects.get()
+            self.assertEqual(job.max_attempts, 1)
+            self.assertEqual(os.listdir(media_root), [])
+            stored = os.listdir(os.path.join(private_root, 'imports', 'earnings'))
+            self.assertEqual(len(stored), 1)
+            self.assertNotIn('earnings', stored[0])
+            self.assertRedirects(response, reverse('jobs:job_detail', args=[job.id]))
+            self.assertFalse(ModelGain.objects.exists())
+            with mock.patch('models_app.importers.get_trm_rate', return_value=Decimal('4000.00')):
+                job = run_job(claim_next('worker-1'))
+            self.assertFalse(os.listdir(os.path.join(private_root, 'imports', 'earnings')))
+        self.assertEqual(job.status, Job.Status.SUCCEEDED)
+        self.assertEqual(job.result['gains'], 1)
+        self.assertEqual(ModelGain.objects.get(model=self.model_a).amount, Decimal('20000.00'))
+
+    def test_out_of_range_amount_and_encoding_error(self):
+        """Montants hors limites rejetés ; un octet non UTF-8 arrête l'import en indiquant la ligne"""
+        # Lignes longues : l'octet invalide est décodé bien après les premiers lots
+        padding = b"x" * 20000
+        content = (
+            b"cedula,email,date,amount_usd,description\n"
+            b"123,,2026-03-10,30000,\n"
+            b",bea@test.com,2026-03-10,1e30,\n"
+            b"123,,2026-03-11,10," + padding + b"\n"
+            b",bea@test.com,2026-03-11,10," + padding + b"\xff\n"
+        )
+        stream = io.TextIOWrapper(io.BytesIO(content), encoding='utf-8-sig', newline='')
+        with mock.patch('models_app.importers.get_trm_rate', return_value=Decimal('4000.00')):
+            result = importers.import_earnings(stream, 'csv', None, chunk_size=1)
+        self.assertEqual(result['decode_error_line'], 5)
+        self.assertEqual([reject['reason'] for reject in result['rejects']], ['Monto fuera de rango', 'Monto inválido'])
+        self.assertEqual(result['gains'], 1)
+        self.assertEqual(ModelGain.objects.get().amount, Decimal('40000.00'))
+
+
+class ModelListTest(TestCase):
+    """Tests de la liste paginée des modèles avec indicateurs"""
+
+    def setUp(self):
+        """Créer un Regional Manager et 30 modèles, dont deux avec des sessions récentes"""
+        self.client = Client()
+        rm_role = Role.objects.create(name=Role.RoleType.REGIONAL_MANAGER)
+        self.agency = Agency.objects.create(name="Agencia Test", code="AGT001")
+        User.objects.create_user(username="regional", password="test123", role=rm_role, agency=self.agency)
+        self.client.login(username="regional", password="test123")
+        Model.objects.bulk_create([
+            Model(first_name=f"Modelo{i:02d}", last_name="Test", agency=self.agency, fecha_ingreso=date(2025, 1, 1))
+            for i in range(30)
+        ])
+        self.ana = Model.objects.create(first_name="Ana", last_name="Ruiz", cedula="1010", agency=self.agency, fecha_ingreso=date(2025, 1, 1))
+        today = timezone.now().date()
+        for model, days_ago, gain, late in [
+            (self.ana, 1, '300000.00', 15),
+            (self.ana, 2, '100000.00', 0),
+            (self.ana, 45, '900000.00', 0),
+        ]:
+            WorkSession.objects.create(
+                model=model,
+                date=today - timedelta(days=days_ago),
+                status=WorkSession.Status.COMPLETED,
+                total_worked_hours=Decimal('6.00'),
+                session_gain_amount=Decimal(gain),
+                late_minutes=late,
+            )
+
+    def test_sort_by_gain_with_kpis(self):
+        """Le tri par gain place en tête le modèle ayant des sessions dans les 30 derniers jours"""
+        response = self.client.get(reverse('models_app:list'), {'sort': 'gain'})
+        page = response.context['page_obj']
+        self.assertEqual(page.paginator.count, 31)
+        self.assertEqual(len(page.object_list), 25)
+        first = page.object_list[0]
+        self.assertEqual(first.id, self.ana.id)
+        self.assertEqual(first.gain_30d_cop, Decimal('400000.00'))
+        self.assertEqual(first.hours_30d, Decimal('12.00'))
+        self.assertEqual((first.sessions_30d, first.late_30d), (2, 1))
+
+    def test_search_and_constant_query_count(self):
+        """La recherche filtre par cédula ; le nombre de requêtes ne dépend pas de la taille de la page"""
+        response = self.client.get(reverse('models_app:list'), {'q': '1010'})
+        self.assertEqual([model.id for model in response.context['models']], [self.ana.id])
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse('models_app:list'), {'q': 'Ruiz'})
+        with CaptureQueriesContext(connection) as full:
+            self.client.get(reverse('models_app:list'))
+        self.assertEqual(len(small.captured_queries), len(full.captured_queries))
+
+    def test_autocomplete_scoped_ranked_and_limited(self):
+        """L'autocomplétion est limitée à l'agence, classe les préfixes en tête et borne les résultats"""
+        other = Agency.objects.create(name="Otra", code="AGT002")
+        Model.objects.create(first_name="Anabel", last_name="Lejos", agency=other, fecha_ingreso=date(2025, 1, 1))
+        Model.objects.create(first_name="Juliana", last_name="Vega", agency=self.agency, fecha_ingreso=date(2025, 1, 1))
+        url = reverse('models_app:autocomplete')
+
+        results = self.client.get(url, {'q': 'ana'}).json()['results']
+        self.assertEqual([result['text'] for result in results], ["Ana Ruiz", "Juliana Vega"])
+        self.assertEqual(results[0]['cedula'], "1010")
+        self.assertEqual(self.client.get(url, {'q': 'a'}).json()['results'], [])
+        self.assertEqual(len(self.client.get(url, {'q': 'modelo', 'limit': '100'}).json()['results']), 20)
+        self.assertEqual(self.client.get(url, {'q': 'ana', 'exclude': self.ana.id}).json()['results'][0]['text'], "Juliana Vega")
+
+        # Les formulaires n'embarquent plus la liste des modèles
+        response = self.client.get(reverse('models_app:update', args=[self.ana.id]))
+        self.assertContains(response, 'data-model-autocomplete')
+        self.assertNotContains(response, 'Modelo00')
+
+
+
+class ReferralNetworkTest(TestCase):
+    """Tests du réseau de parrainage (CTE récursive et parcours de repli)"""
+
+    def setUp(self):
+        """Créer l'arbre ana -> (bea -> (carla -> dora), eva) et une boucle fer <-> gina"""
+        self.agency = Agency.objects.create(name="Agencia Test", code="AGT001")
+
+        def create(name, referred_by=None):
+            return Model.objects.create(
+                first_name=name, last_name="Test", agency=self.agency,
+                fecha_ingreso=date(2025, 1, 1), referred_by=referred_by,
+            )
+
+        self.ana = create("Ana")
+        self.bea = create("Bea", self.ana)
+        self.carla = create("Carla", self.bea)
+        self.dora = create("Dora", self.carla)
+        self.eva = create("Eva", self.ana)
+        self.fer = create("Fer")
+        self.gina = create("Gina", self.fer)
+        Model.objects.filter(id=self.fer.id).update(referred_by=self.gina)
+
+        for model, day, gain in [
+            (self.ana, 2, '999000.00'),
+            (self.bea, 2, '100000.00'),
+            (self.eva, 3, '50000.00'),
+            (self.dora, 4, '25000.00'),
+            (self.dora, 20, '70000.00'),
+        ]:
+            WorkSession.objects.create(
+                model=model,
+                date=date(2026, 3, day),
+                status=WorkSession.Status.COMPLETED,
+                session_gain_amount=Decimal(gain),
+                session_gain_amount_usd=Decimal(gain) / 4000,
+            )
+
+    def test_descendants_ancestors_and_revenue(self):
+        """Filleuls, parrains et gains du réseau en une requête, identiques au parcours de repli"""
+        expected = {self.bea.id: 1, self.eva.id: 1, self.carla.id: 2, self.dora.id: 3}
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(referrals.get_descendants(self.ana.id), expected)
+            network = referrals.referred_revenue(self.ana.id, date(2026, 3, 1), date(2026, 3, 15))
+        self.assertEqual(len(queries.captured_queries), 2)
+        self.assertEqual(referrals.get_descendants(self.ana.id, max_depth=1), {self.bea.id: 1, self.eva.id: 1})
+        self.assertEqual(referrals.get_ancestors(self.dora.id), [self.carla.id, self.bea.id, self.ana.id])
+
+        self.assertEqual((network['models'], network['depth'], network['sessions']), (4, 3, 3))
+        self.assertEqual(network['gain_cop'], Decimal('175000.00'))
+        self.assertEqual(
+            [(level['depth'], level['models'], level['gain_cop']) for level in network['levels']],
+            [(1, 2, Decimal('150000.00')), (2, 1, Decimal('0.00')), (3, 1, Decimal('25000.00'))],
+        )
+
+        with mock.patch.object(referrals, 'RECURSIVE_CTE_VENDORS', set()):
+            self.assertEqual(referrals.get_descendants(self.ana.id), expected)
+            self.assertEqual(referrals.get_ancestors(self.dora.id), [self.carla.id, self.bea.id, self.ana.id])
+            self.assertEqual(
+                referrals.referred_revenue(self.ana.id, date(2026, 3, 1), date(2026, 3, 15)), network
+            )
+
+    def test_revenue_limited_to_agency_and_managers(self):
+        """Le Regional Manager ne voit que les filleuls de son agence ; le modèle ne voit pas son réseau"""
+        other = Agency.objects.create(name="Otra Agencia", code="AGT002")
+        Model.objects.filter(id=self.eva.id).update(agency=other)
+        network = referrals.referred_revenue(self.ana.id, date(2026, 3, 1), date(2026, 3, 15), agency_id=self.agency.id)
+        self.assertEqual((network['models'], network['depth'], network['sessions']), (3, 3, 2))
+        self.assertEqual(network['gain_cop'], Decimal('125000.00'))
+        with mock.patch.object(referrals, 'RECURSIVE_CTE_VENDORS', set()):
+            self.assertEqual(
+                referrals.referred_revenue(
+                    self.ana.id, date(2026, 3, 1), date(2026, 3, 15), agency_id=self.agency.id
+                ),
+                network,
+            )
+
+        rm_role = Role.objects.create(name=Role.RoleType.REGIONAL_MANAGER)
+        modele_role = Role.objects.create(name=Role.RoleType.MODELE)
+        User.objects.create_user(username="regional", password="test123", role=rm_role, agency=self.agency)
+        self.ana.user = User.objects.create_user(username="ana", password="test123", role=modele_role, agency=self.agency)
+        self.ana.save(update_fields=['user'])
+        client = Client()
+
+        client.login(username="regional", password="test123")
+        response = client.get(reverse('models_app:detail', args=[self.ana.id]))
+        self.assertEqual(response.context['referral_network']['models'], 3)
+        self.assertContains(response, 'Red completa')
+
+        client.login(username="ana", password="test123")
+        response = client.get(reverse('models_app:detail', args=[self.ana.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['referral_network'])
+        self.assertNotContains(response, 'Red completa')
+
+    def test_cycle_is_bounded(self):
+        """Une boucle de parrainage ne compte chaque modèle qu'une fois et exclut le modèle lui-même"""
+        self.assertEqual(referrals.get_descendants(self.fer.id), {self.gina.id: 1})
+        self.assertEqual(referrals.get_ancestors(self.fer.id), [self.gina.id])
+        with mock.patch.object(referrals, 'RECURSIVE_CTE_VENDORS', set()):
+            self.assertEqual(referrals.get_descendants(self.fer.id), {self.gina.id: 1})
+            self.assertEqual(referrals.get_ancestors(self.fer.id), [self.gina.id])
+
+
+class OnboardingTest(TestCase):
+    """Tests de la création groupée de modèles"""
+
+    def setUp(self):
+        """Créer une agence, les rôles, un Regional Manager, un modèle et un compte ana.ruiz"""
+        Role.objects.create(name=Role.RoleType.MODELE)
+        rm_role = Role.objects.create(name=Role.RoleType.REGIONAL_MANAGER)
+        self.agency = Agency.objects.create(name="Agencia Test", code="AGT001")
+        User.objects.create_user(username="regional", password="test123", role=rm_role, agency=self.agency)
+        User.objects.create_user(username="ana.ruiz", password="test123")
+        User.objects.create_user(username="ana.ruiz1", password="test123")
+        self.referrer = Model.objects.create(
+            first_name="Bea", last_name="Test", agency=self.agency, cedula="100", fecha_ingreso=date(2025, 1, 1)
+        )
+
+    def test_onboard_rows_in_bulk(self):
+        """Noms d'utilisateur résolus en une requête, lignes invalides ignorées, insertion groupée"""
+        content = (
+            "first_name,last_name,fecha_ingreso,email,cedula,eps,referred_by,create_user\n"
+            "Ana,Ruiz,2026-03-01,,200,sanitas,100,\n"
+            "Ana,Ruiz,2026-03-01,ana@test.com,201,,,\n"
+            "Carla,Gomez,2026-03-02,,202,,,no\n"
+            "Dora,,2026-13-01,bad,100,XYZ,999,\n"
+            "Eva,Diaz,2026-03-03,,200,,,\n"
+        )
+        with CaptureQueriesContext(connection) as queries:
+            result = onboarding.onboard_models(io.StringIO(content), self.agency, workers=1)
+        # cédulas, rôle, noms d'utilisateur, utilisateurs, modèles (+ savepoint)
+        self.assertLessEqual(len(queries.captured_queries), 7)
+
+        self.assertEqual((result['rows'], result['created']), (5, 3))
+        self.assertEqual([error['line'] for error in result['errors']], [5, 6])
+        self.assertEqual(len(result['errors'][0]['errors']), 6)
+        self.assertEqual([account['username'] for account in result['accounts']], ['ana.ruiz2', 'ana.ruiz3'])
+
+        first = Model.objects.get(cedula="200", agency=self.agency)
+        self.assertEqual((first.eps, first.referred_by_id, first.status), ('SANITAS', self.referrer.id, Model.Status.ACTIVE))
+        self.assertEqual(first.user.role.name, Role.RoleType.MODELE)
+        self.assertTrue(first.user.check_password(result['accounts'][0]['password']))
+        self.assertEqual(Model.objects.get(cedula="201").user.email, 'ana@test.com')
+        self.assertIsNone(Model.objects.get(cedula="202").user)
+
+    def test_column_limits_reported_per_row(self):
+        """Longueurs et âge hors limites signalés par ligne ; création concurrente signalée par la vue"""
+        long_name = "A" * 101
+        content = (
+            "first_name,last_name,fecha_ingreso,phone,cedula,edad,create_user\n"
+            f"{long_name},Ruiz,2026-03-01,,,,no\n"
+            f"Ana,Ruiz,2026-03-01,{'1' * 21},{'2' * 21},99999999999,no\n"
+            f"{'B' * 80},{'C' * 80},2026-03-01,,,,si\n"
+            "Luz,Mora,2026-03-01,,,30,no\n"
+        )
+        result = onboarding.onboard_models(io.StringIO(content), self.agency, workers=1)
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(len(result['errors'][0]['errors']), 1)
+        self.assertEqual(len(result['errors'][1]['errors']), 3)
+        self.assertIn('Edad inválida', result['errors'][1]['errors'])
+        self.assertEqual(result['errors'][2]['errors'], ['Nombre de usuario demasiado largo'])
+
+        client = Client()
+        client.force_login(User.objects.get(username="regional"))
+        upload = SimpleUploadedFile("modelos.csv", b"first_name,last_name,fecha_ingreso\nEva,Diaz,2026-03-01\n")
+        with mock.patch.object(onboarding.User.objects, 'bulk_create', side_effect=IntegrityError):
+            response = client.post(reverse('models_app:onboarding'), {'file': upload, 'create_users': '1'}, follow=True)
+        self.assertRedirects(response, reverse('models_app:onboarding'))
+        self.assertFalse(Model.objects.filter(first_name="Eva").exists())
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_parallel_hashing_and_view(self):
+        """Hachage en pool de processus identique au hachage séquentiel ; la vue hache sans pool"""
+        passwords = [f"secret{i}" for i in range(onboarding.MIN_PARALLEL_HASHES)]
+        hashes = onboarding.hash_passwords(passwords, workers=2)
+        self.assertEqual(len(hashes), len(passwords))
+        self.assertTrue(all(User(password=h).check_password(p) for h, p in zip(hashes, passwords)))
+
+        client = Client()
+        client.force_login(User.objects.get(username="regional"))
+        rows = "Luz,Mora,2026-03-01\n" + "".join(f"Luz{i},Mora,2026-03-01\n" for i in range(1, len(passwords)))
+        upload = SimpleUploadedFile("modelos.csv", f"first_name,last_name,fecha_ingreso\n{rows}".encode('utf-8'))
+        with mock.patch.object(onboarding, 'ProcessPoolExecutor') as pool:
+            response = client.post(reverse('models_app:onboarding'), {'file': upload, 'create_users': '1'})
+        pool.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result']['created'], len(passwords))
+        self.assertContains(response, 'luz.mora')
+        self.assertTrue(Model.objects.filter(first_name="Luz", agency=self.agency, user__username="luz.mora").exists())
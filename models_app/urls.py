@@ -7,14 +7,19 @@ app_name = 'models_app'
 urlpatterns = [
     # Modèles
     path('', views.model_list, name='list'),
+    path('autocomplete/', views.model_autocomplete, name='autocomplete'),
     path('<int:model_id>/', views.model_detail, name='detail'),
     path('create/', views.model_create, name='create'),
+    path('onboarding/', views.model_onboarding, name='onboarding'),
     path('<int:model_id>/update/', views.model_update, name='update'),
     path('<int:model_id>/deactivate/', views.model_deactivate, name='deactivate'),
     path('<int:model_id>/reactivate/', views.model_reactivate, name='reactivate'),
     path('<int:model_id>/user/reset-password/', views.model_user_reset_password, name='model_user_reset_password'),
     path('<int:model_id>/gains/create/', views.gain_create, name='gain_create'),
+    path('gains/bulk/', views.gain_bulk_create, name='gain_bulk_create'),
+    path('gains/import/', views.earnings_import, name='earnings_import'),
     path('worked-hours/', views.worked_hours_bulk_create, name='worked_hours_bulk_create'),
+    path('worked-hours/week/', views.worked_hours_week_grid, name='worked_hours_week_grid'),
     
     # Horaires (Schedules)
     path('schedules/', schedule_views.schedule_list, name='schedule_list'),
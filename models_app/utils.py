@@ -3,7 +3,8 @@ Utilitaire pour la conversion USD vers COP en utilisant le TRM (Tasa Representat
 """
 from suds.client import Client
 from decimal import Decimal
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+from calendar import monthrange
 import logging
 
 logger = logging.getLogger(__name__)
@@ -66,3 +67,63 @@ def convert_usd_to_cop(usd_amount, date_obj=None):
     cop_amount = usd_decimal * trm_rate
     
     return cop_amount, trm_rate
+
+
+# Correspondance des jours de la semaine des horaires avec date.weekday() (0 = lundi)
+WEEKDAY_NUMBERS = {
+    'MONDAY': 0,
+    'TUESDAY': 1,
+    'WEDNESDAY': 2,
+    'THURSDAY': 3,
+    'FRIDAY': 4,
+    'SATURDAY': 5,
+    'SUNDAY': 6,
+}
+
+
+def get_quincena_bounds(day):
+    """
+    Retourne les bornes de la quinzaine (1-15 ou 16-fin du mois) contenant une date.
+    
+    Args:
+        day (date): Date de référence
+    
+    Returns:
+        tuple: (debut_quinzaine, fin_quinzaine)
+    """
+    if day.day <= 15:
+        return day.replace(day=1), day.replace(day=15)
+    last_day = monthrange(day.year, day.month)[1]
+    return day.replace(day=16), day.replace(day=last_day)
+
+
+def count_scheduled_days(week_days_values, period_start, period_end):
+    """
+    Compte les jours d'une période qui tombent sur les jours travaillés des horaires.
+    
+    Args:
+        week_days_values: Valeurs du champ Schedule.week_days (ex: ['MONDAY,TUESDAY', 'FRIDAY'])
+        period_start (date): Date de début de la période
+        period_end (date): Date de fin de la période
+    
+    Returns:
+        int: Nombre de jours travaillés selon l'union des horaires
+    """
+    worked_weekday_numbers = set()
+    for week_days in week_days_values:
+        for day in (week_days or '').split(','):
+            day = day.strip()
+            if day in WEEKDAY_NUMBERS:
+                worked_weekday_numbers.add(WEEKDAY_NUMBERS[day])
+    
+    if not worked_weekday_numbers:
+        return 0
+    
+    count = 0
+    current_date = period_start
+    while current_date <= period_end:
+        if current_date.weekday() in worked_weekday_numbers:
+            count += 1
+        current_date += timedelta(days=1)
+    
+    return count
@@ -1,102 +1,69 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
 from django.contrib import messages
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Q, Sum, Avg
+from django.db import IntegrityError
+from django.db.models import F, Q, Sum, Avg
+from django.core.paginator import Paginator
 from django.utils import timezone
+from django.urls import reverse
+import io
+import os
+import uuid
 from datetime import datetime, date, timedelta
 from calendar import monthrange
 from decimal import Decimal
-from .models import Model, ModelGain, WorkedHours, WorkSession, ScheduleAssignment, Schedule
-from .utils import convert_usd_to_cop, get_trm_rate
+from .models import Model, ModelGain, WorkedHours, WorkSession, ScheduleAssignment, Schedule, active_by_dates_q
+from .utils import convert_usd_to_cop, get_trm_rate, count_scheduled_days
+from .bulk import parse_hours, parse_amount, to_cop, upsert_worked_hours, upsert_gains
+from .importers import detect_format, import_earnings
+from .bonuses import compute_period_bonuses
+from .kpis import KPI_DAYS, annotate_kpis
+from .onboarding import onboard_models, resolve_usernames, username_base
+from .referrals import referred_revenue
+from .search import search_models
+from .tasks import import_earnings_file
 from agencies.models import Agency, BonusRule
 from accounts.decorators import regional_manager_required, agency_required, role_required
 from accounts.models import Role
-from accounts.utils import filter_by_agency_queryset
+from accounts.refdata import get_agencies, get_bonus_rules, get_role
+from accounts.storage import private_storage
+from accounts.utils import pop_temporary_password, store_temporary_password
+from jobs.queue import enqueue
 
 
-def count_worked_days_in_period(model, period_start, period_end):
-    """
-    Compte le nombre de jours travaillés dans une période selon l'horaire du modèle.
-    
-    Args:
-        model: Instance du modèle
-        period_start: Date de début de la période
-        period_end: Date de fin de la période
-    
-    Returns:
-        int: Nombre de jours travaillés dans la période selon l'horaire
-    """
-    # Récupérer toutes les assignations d'horaires actives du modèle
-    schedule_assignments = ScheduleAssignment.objects.filter(
-        model=model,
-        is_active=True
-    ).select_related('schedule')
-    
-    if not schedule_assignments.exists():
-        # Si pas d'horaire, retourner 0
-        return 0
-    
-    # Récupérer tous les jours de la semaine travaillés (union de tous les horaires)
-    worked_weekdays = set()
-    for assignment in schedule_assignments:
-        schedule = assignment.schedule
-        if schedule.week_days:
-            days = schedule.get_week_days_list()
-            worked_weekdays.update(days)
-    
-    if not worked_weekdays:
-        # Si aucun jour défini, retourner 0
-        return 0
-    
-    # Mapper les jours de la semaine aux numéros (0 = lundi, 6 = dimanche)
-    weekday_map = {
-        'MONDAY': 0,
-        'TUESDAY': 1,
-        'WEDNESDAY': 2,
-        'THURSDAY': 3,
-        'FRIDAY': 4,
-        'SATURDAY': 5,
-        'SUNDAY': 6,
-    }
-    
-    # Convertir les jours travaillés en numéros
-    worked_weekday_numbers = {weekday_map[day] for day in worked_weekdays if day in weekday_map}
-    
-    # Compter les jours dans la période qui correspondent aux jours travaillés
-    count = 0
-    current_date = period_start
-    while current_date <= period_end:
-        # weekday() retourne 0 pour lundi, 6 pour dimanche
-        if current_date.weekday() in worked_weekday_numbers:
-            count += 1
-        current_date += timedelta(days=1)
-    
-    return count
+# Tris disponibles de la liste des modèles : paramètre GET -> expression d'ordre
+MODEL_LIST_SORTS = {
+    'name': ['first_name', 'last_name'],
+    'agency': ['agency__name', 'first_name', 'last_name'],
+    'recent': ['-created_at'],
+    'gain': [F('gain_30d_cop').desc(), 'first_name'],
+    'gain_usd': [F('gain_30d_usd').desc(), 'first_name'],
+    'hours': [F('hours_30d').desc(), 'first_name'],
+    'sessions': [F('sessions_30d').desc(), 'first_name'],
+    'late': [F('late_30d').desc(), 'first_name'],
+    'quincena': [F('quincena_avg').desc(nulls_last=True), 'first_name'],
+}
+MODEL_LIST_PAGE_SIZE = 25
 
 
 @login_required
 def model_list(request):
     """
-    Liste des modèles
+    Liste paginée des modèles avec recherche, tri et indicateurs des 30 derniers jours
     - General Manager : voit tous les modèles (actifs et inactifs)
     - Regional Manager : voit uniquement les modèles de son agence (actifs par défaut)
     - Modèle : voit uniquement son propre profil
+    
+    Les indicateurs sont des sous-requêtes : chaque page est lue en une seule requête.
     """
-    if request.user.is_general_manager():
-        # General Manager voit tout
-        models = Model.objects.all().order_by('-created_at')
-        show_inactive = request.GET.get('show_inactive', 'false') == 'true'
+    show_inactive = request.GET.get('show_inactive', 'false') == 'true'
+    if request.user.is_general_manager() or (request.user.is_regional_manager() and request.user.agency):
+        # General Manager voit tout, Regional Manager les modèles de son agence (périmètre de la requête)
+        models = Model.scoped.all()
         if not show_inactive:
-            # Utiliser le manager qui filtre selon les dates d'entrée et de sortie
-            models = Model.active_by_dates.all().order_by('-created_at')
-    elif request.user.is_regional_manager() and request.user.agency:
-        # Regional Manager voit les modèles de son agence
-        models = Model.objects.filter(agency=request.user.agency).order_by('-created_at')
-        show_inactive = request.GET.get('show_inactive', 'false') == 'true'
-        if not show_inactive:
-            # Utiliser le manager qui filtre selon les dates d'entrée et de sortie
-            models = Model.active_by_dates.filter(agency=request.user.agency).order_by('-created_at')
+            models = models.filter(active_by_dates_q())
     elif request.user.is_modele() and hasattr(request.user, 'model_profile'):
         # Modèle voit uniquement son profil
         models = Model.objects.filter(id=request.user.model_profile.id)
@@ -104,13 +71,80 @@ def model_list(request):
         models = Model.objects.none()
         messages.warning(request, _('No tiene acceso a los modelos.'))
     
+    # Recherche : chaque mot doit apparaître dans le nom, la cédula, l'email ou l'agence
+    search = request.GET.get('q', '').strip()
+    for term in search.split():
+        models = models.filter(
+            Q(first_name__icontains=term)
+            | Q(last_name__icontains=term)
+            | Q(cedula__icontains=term)
+            | Q(email__icontains=term)
+            | Q(agency__name__icontains=term)
+        )
+    
+    sort = request.GET.get('sort', 'recent')
+    if sort not in MODEL_LIST_SORTS:
+        sort = 'recent'
+    models = annotate_kpis(models.select_related('agency', 'user'), timezone.now().date())
+    models = models.order_by(*MODEL_LIST_SORTS[sort], 'id')
+    
+    page = Paginator(models, MODEL_LIST_PAGE_SIZE).get_page(request.GET.get('page'))
+    
+    # Paramètres conservés dans les liens de tri et de pagination
+    filters = request.GET.copy()
+    filters.pop('page', None)
+    filters.pop('sort', None)
+    
     context = {
-        'models': models,
-        'show_inactive': request.GET.get('show_inactive', 'false') == 'true',
+        'models': page.object_list,
+        'page_obj': page,
+        'search': search,
+        'sort': sort,
+        'filters_query': filters.urlencode(),
+        'show_inactive': show_inactive,
+        'kpi_days': KPI_DAYS,
     }
     return render(request, 'models_app/list.html', context)
 
 
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+def model_autocomplete(request):
+    """
+    Autocomplétion JSON des modèles (nom, cédula, email), limitée à l'agence de l'utilisateur.
+
+    Paramètres GET : ``q`` (saisie), ``agency`` (General Manager), ``exclude`` (id à exclure),
+    ``all=1`` (inclure les modèles inactifs), ``limit`` (10 par défaut, 20 au plus).
+    """
+    models = Model.scoped.all()
+    if request.GET.get('all') != '1':
+        models = models.filter(active_by_dates_q())
+    agency_id = request.GET.get('agency', '')
+    if agency_id.isdigit():
+        models = models.filter(agency_id=agency_id)
+    exclude_id = request.GET.get('exclude', '')
+    if exclude_id.isdigit():
+        models = models.exclude(id=exclude_id)
+    limit = request.GET.get('limit', '')
+    limit = int(limit) if limit.isdigit() else 10
+    
+    results = search_models(models, request.GET.get('q', ''), limit).values(
+        'id', 'first_name', 'last_name', 'cedula', 'email', 'agency__name'
+    )
+    return JsonResponse({
+        'success': True,
+        'results': [
+            {
+                'id': row['id'],
+                'text': f"{row['first_name']} {row['last_name']}",
+                'cedula': row['cedula'] or '',
+                'email': row['email'] or '',
+                'agency': row['agency__name'] or '',
+            }
+            for row in results
+        ],
+    })
+
+
 @login_required
 def model_detail(request, model_id):
     """
@@ -166,144 +200,15 @@ def model_detail(request, model_id):
     # Récupérer les règles de bonus actives de l'agence, triées par ordre croissant
     bonus_rules = []
     if model.agency:
-        bonus_rules = list(BonusRule.objects.filter(agency=model.agency, is_active=True).order_by('order'))
+        bonus_rules = get_bonus_rules(model.agency_id)
     
     # Calculer les bonus par période (une seule fois par période, au dernier jour réel de la période)
-    # Structure: {(rule_id, period_key): {'bonus': amount, 'target_date': date, 'session': session}}
-    period_bonuses = {}
-    
-    # Identifier toutes les périodes uniques pour chaque type de règle
-    all_periods = {}  # {(period_type, period_key): {'period_start': date, 'period_end': date, 'sessions': [sessions]}}
-    
-    for session in sessions_list:
-        # Identifier les périodes pour chaque type
-        session_date = session.date
-        
-        # Période quotidienne
-        daily_key = f"DAILY_{session_date.isoformat()}"
-        if daily_key not in all_periods:
-            all_periods[daily_key] = {
-                'period_type': BonusRule.PeriodType.DAILY,
-                'period_start': session_date,
-                'period_end': session_date,
-                'sessions': [s for s in sessions_list if s.date == session_date]
-            }
-        
-        # Période hebdomadaire
-        week_start = session_date - timedelta(days=session_date.weekday())
-        week_end = week_start + timedelta(days=6)
-        weekly_key = f"WEEKLY_{week_start.isoformat()}"
-        if weekly_key not in all_periods:
-            all_periods[weekly_key] = {
-                'period_type': BonusRule.PeriodType.WEEKLY,
-                'period_start': week_start,
-                'period_end': week_end,
-                'sessions': [s for s in sessions_list if week_start <= s.date <= week_end]
-            }
-        
-        # Période quinzaine
-        day = session_date.day
-        if day <= 15:
-            biweek_start = session_date.replace(day=1)
-            biweek_end = session_date.replace(day=15)
-        else:
-            biweek_start = session_date.replace(day=16)
-            last_day = monthrange(session_date.year, session_date.month)[1]
-            biweek_end = session_date.replace(day=last_day)
-        biweekly_key = f"BIWEEKLY_{biweek_start.isoformat()}"
-        if biweekly_key not in all_periods:
-            all_periods[biweekly_key] = {
-                'period_type': BonusRule.PeriodType.BIWEEKLY,
-                'period_start': biweek_start,
-                'period_end': biweek_end,
-                'sessions': [s for s in sessions_list if biweek_start <= s.date <= biweek_end]
-            }
-        
-        # Période mensuelle
-        month_start = session_date.replace(day=1)
-        last_day = monthrange(session_date.year, session_date.month)[1]
-        month_end = session_date.replace(day=last_day)
-        monthly_key = f"MONTHLY_{month_start.isoformat()}"
-        if monthly_key not in all_periods:
-            all_periods[monthly_key] = {
-                'period_type': BonusRule.PeriodType.MONTHLY,
-                'period_start': month_start,
-                'period_end': month_end,
-                'sessions': [s for s in sessions_list if month_start <= s.date <= month_end]
-            }
-    
-    # Pour chaque période, appliquer les règles dans l'ordre croissant
-    # On s'arrête à la première règle qui correspond si stop_on_match est activé
-    for period_key, period_data in all_periods.items():
-        period_sessions = period_data['sessions']
-        period_start = period_data['period_start']
-        period_end = period_data['period_end']
-        period_type = period_data['period_type']
-        
-        if not period_sessions:
-            continue
-        
-        # Parcourir les règles dans l'ordre croissant
-        for rule in bonus_rules:
-            # Vérifier que la règle correspond au type de période
-            if rule.period_type != period_type:
-                continue
-            
-            # Compter le nombre de jours travaillés dans la période selon l'horaire
-            worked_days_count = count_worked_days_in_period(model, period_start, period_end)
-            
-            if worked_days_count == 0:
-                # Si aucun jour travaillé selon l'horaire, passer à la règle suivante
-                continue
-            
-            # Calculer la somme de ganancia pour la période
-            # Utiliser USD ou COP selon la devise de l'objectif
-            if rule.target_currency == BonusRule.TargetCurrency.USD:
-                # Utiliser les valeurs USD
-                total_period_gain = sum(s.session_gain_amount_usd or Decimal('0.00') for s in period_sessions)
-            else:  # COP
-                # Utiliser les valeurs COP
-                total_period_gain = sum(s.session_gain_amount or Decimal('0.00') for s in period_sessions)
-            
-            # Calculer la moyenne journalière : somme des ganancias / nombre de jours travaillés selon l'horaire
-            avg_daily_gain = total_period_gain / Decimal(str(worked_days_count))
-            
-            # Vérifier si la moyenne journalière atteint l'objectif
-            if avg_daily_gain >= rule.target_amount:
-                # Calculer le bonus selon le type
-                # Pour le bonus, on utilise toujours la ganancia total en COP (pour le calcul du pourcentage)
-                if rule.bonus_type == BonusRule.BonusType.PERCENTAGE:
-                    # Pour le pourcentage, utiliser la ganancia total en COP
-                    total_period_gain_cop = sum(s.session_gain_amount or Decimal('0.00') for s in period_sessions)
-                    bonus_amount = total_period_gain_cop * rule.bonus_value / Decimal('100.00')
-                else:  # FIXED_AMOUNT
-                    # Le montant fixe est toujours en COP
-                    bonus_amount = rule.bonus_value
-                
-                # Trouver la session qui correspond EXACTEMENT au dernier jour réel de la période
-                # Si aucune session n'existe ce jour-là, on ne peut pas attribuer le bonus
-                target_session = None
-                for s in period_sessions:
-                    if s.date == period_end:
-                        target_session = s
-                        break
-                
-                # Stocker le bonus UNIQUEMENT si une session existe exactement au dernier jour réel
-                if target_session:
-                    period_id = (rule.id, period_key)
-                    period_bonuses[period_id] = {
-                        'bonus': bonus_amount,
-                        'target_date': period_end,  # Dernier jour réel de la période
-                        'session': target_session,  # Session à laquelle attribuer le bonus (doit être au dernier jour réel)
-                        'rule': rule,
-                        'period_gain': total_period_gain,
-                        'avg_period_gain': avg_daily_gain,
-                        'worked_days_count': worked_days_count
-                    }
-                    
-                    # Si stop_on_match est activé, s'arrêter après avoir appliqué cette règle
-                    if rule.stop_on_match:
-                        break
+    # Les jours planifiés sont lus une seule fois pour toutes les périodes
+    week_days_values = list(
+        ScheduleAssignment.objects.filter(model=model, is_active=True)
+        .values_list('schedule__week_days', flat=True)
+    )
+    period_bonuses = compute_period_bonuses(sessions_list, bonus_rules, week_days_values)
     
     # Préparer les sessions avec leurs calculs individuels
     sessions_with_calculations = []
@@ -413,14 +318,10 @@ def model_detail(request, model_id):
         month_avg_cop = Decimal('0.00')
         month_avg_usd = Decimal('0.00')
     
-    # Récupérer le mot de passe temporaire depuis la session (si réinitialisé récemment)
+    # Récupérer le mot de passe temporaire (si réinitialisé récemment), supprimé après affichage
     user_password_temp = None
-    if model.user:
-        session_key = f'user_password_{model.user.id}'
-        user_password_temp = request.session.get(session_key)
-        # Supprimer après affichage (sécurité)
-        if user_password_temp:
-            del request.session[session_key]
+    if model.user_id:
+        user_password_temp = pop_temporary_password(request, model.user_id)
     
     # Calculer la moyenne journalière pour la quinzaine actuelle pour le graphique gauge
     # Basé sur les jours travaillés selon l'horaire et la période du bonus (quinzaine)
@@ -437,7 +338,7 @@ def model_detail(request, model_id):
         quincena_end = today.replace(day=last_day)
     
     # Compter les jours travaillés dans la quinzaine selon l'horaire
-    worked_days_quincena = count_worked_days_in_period(model, quincena_start, quincena_end)
+    worked_days_quincena = count_scheduled_days(week_days_values, quincena_start, quincena_end)
     
     # Récupérer les sessions de la quinzaine actuelle
     quincena_sessions = [s for s in sessions_list if quincena_start <= s.date <= quincena_end]
@@ -494,6 +395,16 @@ def model_detail(request, model_id):
                     'original_currency': rule.target_currency
                 })
     
+    # Réseau de filleuls (toutes profondeurs) et ses gains de la quinzaine, en une requête :
+    # réservé aux managers, limité aux filleuls de son agence pour le Regional Manager
+    referral_network = None
+    if request.user.is_superuser or request.user.is_general_manager():
+        referral_network = referred_revenue(model.id, quincena_start, quincena_end)
+    elif request.user.is_regional_manager():
+        referral_network = referred_revenue(
+            model.id, quincena_start, quincena_end, agency_id=request.user.agency_id
+        )
+    
     context = {
         'model': model,
         'assignments': assignments,
@@ -525,6 +436,7 @@ def model_detail(request, model_id):
         'worked_days_quincena': worked_days_quincena,
         'quincena_start': quincena_start,
         'quincena_end': quincena_end,
+        'referral_network': referral_network,
     }
     return render(request, 'models_app/detail.html', context)
 
@@ -640,18 +552,13 @@ def model_create(request):
                         User = get_user_model()
                         
                         # Générer un username unique
-                        username = f"{first_name.lower()}.{last_name.lower()}"
-                        base_username = username
-                        counter = 1
-                        while User.objects.filter(username=username).exists():
-                            username = f"{base_username}{counter}"
-                            counter += 1
+                        username = resolve_usernames([username_base(first_name, last_name)])[0]
                         
                         # Générer un mot de passe aléatoire
                         random_password = get_random_string(length=12)
                         
                         # Créer l'utilisateur
-                        modele_role = Role.objects.get(name=Role.RoleType.MODELE)
+                        modele_role = get_role(Role.RoleType.MODELE)
                         user = User.objects.create_user(
                             username=username,
                             email=email if email else f"{username}@dreamslabs.com",
@@ -679,31 +586,18 @@ def model_create(request):
     # Préparer le contexte selon le rôle
     if can_choose_agency:
         # Admin et General Manager : afficher toutes les agences
-        agencies = Agency.objects.all()
-        # Pour le sélecteur de modèle référent, on affiche tous les modèles actifs
-        # Si une agence est sélectionnée, filtrer par cette agence
-        if agency:
-            available_models = Model.active_by_dates.filter(agency=agency).order_by('first_name', 'last_name')
-        else:
-            available_models = Model.active_by_dates.all().order_by('first_name', 'last_name')
+        agencies = get_agencies()
         context = {
             'agencies': agencies,
             'agency': agency,
             'can_choose_agency': True,
-            'available_models': available_models,
         }
     else:
         # Regional Manager : agence fixe
-        # Pour le sélecteur de modèle référent, filtrer par l'agence du Regional Manager
-        if agency:
-            available_models = Model.active_by_dates.filter(agency=agency).order_by('first_name', 'last_name')
-        else:
-            available_models = Model.objects.none()
         context = {
             'agencies': [],
             'agency': agency,
             'can_choose_agency': False,
-            'available_models': available_models,
         }
     
     # Si c'est une requête POST avec erreurs, passer les valeurs du formulaire au contexte
@@ -725,6 +619,10 @@ def model_create(request):
                 'create_user_account': request.POST.get('create_user_account') == 'on',
             }
         })
+        # Modèle référent déjà choisi (le sélecteur est alimenté par l'autocomplétion)
+        referred_by_id = request.POST.get('referred_by', '').strip()
+        if referred_by_id.isdigit():
+            context['referred_by'] = Model.objects.filter(id=referred_by_id).only('id', 'first_name', 'last_name').first()
     
     return render(request, 'models_app/create.html', context)
 
@@ -824,18 +722,13 @@ def model_update(request, model_id):
                 elif manage_user == 'create' and not model.user:
                     # Créer un utilisateur pour le modèle
                     # Générer un username unique
-                    username = f"{first_name.lower()}.{last_name.lower()}"
-                    base_username = username
-                    counter = 1
-                    while User.objects.filter(username=username).exists():
-                        username = f"{base_username}{counter}"
-                        counter += 1
+                    username = resolve_usernames([username_base(first_name, last_name)])[0]
                     
                     # Générer un mot de passe aléatoire
                     random_password = get_random_string(length=12)
                     
                     # Créer l'utilisateur
-                    modele_role = Role.objects.get(name=Role.RoleType.MODELE)
+                    modele_role = get_role(Role.RoleType.MODELE)
                     user = User.objects.create_user(
                         username=username,
                         email=email if email else f"{username}@dreamslabs.com",
@@ -856,19 +749,14 @@ def model_update(request, model_id):
     
     # Préparer le contexte
     if can_edit_agency:
-        agencies = Agency.objects.all()
+        agencies = get_agencies()
     else:
         agencies = []
     
-    # Récupérer les modèles disponibles pour le sélecteur de modèle référent
-    # Exclure le modèle actuel pour éviter une auto-référence
-    available_models = Model.active_by_dates.filter(agency=model.agency).exclude(id=model.id).order_by('first_name', 'last_name')
-    
     context = {
         'model': model,
         'agencies': agencies,
         'can_edit_agency': can_edit_agency,
-        'available_models': available_models,
     }
     return render(request, 'models_app/update.html', context)
 
@@ -939,9 +827,8 @@ def model_user_reset_password(request, model_id):
             model.user.set_password(new_password)
             model.user.save()
             
-            # Stocker temporairement dans la session pour l'afficher
-            session_key = f'user_password_{model.user.id}'
-            request.session[session_key] = new_password
+            # Conserver temporairement pour l'afficher sur la fiche du modèle
+            store_temporary_password(request, model.user.id, new_password)
             
             messages.success(request, _('Contraseña restablecida exitosamente. El nuevo contraseña se mostrará a continuación.'))
             return redirect('models_app:detail', model_id=model.id)
@@ -1051,13 +938,13 @@ def gain_create(request, model_id):
     return render(request, 'models_app/gain_create.html', context)
 
 
-@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
-@agency_required
-def worked_hours_bulk_create(request):
+def _get_bulk_entry_agency(request):
     """
-    Saisie groupée des heures travaillées pour tous les modèles actifs
+    Détermine l'agence d'une saisie groupée selon le rôle.
+    
+    Returns:
+        tuple: (agence, None) ou (None, redirection) si aucune agence n'est disponible
     """
-    # Déterminer l'agence selon le rôle
     agency = None
     if request.user.is_superuser or request.user.is_general_manager():
         # Admin et General Manager peuvent choisir l'agence
@@ -1067,30 +954,38 @@ def worked_hours_bulk_create(request):
         elif request.user.agency:
             agency = request.user.agency
         else:
-            # Si pas d'agence sélectionnée, afficher toutes les agences
-            agencies = Agency.objects.all()
-            if agencies.count() == 1:
-                agency = agencies.first()
-            else:
-                # Si plusieurs agences, on affichera un sélecteur dans le template
-                # Pour l'instant, on prend la première agence par défaut
-                agency = agencies.first() if agencies.exists() else None
-                if not agency:
-                    messages.error(request, _('No hay agencias disponibles.'))
-                    return redirect('accounts:dashboard')
+            # Si pas d'agence sélectionnée, on prend la première agence par défaut
+            # (un sélecteur est affiché dans le template)
+            agency = Agency.objects.first()
+            if not agency:
+                messages.error(request, _('No hay agencias disponibles.'))
+                return None, redirect('accounts:dashboard')
     elif request.user.is_regional_manager():
         # Regional Manager utilise son agence
         if not request.user.agency:
             messages.error(request, _('No tiene una agencia asignada.'))
-            return redirect('accounts:dashboard')
+            return None, redirect('accounts:dashboard')
         agency = request.user.agency
     
     if not agency:
         messages.error(request, _('Debe seleccionar una agencia.'))
-        return redirect('accounts:dashboard')
+        return None, redirect('accounts:dashboard')
     
-    # Date par défaut : aujourd'hui
-    selected_date = request.GET.get('date', timezone.now().date().isoformat())
+    return agency, None
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+@agency_required
+def worked_hours_bulk_create(request):
+    """
+    Saisie groupée des heures travaillées pour tous les modèles actifs
+    """
+    agency, error_redirect = _get_bulk_entry_agency(request)
+    if error_redirect:
+        return error_redirect
+    
+    # Date par défaut : aujourd'hui (le formulaire POST renvoie la date dans un champ caché)
+    selected_date = request.POST.get('date') or request.GET.get('date') or timezone.now().date().isoformat()
     
     try:
         selected_date = datetime.strptime(selected_date, '%Y-%m-%d').date()
@@ -1103,72 +998,402 @@ def worked_hours_bulk_create(request):
         agency=agency
     ).order_by('first_name', 'last_name')
     
+    if request.method == 'POST':
+        # Traiter la soumission du formulaire : un seul upsert groupé pour tous les modèles
+        entries = []
+        error_count = 0
+        
+        for model_id in active_models.values_list('id', flat=True):
+            try:
+                hours = parse_hours(request.POST.get(f"hours_{model_id}"))
+            except ValueError:
+                error_count += 1
+                continue
+            if hours is not None:
+                entries.append((model_id, selected_date, hours))
+        
+        success_count = upsert_worked_hours(entries, request.user)
+        
+        if success_count > 0:
+            messages.success(request, _('{} horas registradas exitosamente.').format(success_count))
+        if error_count > 0:
+            messages.warning(request, _('{} errores al registrar horas.').format(error_count))
+        
+        redirect_url = '{}?date={}'.format(reverse('models_app:worked_hours_bulk_create'), selected_date.isoformat())
+        if request.POST.get('agency'):
+            redirect_url += '&agency={}'.format(agency.id)
+        return redirect(redirect_url)
+    
     # Récupérer les heures déjà enregistrées pour cette date
-    existing_hours_dict = {}
-    for wh in WorkedHours.objects.filter(
-        model__agency=agency,
-        date=selected_date
-    ).select_related('model'):
-        existing_hours_dict[wh.model_id] = float(wh.hours)
+    existing_hours_dict = dict(
+        WorkedHours.objects.filter(
+            model__agency=agency,
+            date=selected_date
+        ).values_list('model_id', 'hours')
+    )
+    
+    # Pour admin/general manager, récupérer toutes les agences pour le sélecteur
+    agencies = None
+    can_choose_agency = False
+    if request.user.is_superuser or request.user.is_general_manager():
+        agencies = get_agencies()
+        can_choose_agency = True
+    
+    context = {
+        'active_models': active_models,
+        'selected_date': selected_date,
+        'existing_hours': existing_hours_dict,
+        'agency': agency,
+        'agencies': agencies,
+        'can_choose_agency': can_choose_agency,
+    }
+    return render(request, 'models_app/worked_hours_bulk.html', context)
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+@agency_required
+def worked_hours_week_grid(request):
+    """
+    Saisie des heures travaillées d'une semaine complète (modèles × jours) en une seule requête
+    """
+    agency, error_redirect = _get_bulk_entry_agency(request)
+    if error_redirect:
+        return error_redirect
+    
+    # Semaine contenant la date demandée (lundi à dimanche)
+    week_str = request.POST.get('week') or request.GET.get('week') or timezone.now().date().isoformat()
+    try:
+        reference_date = datetime.strptime(week_str, '%Y-%m-%d').date()
+    except ValueError:
+        reference_date = timezone.now().date()
+        messages.warning(request, _('Fecha inválida, usando fecha actual.'))
+    week_start = reference_date - timedelta(days=reference_date.weekday())
+    week_days = [week_start + timedelta(days=i) for i in range(7)]
+    week_end = week_days[-1]
+    
+    active_models = list(Model.active_by_dates.filter(
+        agency=agency
+    ).order_by('first_name', 'last_name'))
     
     if request.method == 'POST':
-        # Traiter la soumission du formulaire
-        success_count = 0
+        # Toute la matrice est enregistrée par un seul upsert groupé
+        entries = []
         error_count = 0
-        
         for model in active_models:
-            hours_key = f"hours_{model.id}"
-            hours_value = request.POST.get(hours_key, '').strip()
-            
-            if hours_value:
+            for day in week_days:
                 try:
-                    hours = float(hours_value)
-                    if hours < 0:
-                        continue
-                    
-                    # Vérifier si des heures existent déjà pour ce modèle et cette date
-                    existing = WorkedHours.objects.filter(
-                        model=model,
-                        date=selected_date
-                    ).first()
-                    
-                    if existing:
-                        # Mettre à jour
-                        existing.hours = hours
-                        existing.save()
-                    else:
-                        # Créer
-                        WorkedHours.objects.create(
-                            model=model,
-                            date=selected_date,
-                            hours=hours,
-                            created_by=request.user
-                        )
-                    success_count += 1
+                    hours = parse_hours(request.POST.get(f"hours_{model.id}_{day:%Y%m%d}"))
                 except ValueError:
                     error_count += 1
                     continue
+                if hours is not None:
+                    entries.append((model.id, day, hours))
+        
+        success_count = upsert_worked_hours(entries, request.user)
         
         if success_count > 0:
             messages.success(request, _('{} horas registradas exitosamente.').format(success_count))
         if error_count > 0:
             messages.warning(request, _('{} errores al registrar horas.').format(error_count))
         
-        return redirect('models_app:worked_hours_bulk_create')
+        redirect_url = '{}?week={}'.format(reverse('models_app:worked_hours_week_grid'), week_start.isoformat())
+        if request.POST.get('agency'):
+            redirect_url += '&agency={}'.format(agency.id)
+        return redirect(redirect_url)
+    
+    # Toutes les heures de l'agence pour la semaine en une seule requête
+    existing_hours = {
+        (model_id, day): hours
+        for model_id, day, hours in WorkedHours.objects.filter(
+            model__agency=agency,
+            date__gte=week_start,
+            date__lte=week_end
+        ).values_list('model_id', 'date', 'hours')
+    }
+    
+    rows = []
+    day_totals = [Decimal('0.00')] * 7
+    for model in active_models:
+        cells = []
+        model_total = Decimal('0.00')
+        for index, day in enumerate(week_days):
+            hours = existing_hours.get((model.id, day))
+            if hours is not None:
+                model_total += hours
+                day_totals[index] += hours
+            cells.append({
+                'date': day,
+                'name': f"hours_{model.id}_{day:%Y%m%d}",
+                'hours': hours,
+            })
+        rows.append({'model': model, 'cells': cells, 'total': model_total})
     
-    # Pour admin/general manager, récupérer toutes les agences pour le sélecteur
     agencies = None
     can_choose_agency = False
     if request.user.is_superuser or request.user.is_general_manager():
-        agencies = Agency.objects.all()
+        agencies = get_agencies()
         can_choose_agency = True
     
     context = {
-        'active_models': active_models,
+        'rows': rows,
+        'week_days': week_days,
+        'day_totals': day_totals,
+        'week_total': sum(day_totals),
+        'week_start': week_start,
+        'week_end': week_end,
+        'previous_week': week_start - timedelta(days=7),
+        'next_week': week_start + timedelta(days=7),
+        'agency': agency,
+        'agencies': agencies,
+        'can_choose_agency': can_choose_agency,
+    }
+    return render(request, 'models_app/worked_hours_week.html', context)
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+@agency_required
+def gain_bulk_create(request):
+    """
+    Saisie groupée des gains USD de tous les modèles actifs d'une agence pour une date
+    (un seul appel TRM et un upsert groupé)
+    """
+    agency, error_redirect = _get_bulk_entry_agency(request)
+    if error_redirect:
+        return error_redirect
+    
+    selected_date = request.POST.get('date') or request.GET.get('date') or timezone.now().date().isoformat()
+    try:
+        selected_date = datetime.strptime(selected_date, '%Y-%m-%d').date()
+    except ValueError:
+        selected_date = timezone.now().date()
+        messages.warning(request, _('Fecha inválida, usando fecha actual.'))
+    
+    active_models = Model.active_by_dates.filter(
+        agency=agency
+    ).order_by('first_name', 'last_name')
+    
+    if request.method == 'POST':
+        entries = []
+        error_count = 0
+        for model_id in active_models.values_list('id', flat=True):
+            try:
+                gain_usd = parse_amount(request.POST.get(f"gain_{model_id}"))
+            except ValueError:
+                error_count += 1
+                continue
+            if gain_usd is not None:
+                entries.append((model_id, gain_usd, request.POST.get(f"description_{model_id}", '').strip()))
+        
+        redirect_url = '{}?date={}'.format(reverse('models_app:gain_bulk_create'), selected_date.isoformat())
+        if request.POST.get('agency'):
+            redirect_url += '&agency={}'.format(agency.id)
+        
+        if entries:
+            # Un seul taux TRM pour toute la saisie
+            trm_rate = get_trm_rate(selected_date)
+            if trm_rate is None:
+                messages.error(request, _('Error al obtener el TRM. Por favor, intente nuevamente.'))
+                return redirect(redirect_url)
+            
+            # Montants COP hors limites comptés comme erreurs de saisie
+            valid_entries = []
+            for entry in entries:
+                try:
+                    to_cop(entry[1], trm_rate)
+                except ValueError:
+                    error_count += 1
+                    continue
+                valid_entries.append(entry)
+            
+            gains_count, sessions_count = upsert_gains(
+                valid_entries,
+                selected_date,
+                trm_rate,
+                request.user,
+                complete_sessions=request.POST.get('complete_sessions') == 'on',
+            )
+            messages.success(request, _('{} ganancias registradas exitosamente (TRM: {}).').format(gains_count, trm_rate))
+            if sessions_count > 0:
+                messages.success(request, _('{} sesiones completadas.').format(sessions_count))
+        if error_count > 0:
+            messages.warning(request, _('{} errores al registrar ganancias.').format(error_count))
+        
+        return redirect(redirect_url)
+    
+    # Gains et sessions existants pour cette date (une requête chacun)
+    existing_gains = {
+        model_id: {'amount': amount, 'description': description}
+        for model_id, amount, description in ModelGain.objects.filter(
+            model__agency=agency,
+            date=selected_date
+        ).values_list('model_id', 'amount', 'description')
+    }
+    sessions = {
+        model_id: {'status': status, 'gain_usd': gain_usd}
+        for model_id, status, gain_usd in WorkSession.objects.filter(
+            agency=agency,
+            date=selected_date
+        ).values_list('model_id', 'status', 'session_gain_amount_usd')
+    }
+    status_labels = dict(WorkSession.Status.choices)
+    
+    rows = []
+    for model in active_models:
+        session = sessions.get(model.id)
+        rows.append({
+            'model': model,
+            'gain': existing_gains.get(model.id),
+            'gain_usd': session['gain_usd'] if session else None,
+            'session_status': status_labels.get(session['status']) if session else None,
+        })
+    
+    agencies = None
+    can_choose_agency = False
+    if request.user.is_superuser or request.user.is_general_manager():
+        agencies = get_agencies()
+        can_choose_agency = True
+    
+    context = {
+        'rows': rows,
         'selected_date': selected_date,
-        'existing_hours': existing_hours_dict,
         'agency': agency,
         'agencies': agencies,
         'can_choose_agency': can_choose_agency,
     }
-    return render(request, 'models_app/worked_hours_bulk.html', context)
+    return render(request, 'models_app/gain_bulk.html', context)
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+@agency_required
+def earnings_import(request):
+    """
+    Import des gains USD depuis un export CSV/JSON Lines de la plateforme
+    (lecture en flux, écriture par lots)
+    """
+    can_choose_agency = request.user.is_superuser or request.user.is_general_manager()
+    agencies = get_agencies() if can_choose_agency else None
+    result = None
+    
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if not upload:
+            messages.error(request, _('Debe seleccionar un archivo.'))
+            return redirect('models_app:earnings_import')
+        try:
+            file_format = detect_format(upload.name)
+        except ValueError:
+            messages.error(request, _('Formato de archivo no soportado (.csv, .jsonl o .ndjson).'))
+            return redirect('models_app:earnings_import')
+        
+        # Regional Manager : uniquement les modèles de son agence
+        agency = None
+        if can_choose_agency:
+            if request.POST.get('agency'):
+                agency = get_object_or_404(Agency, id=request.POST.get('agency'))
+        else:
+            agency = request.user.agency
+        
+        # Gros fichiers : traitement par le worker, suivi sur la page de la tâche
+        if request.POST.get('background'):
+            # Stockage privé, nom aléatoire : le fichier n'est jamais publié par le serveur web
+            extension = os.path.splitext(upload.name)[1].lower()
+            path = private_storage().save(f'imports/earnings/{uuid.uuid4().hex}{extension}', upload)
+            job = enqueue(
+                import_earnings_file,
+                label=f'Importación de ganancias ({upload.name})',
+                user=request.user,
+                # Une seule exécution : le fichier est supprimé à la fin, même en cas d'erreur
+                max_attempts=1,
+                path=path,
+                file_format=file_format,
+                user_id=request.user.id,
+                agency_id=agency.id if agency else None,
+            )
+            messages.info(request, _('Importación programada en segundo plano.'))
+            return redirect('jobs:job_detail', job_id=job.id)
+        
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        try:
+            result = import_earnings(stream, file_format, request.user, agency=agency)
+        finally:
+            stream.detach()
+        
+        # Octet non UTF-8 : les lignes précédentes sont déjà enregistrées
+        if result['decode_error_line']:
+            messages.error(
+                request,
+                _('El archivo debe estar codificado en UTF-8: importación detenida en la línea {}.').format(
+                    result['decode_error_line']
+                )
+            )
+        messages.success(
+            request,
+            _('{} ganancias registradas, {} sesiones actualizadas.').format(result['gains'], result['sessions'])
+        )
+        if result['rejected'] > 0:
+            messages.warning(request, _('{} líneas rechazadas.').format(result['rejected']))
+    
+    context = {
+        'result': result,
+        'agencies': agencies,
+        'can_choose_agency': can_choose_agency,
+    }
+    return render(request, 'models_app/earnings_import.html', context)
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+@agency_required
+def model_onboarding(request):
+    """
+    Création groupée de modèles (et de leurs comptes) depuis un CSV.
+    Les mots de passe générés ne sont affichés qu'une fois, sur la page de résultat.
+    Les mots de passe sont hachés dans le processus de la requête (pas de pool de
+    processus dans un worker gunicorn) : les gros fichiers passent par la commande
+    onboard_models.
+    """
+    can_choose_agency = request.user.is_superuser or request.user.is_general_manager()
+    agencies = get_agencies(active_only=True) if can_choose_agency else None
+    result = None
+    
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if not upload:
+            messages.error(request, _('Debe seleccionar un archivo.'))
+            return redirect('models_app:onboarding')
+        
+        # Regional Manager : uniquement son agence
+        if can_choose_agency:
+            if not request.POST.get('agency'):
+                messages.error(request, _('Debe seleccionar una agencia.'))
+                return redirect('models_app:onboarding')
+            agency = get_object_or_404(Agency, id=request.POST.get('agency'))
+        else:
+            agency = request.user.agency
+        
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        try:
+            result = onboard_models(
+                stream, agency, create_users=bool(request.POST.get('create_users')), workers=1
+            )
+        except UnicodeDecodeError:
+            messages.error(request, _('El archivo debe estar codificado en UTF-8.'))
+            return redirect('models_app:onboarding')
+        except Role.DoesNotExist:
+            messages.error(request, _('El rol Modelo no existe. Contacte al administrador.'))
+            return redirect('models_app:onboarding')
+        except IntegrityError:
+            messages.error(request, _('Un usuario se creó al mismo tiempo; no se importó ningún modelo. Intente de nuevo.'))
+            return redirect('models_app:onboarding')
+        finally:
+            stream.detach()
+        
+        messages.success(request, _('{} modelos creados exitosamente.').format(result['created']))
+        if result['errors']:
+            messages.warning(request, _('{} líneas con errores no fueron importadas.').format(len(result['errors'])))
+    
+    context = {
+        'result': result,
+        'agencies': agencies,
+        'can_choose_agency': can_choose_agency,
+    }
+    return render(request, 'models_app/onboarding.html', context)
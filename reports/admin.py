@@ -1,3 +1,17 @@
 from django.contrib import admin
+from .models import AgencyMonthlySummary, ReportArtifact
 
-# Register your models here.
+
+@admin.register(AgencyMonthlySummary)
+class AgencyMonthlySummaryAdmin(admin.ModelAdmin):
+    list_display = ['agency', 'month', 'session_gain_cop', 'bonuses', 'expenses', 'salaries', 'computed_at']
+    list_filter = ['agency', 'month']
+    readonly_fields = ['computed_at']
+    date_hierarchy = 'month'
+
+
+@admin.register(ReportArtifact)
+class ReportArtifactAdmin(admin.ModelAdmin):
+    list_display = ['report_type', 'format', 'status', 'created_by', 'created_at', 'rendered_at']
+    list_filter = ['report_type', 'format', 'status']
+    readonly_fields = ['cache_key', 'created_at', 'rendered_at']
@@ -0,0 +1,172 @@
+"""
+Rendu différé des rapports en fichiers (XLSX, HTML imprimable) réutilisables.
+
+Un fichier est identifié par le hash de ses paramètres et d'un filigrane des données
+sources (dernière date de modification et nombre de lignes de chaque table, ce qui couvre
+aussi les suppressions), y compris celles des bonus : sessions antérieures à la période
+lues par le moteur de bonus, horaires et assignations d'horaires. Une demande identique sur des données inchangées réutilise le
+fichier existant ; sinon un nouveau fichier est rendu par le worker (jobs).
+"""
+import hashlib
+import json
+from datetime import date
+
+from django.core.files.base import ContentFile
+from django.db.models import Count, Max
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from agencies.models import BonusRule
+from financial.exports import stream_xlsx
+from financial.models import Expense, Revenue, Salary
+from jobs.queue import enqueue
+from models_app.bonuses import bonus_fetch_start
+from models_app.models import Schedule, ScheduleAssignment, WorkSession
+from .engine import build_pnl, previous_year_period
+from .models import ReportArtifact
+
+PNL_XLSX_HEADER = [
+    'Agencia', 'Código', 'Ganancias sesiones (COP)', 'Ganancias sesiones (USD)', 'Otros ingresos',
+    'Ingresos brutos', 'Impuestos bancarios', 'Ganancia modelos', 'Bonos', 'Multas', 'Gastos',
+    'Salarios', 'Utilidad neta', 'Sesiones',
+]
+
+
+def pnl_params(start, end, agency_ids, compare):
+    """Paramètres normalisés (sérialisables) d'un rapport P&L"""
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'agency_ids': sorted(agency_ids) if agency_ids is not None else None,
+        'compare': bool(compare),
+    }
+
+
+def _pnl_period(params):
+    start = date.fromisoformat(params['start'])
+    end = date.fromisoformat(params['end'])
+    return start, end
+
+
+def source_watermark(params):
+    """
+    Filigrane des données sources d'un P&L : (dernier updated_at, nombre de lignes) par table.
+
+    Returns:
+        list: Valeurs sérialisables, une paire par table
+    """
+    start, end = _pnl_period(params)
+    if params['compare']:
+        start = previous_year_period(start, end)[0]
+    agency_ids = params['agency_ids']
+
+    sources = [
+        # Même fenêtre que compute_bonuses_by_model (sessions du début du mois ou de la semaine)
+        (WorkSession.objects.filter(date__gte=bonus_fetch_start(start), date__lte=end), 'agency_id'),
+        (Expense.objects.filter(date__gte=start, date__lte=end), 'agency_id'),
+        (Revenue.objects.filter(date__gte=start, date__lte=end), 'agency_id'),
+        (Salary.objects.filter(payment_date__gte=start, payment_date__lte=end), 'agency_id'),
+        (BonusRule.objects.all(), 'agency_id'),
+        # Jours programmés des modèles (éligibilité aux bonus)
+        (Schedule.objects.all(), 'agency_id'),
+        (ScheduleAssignment.objects.all(), 'schedule__agency_id'),
+    ]
+    watermark = []
+    for queryset, agency_field in sources:
+        if agency_ids is not None:
+            queryset = queryset.filter(**{f'{agency_field}__in': agency_ids})
+        values = queryset.aggregate(last=Max('updated_at'), rows=Count('id'))
+        watermark.append([values['last'].isoformat() if values['last'] else None, values['rows']])
+    return watermark
+
+
+def artifact_key(report_type, export_format, params, watermark):
+    payload = json.dumps([report_type, export_format, params, watermark], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def request_artifact(report_type, export_format, params, user=None):
+    """
+    Retourne le fichier d'un rapport, en programmant son rendu s'il n'existe pas encore.
+
+    Un fichier dont la tâche a échoué est reprogrammé ; un fichier prêt ou en préparation
+    est réutilisé.
+
+    Returns:
+        ReportArtifact
+    """
+    key = artifact_key(report_type, export_format, params, source_watermark(params))
+    artifact, created = ReportArtifact.objects.get_or_create(
+        cache_key=key,
+        defaults={
+            'report_type': report_type,
+            'format': export_format,
+            'params': params,
+            'created_by': user if user is not None and user.is_authenticated else None,
+        },
+    )
+    if created or artifact.is_failed:
+        artifact.job = enqueue(
+            render_artifact,
+            label=f'Reporte {report_type} {params["start"]} - {params["end"]} ({export_format})',
+            user=user,
+            artifact_id=artifact.id,
+        )
+        artifact.save(update_fields=['job'])
+    return artifact
+
+
+def _pnl_xlsx_rows(pnl):
+    rows = list(pnl['agencies'])
+    rows.append({**pnl['consolidated'], 'name': 'Consolidado', 'code': ''})
+    for row in rows:
+        yield [
+            row['name'], row['code'], row['session_gain_cop'], row['session_gain_usd'], row['revenues'],
+            row['gross_income'], row['bank_fees'], row['model_share'], row['bonuses'], row['penalties'],
+            row['expenses'], row['salaries'], row['net_profit'], row['sessions_count'],
+        ]
+
+
+def render_artifact(artifact_id):
+    """
+    Tâche du worker : rend le fichier d'un rapport et l'enregistre dans PRIVATE_ROOT/reports/
+    (servi uniquement par artifact_download, après vérification du rôle et de l'agence).
+
+    Returns:
+        dict: {'artifact_id', 'url'}
+    """
+    artifact = ReportArtifact.objects.get(id=artifact_id)
+    start, end = _pnl_period(artifact.params)
+    agency_ids = artifact.params['agency_ids']
+    # Calcul depuis les cubes et les tables, sans le cache des P&L : le filigrane vient
+    # d'établir que les données ont changé depuis le dernier fichier
+    pnl = build_pnl(start, end, agency_ids)
+    previous = build_pnl(*previous_year_period(start, end), agency_ids) if artifact.params['compare'] else None
+
+    if artifact.format == ReportArtifact.Format.XLSX:
+        content = b''.join(stream_xlsx(PNL_XLSX_HEADER, _pnl_xlsx_rows(pnl), sheet_name='Estado de Resultados'))
+    else:
+        content = render_to_string('reports/pnl_print.html', {
+            'pnl': pnl,
+            'previous': previous,
+            'generated_at': timezone.now(),
+        }).encode('utf-8')
+
+    filename = f'{artifact.report_type}_{start:%Y%m%d}_{end:%Y%m%d}_{artifact.cache_key[:12]}.{artifact.format}'
+    artifact.file.save(filename, ContentFile(content), save=False)
+    artifact.status = ReportArtifact.Status.READY
+    artifact.rendered_at = timezone.now()
+    artifact.save(update_fields=['file', 'status', 'rendered_at'])
+
+    # Les fichiers des mêmes paramètres rendus sur des données plus anciennes sont obsolètes
+    superseded = ReportArtifact.objects.filter(
+        report_type=artifact.report_type, format=artifact.format,
+        status=ReportArtifact.Status.READY, rendered_at__lt=artifact.rendered_at,
+    )
+    for old_artifact in superseded:
+        if old_artifact.params == artifact.params:
+            old_artifact.file.delete(save=False)
+            old_artifact.delete()
+
+    return {'artifact_id': artifact.id, 'url': reverse('reports:artifact_download', args=[artifact.id])}
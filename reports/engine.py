@@ -0,0 +1,317 @@
+"""
+Moteur du compte de résultats (P&L) par agence et consolidé.
+
+Les montants sont agrégés par requêtes GROUP BY agence (sessions, revenus, dépenses par
+catégorie, salaires) ; les bonus sont recalculés en mémoire avec le moteur partagé de la
+fiche du modèle, à partir de sessions chargées en une seule requête.
+
+Les mois complets sont lus depuis les cubes AgencyMonthlySummary (calculés à la demande
+s'ils manquent) et seuls les mois partiels aux bornes de la période sont calculés en
+direct. Le résultat final est mis en cache selon les paramètres et une version des
+données incrémentée à chaque modification (voir reports.signals).
+"""
+import hashlib
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q, Count, Sum
+
+from agencies.models import Agency
+from financial.models import Expense, Revenue, Salary
+from models_app.bonuses import compute_bonuses_by_model
+from models_app.models import WorkSession
+from .models import AgencyMonthlySummary
+
+# Montants additifs d'un résumé (champs de AgencyMonthlySummary)
+AMOUNT_FIELDS = [
+    'session_gain_cop', 'session_gain_usd', 'model_share', 'bank_fees',
+    'penalties', 'bonuses', 'revenues', 'expenses', 'salaries',
+]
+
+DATA_VERSION_KEY = 'reports:data_version'
+PNL_CACHE_TIMEOUT = 60 * 60
+
+ZERO = Decimal('0.00')
+
+
+def get_data_version():
+    """Version courante des données financières (invalide les P&L en cache)"""
+    version = cache.get(DATA_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(DATA_VERSION_KEY, version, None)
+    return version
+
+
+def bump_data_version():
+    """Incrémente la version des données, rendant obsolètes tous les P&L en cache"""
+    try:
+        cache.incr(DATA_VERSION_KEY)
+    except ValueError:
+        cache.set(DATA_VERSION_KEY, 2, None)
+
+
+def month_bounds(day):
+    """Premier et dernier jour du mois d'une date"""
+    return day.replace(day=1), day.replace(day=monthrange(day.year, day.month)[1])
+
+
+def _empty_totals():
+    totals = {field: ZERO for field in AMOUNT_FIELDS}
+    totals['sessions_count'] = 0
+    totals['expenses_by_category'] = {}
+    return totals
+
+
+def _add_totals(target, source):
+    """Ajoute les montants d'un résumé (dict ou cube) à un total"""
+    for field in AMOUNT_FIELDS:
+        target[field] += source[field]
+    target['sessions_count'] += source['sessions_count']
+    for category, amount in source['expenses_by_category'].items():
+        target['expenses_by_category'][category] = (
+            target['expenses_by_category'].get(category, ZERO) + Decimal(amount)
+        )
+
+
+def compute_live(start, end, agency_ids=None):
+    """
+    Calcule le P&L de chaque agence entre deux dates directement depuis les tables.
+
+    Args:
+        start (date): Début de la période (inclus)
+        end (date): Fin de la période (incluse)
+        agency_ids (list, optional): Agences à inclure (toutes par défaut)
+
+    Returns:
+        dict: {agency_id: totaux} où les totaux portent les champs de AMOUNT_FIELDS,
+              'sessions_count' et 'expenses_by_category'
+    """
+    results = defaultdict(_empty_totals)
+
+    def scoped(queryset, field='agency_id'):
+        if agency_ids is not None:
+            queryset = queryset.filter(**{f'{field}__in': agency_ids})
+        return queryset
+
+    completed = Q(status=WorkSession.Status.COMPLETED)
+    sessions = scoped(WorkSession.objects.filter(date__gte=start, date__lte=end))
+    for row in (
+        sessions.order_by()
+        .values('agency_id')
+        .annotate(
+            session_gain_cop=Sum('session_gain_amount', filter=completed),
+            session_gain_usd=Sum('session_gain_amount_usd', filter=completed),
+            model_share=Sum('session_model_ganancia', filter=completed),
+            bank_fees=Sum('session_bank_fees', filter=completed),
+            penalties=Sum(F('late_penalty_amount') + F('absence_penalty_amount')),
+            sessions_count=Count('id', filter=completed),
+        )
+    ):
+        totals = results[row['agency_id']]
+        for field in ('session_gain_cop', 'session_gain_usd', 'model_share', 'bank_fees', 'penalties'):
+            totals[field] = row[field] or ZERO
+        totals['sessions_count'] = row['sessions_count']
+
+    for model, field, date_field in (
+        (Revenue, 'revenues', 'date'),
+        (Salary, 'salaries', 'payment_date'),
+    ):
+        rows = (
+            scoped(model.objects.filter(**{f'{date_field}__gte': start, f'{date_field}__lte': end}))
+            .order_by()
+            .values('agency_id')
+            .annotate(total=Sum('amount'))
+        )
+        for row in rows:
+            results[row['agency_id']][field] = row['total'] or ZERO
+
+    expenses = (
+        scoped(Expense.objects.filter(date__gte=start, date__lte=end))
+        .order_by()
+        .values('agency_id', 'category__name')
+        .annotate(total=Sum('amount'))
+    )
+    for row in expenses:
+        totals = results[row['agency_id']]
+        amount = row['total'] or ZERO
+        totals['expenses'] += amount
+        totals['expenses_by_category'][row['category__name']] = amount
+
+    for (agency_id, _model_id), amount in compute_bonuses_by_model(start, end, agency_ids).items():
+        results[agency_id]['bonuses'] += amount
+
+    # Normaliser les montants (SQLite renvoie des décimaux sans échelle fixe)
+    for totals in results.values():
+        for field in AMOUNT_FIELDS:
+            totals[field] = totals[field].quantize(Decimal('0.01'))
+        totals['expenses_by_category'] = {
+            category: amount.quantize(Decimal('0.01'))
+            for category, amount in totals['expenses_by_category'].items()
+        }
+    return dict(results)
+
+
+def refresh_monthly_summaries(month, agency_ids=None):
+    """
+    Recalcule et enregistre les cubes d'un mois.
+
+    Args:
+        month (date): Une date du mois à résumer
+        agency_ids (list, optional): Agences à recalculer (toutes par défaut)
+
+    Returns:
+        list: Résumés enregistrés
+    """
+    month_start, month_end = month_bounds(month)
+    if agency_ids is None:
+        agency_ids = list(Agency.objects.values_list('id', flat=True))
+    live = compute_live(month_start, month_end, agency_ids)
+
+    summaries = []
+    for agency_id in agency_ids:
+        totals = live.get(agency_id, _empty_totals())
+        summary = AgencyMonthlySummary(
+            agency_id=agency_id,
+            month=month_start,
+            sessions_count=totals['sessions_count'],
+            expenses_by_category={
+                category: str(amount) for category, amount in totals['expenses_by_category'].items()
+            },
+            **{field: totals[field] for field in AMOUNT_FIELDS},
+        )
+        summaries.append(summary)
+
+    with transaction.atomic():
+        AgencyMonthlySummary.objects.bulk_create(
+            summaries,
+            update_conflicts=True,
+            unique_fields=['agency', 'month'],
+            update_fields=AMOUNT_FIELDS + ['sessions_count', 'expenses_by_category', 'computed_at'],
+        )
+    return summaries
+
+
+def invalidate_month(agency_id, day):
+    """Supprime le cube d'une agence pour le mois d'une date et invalide les P&L en cache"""
+    if agency_id and day:
+        AgencyMonthlySummary.objects.filter(agency_id=agency_id, month=day.replace(day=1)).delete()
+    bump_data_version()
+
+
+def _split_period(start, end):
+    """
+    Découpe une période en mois complets et en segments partiels.
+
+    Returns:
+        tuple: (liste des premiers jours des mois complets, liste des segments (début, fin))
+    """
+    full_months, partial = [], []
+    current = start
+    while current <= end:
+        month_start, month_end = month_bounds(current)
+        segment_end = min(month_end, end)
+        if current == month_start and segment_end == month_end:
+            full_months.append(month_start)
+        else:
+            partial.append((current, segment_end))
+        current = month_end + timedelta(days=1)
+    return full_months, partial
+
+
+def _finalize(totals):
+    """Ajoute les indicateurs dérivés à un total"""
+    totals['gross_income'] = totals['session_gain_cop'] + totals['revenues']
+    totals['model_payout'] = totals['model_share'] + totals['bonuses']
+    totals['operating_costs'] = totals['expenses'] + totals['salaries']
+    totals['net_profit'] = (
+        totals['gross_income']
+        - totals['bank_fees']
+        - totals['model_payout']
+        - totals['operating_costs']
+    )
+    totals['expenses_by_category'] = dict(
+        sorted(totals['expenses_by_category'].items(), key=lambda item: item[1], reverse=True)
+    )
+    return totals
+
+
+def build_pnl(start, end, agency_ids=None):
+    """Calcule le P&L sans passer par le cache (voir get_pnl)"""
+    agencies = Agency.objects.order_by('name')
+    if agency_ids is not None:
+        agencies = agencies.filter(id__in=agency_ids)
+    agencies = list(agencies.values('id', 'name', 'code'))
+    ids = [agency['id'] for agency in agencies]
+    per_agency = {agency_id: _empty_totals() for agency_id in ids}
+
+    full_months, partial = _split_period(start, end)
+    if full_months and ids:
+        cubes = list(AgencyMonthlySummary.objects.filter(agency_id__in=ids, month__in=full_months))
+        present = {(cube.agency_id, cube.month) for cube in cubes}
+        for month in full_months:
+            missing = [agency_id for agency_id in ids if (agency_id, month) not in present]
+            if missing:
+                cubes += refresh_monthly_summaries(month, missing)
+        for cube in cubes:
+            _add_totals(per_agency[cube.agency_id], {
+                **{field: getattr(cube, field) for field in AMOUNT_FIELDS},
+                'sessions_count': cube.sessions_count,
+                'expenses_by_category': cube.expenses_by_category,
+            })
+
+    for segment_start, segment_end in partial:
+        for agency_id, totals in compute_live(segment_start, segment_end, ids).items():
+            if agency_id in per_agency:
+                _add_totals(per_agency[agency_id], totals)
+
+    consolidated = _empty_totals()
+    rows = []
+    for agency in agencies:
+        totals = per_agency[agency['id']]
+        _add_totals(consolidated, totals)
+        rows.append({**agency, **_finalize(totals)})
+
+    return {
+        'start': start,
+        'end': end,
+        'agencies': rows,
+        'consolidated': _finalize(consolidated),
+    }
+
+
+def get_pnl(start, end, agency_ids=None):
+    """
+    Compte de résultats par agence et consolidé pour une période arbitraire.
+
+    Args:
+        start (date): Début de la période (inclus)
+        end (date): Fin de la période (incluse)
+        agency_ids (list, optional): Agences à inclure (toutes par défaut)
+
+    Returns:
+        dict: {'start', 'end', 'agencies': [totaux + id/name/code], 'consolidated': totaux}
+              avec en plus 'gross_income', 'model_payout', 'operating_costs', 'net_profit'
+    """
+    scope = 'all' if agency_ids is None else ','.join(str(i) for i in sorted(agency_ids))
+    params = f'{start.isoformat()}|{end.isoformat()}|{scope}'
+    cache_key = f'reports:pnl:{get_data_version()}:{hashlib.md5(params.encode()).hexdigest()}'
+    pnl = cache.get(cache_key)
+    if pnl is None:
+        pnl = build_pnl(start, end, agency_ids)
+        cache.set(cache_key, pnl, PNL_CACHE_TIMEOUT)
+    return pnl
+
+
+def previous_year_period(start, end):
+    """Même période un an plus tôt (le 29 février devient le 28)"""
+    def shift(day):
+        try:
+            return day.replace(year=day.year - 1)
+        except ValueError:
+            return date(day.year - 1, day.month, 28)
+    return shift(start), shift(end)
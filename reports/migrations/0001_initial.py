@@ -0,0 +1,154 @@
+# Generated by Django 6.0.1 on 2026-10-19 18:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("agencies", "0008_alter_bonusrule_options_alter_bonusrule_order_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AgencyMonthlySummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "month",
+                    models.DateField(
+                        help_text="Premier jour du mois résumé", verbose_name="Mes"
+                    ),
+                ),
+                (
+                    "session_gain_cop",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Ganancias de Sesiones (COP)",
+                    ),
+                ),
+                (
+                    "session_gain_usd",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Ganancias de Sesiones (USD)",
+                    ),
+                ),
+                (
+                    "model_share",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Ganancia de Modelos (COP)",
+                    ),
+                ),
+                (
+                    "bank_fees",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Impuestos Bancarios (COP)",
+                    ),
+                ),
+                (
+                    "penalties",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Multas (COP)",
+                    ),
+                ),
+                (
+                    "bonuses",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Bonos (COP)",
+                    ),
+                ),
+                (
+                    "sessions_count",
+                    models.IntegerField(default=0, verbose_name="Sesiones Completadas"),
+                ),
+                (
+                    "revenues",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Otros Ingresos (COP)",
+                    ),
+                ),
+                (
+                    "expenses",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Gastos (COP)",
+                    ),
+                ),
+                (
+                    "expenses_by_category",
+                    models.JSONField(
+                        blank=True,
+                        default=dict,
+                        help_text="Montants par nom de catégorie (chaînes décimales)",
+                        verbose_name="Gastos por Categoría",
+                    ),
+                ),
+                (
+                    "salaries",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Salarios (COP)",
+                    ),
+                ),
+                (
+                    "computed_at",
+                    models.DateTimeField(
+                        auto_now=True, verbose_name="Fecha de cálculo"
+                    ),
+                ),
+                (
+                    "agency",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="monthly_summaries",
+                        to="agencies.agency",
+                        verbose_name="Agencia",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Resumen Mensual de Agencia",
+                "verbose_name_plural": "Resúmenes Mensuales de Agencias",
+                "ordering": ["-month", "agency"],
+                "indexes": [
+                    models.Index(fields=["month"], name="reports_age_month_b57b32_idx")
+                ],
+                "unique_together": {("agency", "month")},
+            },
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 6.0.1 on 2026-10-19 18:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("jobs", "0001_initial"),
+        ("reports", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReportArtifact",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "report_type",
+                    models.CharField(max_length=50, verbose_name="Tipo de reporte"),
+                ),
+                (
+                    "format",
+                    models.CharField(
+                        choices=[("xlsx", "Excel"), ("html", "Imprimible (HTML)")],
+                        max_length=10,
+                        verbose_name="Formato",
+                    ),
+                ),
+                ("params", models.JSONField(default=dict, verbose_name="Parámetros")),
+                (
+                    "cache_key",
+                    models.CharField(
+                        help_text="Hash des paramètres et de la dernière modification des données sources",
+                        max_length=64,
+                        unique=True,
+                        verbose_name="Clave",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("PENDING", "En preparación"), ("READY", "Listo")],
+                        default="PENDING",
+                        max_length=20,
+                        verbose_name="Estado",
+                    ),
+                ),
+                (
+                    "file",
+                    models.FileField(
+                        blank=True, upload_to="reports/", verbose_name="Archivo"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Fecha de creación"
+                    ),
+                ),
+                (
+                    "rendered_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Fecha de generación"
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="report_artifacts",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Creado por",
+                    ),
+                ),
+                (
+                    "job",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="report_artifacts",
+                        to="jobs.job",
+                        verbose_name="Tarea",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Archivo de Reporte",
+                "verbose_name_plural": "Archivos de Reportes",
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
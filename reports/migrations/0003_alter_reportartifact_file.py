@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-19 21:48
+
+import accounts.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reports", "0002_reportartifact"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="reportartifact",
+            name="file",
+            field=models.FileField(
+                blank=True,
+                storage=accounts.storage.private_storage,
+                upload_to="reports/",
+                verbose_name="Archivo",
+            ),
+        ),
+    ]
@@ -1,3 +1,187 @@
+from django.conf import settings
 from django.db import models
+from django.utils.translation import gettext_lazy as _
+from accounts.storage import private_storage
 
-# Create your models here.
+
+class AgencyMonthlySummary(models.Model):
+    """Cube mensuel précalculé du compte de résultats d'une agence"""
+
+    agency = models.ForeignKey(
+        'agencies.Agency',
+        on_delete=models.CASCADE,
+        related_name='monthly_summaries',
+        verbose_name=_('Agencia')
+    )
+    month = models.DateField(
+        verbose_name=_('Mes'),
+        help_text=_('Premier jour du mois résumé')
+    )
+
+    # Sessions de travail
+    session_gain_cop = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Ganancias de Sesiones (COP)')
+    )
+    session_gain_usd = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Ganancias de Sesiones (USD)')
+    )
+    model_share = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Ganancia de Modelos (COP)')
+    )
+    bank_fees = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Impuestos Bancarios (COP)')
+    )
+    penalties = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Multas (COP)')
+    )
+    bonuses = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Bonos (COP)')
+    )
+    sessions_count = models.IntegerField(
+        default=0,
+        verbose_name=_('Sesiones Completadas')
+    )
+
+    # Module financier
+    revenues = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Otros Ingresos (COP)')
+    )
+    expenses = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Gastos (COP)')
+    )
+    expenses_by_category = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name=_('Gastos por Categoría'),
+        help_text=_('Montants par nom de catégorie (chaînes décimales)')
+    )
+    salaries = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Salarios (COP)')
+    )
+
+    computed_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name=_('Fecha de cálculo')
+    )
+
+    class Meta:
+        verbose_name = _('Resumen Mensual de Agencia')
+        verbose_name_plural = _('Resúmenes Mensuales de Agencias')
+        ordering = ['-month', 'agency']
+        unique_together = [['agency', 'month']]
+        indexes = [
+            models.Index(fields=['month']),
+        ]
+
+    def __str__(self):
+        return f"{self.agency.name} - {self.month:%Y-%m}"
+
+
+class ReportArtifact(models.Model):
+    """Fichier de rapport rendu par le worker, réutilisé pour des demandes identiques"""
+
+    class Format(models.TextChoices):
+        XLSX = 'xlsx', _('Excel')
+        HTML = 'html', _('Imprimible (HTML)')
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', _('En preparación')
+        READY = 'READY', _('Listo')
+
+    report_type = models.CharField(
+        max_length=50,
+        verbose_name=_('Tipo de reporte')
+    )
+    format = models.CharField(
+        max_length=10,
+        choices=Format.choices,
+        verbose_name=_('Formato')
+    )
+    params = models.JSONField(
+        default=dict,
+        verbose_name=_('Parámetros')
+    )
+    cache_key = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name=_('Clave'),
+        help_text=_('Hash des paramètres et de la dernière modification des données sources')
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name=_('Estado')
+    )
+    file = models.FileField(
+        upload_to='reports/',
+        storage=private_storage,
+        blank=True,
+        verbose_name=_('Archivo')
+    )
+    job = models.ForeignKey(
+        'jobs.Job',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='report_artifacts',
+        verbose_name=_('Tarea')
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='report_artifacts',
+        verbose_name=_('Creado por')
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_('Fecha de creación')
+    )
+    rendered_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_('Fecha de generación')
+    )
+
+    class Meta:
+        verbose_name = _('Archivo de Reporte')
+        verbose_name_plural = _('Archivos de Reportes')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.report_type} ({self.format}) - {self.get_status_display()}"
+
+    @property
+    def is_failed(self):
+        """Vrai si le rendu a épuisé ses tentatives sans produire de fichier"""
+        from jobs.models import Job
+        return self.status != self.Status.READY and (self.job is None or self.job.status == Job.Status.FAILED)
@@ -0,0 +1,126 @@
+"""
+Invalidation des cubes mensuels et des P&L en cache.
+
+Toute écriture sur une table entrant dans le compte de résultats supprime le cube du mois
+concerné (recalculé à la prochaine lecture) et incrémente la version des données. Les
+écritures groupées (bulk_create / bulk_update) ne déclenchent pas post_save : leurs
+auteurs envoient ledger_bulk_changed avec les couples (agence, date) touchés.
+
+Les sessions de travail sont sauvegardées à chaque action du manager (arrivée, pauses,
+coaching) : seules les modifications de leurs champs financiers, de leur statut, de leur
+date ou de leur agence (WorkSession.LEDGER_FIELDS) invalident les cubes, et une session
+sans gain ni amende (en attente, en cours) n'en invalide aucun à sa création ou sa
+suppression.
+"""
+from datetime import timedelta
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal
+
+from . import engine
+
+# Arguments : items = itérable de tuples (agency_id, date)
+ledger_bulk_changed = Signal()
+
+# Noms de champs (update_fields) correspondant à WorkSession.LEDGER_FIELDS
+LEDGER_UPDATE_FIELDS = {
+    'agency', 'agency_id', 'date', 'status', 'session_gain_amount', 'session_gain_amount_usd',
+    'session_bank_fees', 'session_model_ganancia', 'late_penalty_amount', 'absence_penalty_amount',
+}
+
+
+def _invalidate(items):
+    months = set()
+    for agency_id, day in items:
+        if agency_id and day:
+            months.add((agency_id, day.replace(day=1)))
+    for agency_id, month in months:
+        engine.invalidate_month(agency_id, month)
+    if not months:
+        engine.bump_data_version()
+
+
+def _session_items(agency_id, day):
+    """Une session peut compter dans un bonus hebdomadaire dont la fin tombe le mois suivant"""
+    return [(agency_id, day), (agency_id, day + timedelta(days=6))]
+
+
+def _ledger_neutral(state):
+    """Session sans effet sur le compte de résultats (ni complétée, ni amende)"""
+    return (
+        state['status'] != 'COMPLETED'
+        and not state['late_penalty_amount']
+        and not state['absence_penalty_amount']
+    )
+
+
+def work_session_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    if update_fields is not None and not LEDGER_UPDATE_FIELDS & set(update_fields):
+        return
+    previous = None if created else getattr(instance, '_loaded_ledger_state', None)
+    current = instance.get_ledger_state()
+    instance._loaded_ledger_state = current
+    if current is None:
+        _invalidate(_session_items(instance.agency_id, instance.date))
+        return
+    if previous == current or (created and _ledger_neutral(current)):
+        return
+    items = _session_items(current['agency_id'], current['date'])
+    if previous is not None and (previous['agency_id'], previous['date']) != (current['agency_id'], current['date']):
+        items += _session_items(previous['agency_id'], previous['date'])
+    _invalidate(items)
+
+
+def work_session_deleted(sender, instance, **kwargs):
+    state = instance.get_ledger_state()
+    if state is not None and _ledger_neutral(state):
+        return
+    _invalidate(_session_items(instance.agency_id, instance.date))
+
+
+def ledger_entry_changed(sender, instance, **kwargs):
+    day = getattr(instance, 'payment_date', None) or getattr(instance, 'date', None)
+    _invalidate([(instance.agency_id, day)])
+
+
+def bonus_rule_changed(sender, instance, **kwargs):
+    """Une règle de bonus modifie tous les mois de l'agence"""
+    engine.AgencyMonthlySummary.objects.filter(agency_id=instance.agency_id).delete()
+    engine.bump_data_version()
+
+
+def schedule_assignment_changed(sender, instance, **kwargs):
+    """Les jours programmés (bonus) d'un modèle changent : tous les mois de l'agence"""
+    agency_id = instance.schedule.agency_id if instance.schedule_id else None
+    if agency_id:
+        engine.AgencyMonthlySummary.objects.filter(agency_id=agency_id).delete()
+    engine.bump_data_version()
+
+
+def bulk_changed(sender, items, **kwargs):
+    expanded = []
+    for agency_id, day in items:
+        expanded.extend(_session_items(agency_id, day))
+    _invalidate(expanded)
+
+
+def connect_signals():
+    """Branche les gestionnaires (appelé depuis ReportsConfig.ready)"""
+    from agencies.models import BonusRule
+    from financial.models import Expense, Revenue, Salary
+    from models_app.models import ScheduleAssignment, WorkSession
+
+    post_save.connect(work_session_saved, sender=WorkSession, dispatch_uid='reports_session_save')
+    post_delete.connect(work_session_deleted, sender=WorkSession, dispatch_uid='reports_session_delete')
+    for action, signal in (('save', post_save), ('delete', post_delete)):
+        signal.connect(bonus_rule_changed, sender=BonusRule, dispatch_uid=f'reports_bonus_rule_{action}')
+        signal.connect(
+            schedule_assignment_changed, sender=ScheduleAssignment,
+            dispatch_uid=f'reports_schedule_assignment_{action}'
+        )
+        for model in (Expense, Revenue, Salary):
+            signal.connect(
+                ledger_entry_changed, sender=model,
+                dispatch_uid=f'reports_{model.__name__.lower()}_{action}'
+            )
+    ledger_bulk_changed.connect(bulk_changed, dispatch_uid='reports_bulk_changed')
@@ -1,3 +1,284 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import zipfile
+from datetime import date, time
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+from accounts.models import Role
+from agencies.models import Agency, BonusRule
+from financial.models import Employee, Expense, ExpenseCategory, Revenue, RevenueSource, Salary
+from models_app.models import Model, Schedule, ScheduleAssignment, WorkSession
+from jobs.queue import claim_next, run_job
+from .artifacts import pnl_params, source_watermark
+from .engine import compute_live, get_pnl
+from .models import AgencyMonthlySummary, ReportArtifact
+from .trends import daily_trend, quincena_comparison, weekly_growth
+
+User = get_user_model()
+
+
+class PnlEngineTest(TestCase):
+    """Tests du compte de résultats consolidé et de ses cubes mensuels"""
+
+    def setUp(self):
+        """Créer deux agences avec sessions, bonus, dépenses, revenus et salaires"""
+        cache.clear()
+        self.north = Agency.objects.create(name="Norte", code="AGT001")
+        self.south = Agency.objects.create(name="Sur", code="AGT002")
+        schedule = Schedule.objects.create(
+            agency=self.north,
+            name="Diario",
+            start_time=time(8, 0),
+            end_time=time(16, 0),
+            week_days="MONDAY,TUESDAY,WEDNESDAY,THURSDAY,FRIDAY,SATURDAY,SUNDAY",
+        )
+        for agency, day, gain in [
+            (self.north, date(2026, 1, 10), '400000.00'),
+            (self.north, date(2026, 1, 31), '600000.00'),
+            (self.north, date(2026, 2, 10), '300000.00'),
+            (self.south, date(2026, 1, 15), '200000.00'),
+        ]:
+            model = Model.objects.create(
+                first_name="Ana", last_name=str(day), agency=agency, fecha_ingreso=date(2025, 1, 1)
+            )
+            if agency == self.north:
+                ScheduleAssignment.objects.create(model=model, schedule=schedule)
+            WorkSession.objects.create(
+                model=model,
+                date=day,
+                status=WorkSession.Status.COMPLETED,
+                session_gain_amount=Decimal(gain),
+                session_bank_fees=Decimal(gain) / 100,
+                session_model_ganancia=Decimal(gain) / 2,
+                late_penalty_amount=Decimal('0.00'),
+            )
+        # Bonus mensuel fixe attribué au dernier jour de janvier (session du 31)
+        BonusRule.objects.create(
+            agency=self.north,
+            name="Mensual",
+            period_type=BonusRule.PeriodType.MONTHLY,
+            target_currency=BonusRule.TargetCurrency.COP,
+            target_amount=Decimal('0.00'),
+            bonus_type=BonusRule.BonusType.FIXED_AMOUNT,
+            bonus_value=Decimal('50000.00'),
+        )
+        self.category = ExpenseCategory.objects.create(name="Alquiler")
+        Expense.objects.create(agency=self.north, category=self.category, date=date(2026, 1, 5), amount=Decimal('100000.00'))
+        Expense.objects.create(agency=self.south, category=self.category, date=date(2026, 2, 5), amount=Decimal('30000.00'))
+        Revenue.objects.create(
+            agency=self.north, source=RevenueSource.objects.create(name="Eventos"),
+            date=date(2026, 1, 20), amount=Decimal('70000.00')
+        )
+        employee = Employee.objects.create(first_name="Luis", last_name="Caja", agency=self.south)
+        Salary.objects.create(
+            employee=employee, agency=self.south, payment_date=date(2026, 1, 30),
+            period_start=date(2026, 1, 1), period_end=date(2026, 1, 30), amount=Decimal('90000.00')
+        )
+
+    def test_cubes_match_live_computation(self):
+        """Les mois complets lus depuis les cubes donnent le même résultat que le calcul direct"""
+        pnl = get_pnl(date(2026, 1, 1), date(2026, 2, 14))
+        self.assertTrue(AgencyMonthlySummary.objects.filter(month=date(2026, 1, 1)).exists())
+        self.assertFalse(AgencyMonthlySummary.objects.filter(month=date(2026, 2, 1)).exists())
+
+        live = compute_live(date(2026, 1, 1), date(2026, 2, 14))
+        north = next(row for row in pnl['agencies'] if row['id'] == self.north.id)
+        for field in ('session_gain_cop', 'bank_fees', 'model_share', 'bonuses', 'revenues', 'expenses'):
+            self.assertEqual(north[field], live[self.north.id][field])
+        self.assertEqual(north['bonuses'], Decimal('50000.00'))
+
+        consolidated = pnl['consolidated']
+        self.assertEqual(consolidated['session_gain_cop'], Decimal('1500000.00'))
+        self.assertEqual(consolidated['expenses_by_category'], {'Alquiler': Decimal('130000.00')})
+        # 1 500 000 + 70 000 - 15 000 - (750 000 + 50 000) - (130 000 + 90 000)
+        self.assertEqual(consolidated['net_profit'], Decimal('535000.00'))
+
+    def test_cache_and_invalidation(self):
+        """Le résultat est servi depuis le cache jusqu'à la prochaine écriture"""
+        get_pnl(date(2026, 1, 1), date(2026, 1, 31))
+        with self.assertNumQueries(0):
+            get_pnl(date(2026, 1, 1), date(2026, 1, 31))
+
+        Expense.objects.create(agency=self.south, category=self.category, date=date(2026, 1, 8), amount=Decimal('5000.00'))
+        self.assertFalse(AgencyMonthlySummary.objects.filter(agency=self.south, month=date(2026, 1, 1)).exists())
+        pnl = get_pnl(date(2026, 1, 1), date(2026, 1, 31))
+        self.assertEqual(pnl['consolidated']['expenses'], Decimal('105000.00'))
+
+    def test_session_invalidation_only_on_ledger_changes(self):
+        """Les actions sans effet financier gardent les cubes ; gains et horaires les invalident"""
+        january = AgencyMonthlySummary.objects.filter(agency=self.south, month=date(2026, 1, 1))
+        get_pnl(date(2026, 1, 1), date(2026, 1, 31))
+        session = WorkSession.objects.get(agency=self.south)
+        session.late_minutes = 5
+        session.save()
+        WorkSession.objects.create(model=session.model, date=date(2026, 1, 16))
+        self.assertTrue(january.exists())
+
+        session.session_gain_amount = Decimal('250000.00')
+        session.save()
+        self.assertFalse(january.exists())
+
+        get_pnl(date(2026, 1, 1), date(2026, 1, 31))
+        north = AgencyMonthlySummary.objects.filter(agency=self.north)
+        self.assertTrue(north.exists())
+        ScheduleAssignment.objects.filter(model__agency=self.north).first().delete()
+        self.assertFalse(north.exists())
+
+    def test_model_agency_change_invalidates_both_agencies(self):
+        """Les sessions d'un modèle changé d'agence sortent du cube de l'ancienne et entrent dans la nouvelle"""
+        get_pnl(date(2026, 1, 1), date(2026, 1, 31))
+        cubes = AgencyMonthlySummary.objects.filter(month=date(2026, 1, 1))
+        self.assertTrue(cubes.filter(agency=self.south).exists())
+        self.assertTrue(cubes.filter(agency=self.north).exists())
+
+        model = WorkSession.objects.get(agency=self.south).model
+        model.agency = self.north
+        # Invalidation après le commit : un P&L lu avant ne garde pas un cube périmé
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            model.save()
+            self.assertTrue(cubes.filter(agency=self.south).exists())
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(cubes.filter(agency__in=[self.south, self.north]).exists())
+        self.assertEqual(WorkSession.objects.filter(model=model).exclude(agency=self.north).count(), 0)
+
+        pnl = get_pnl(date(2026, 1, 1), date(2026, 1, 31))
+        south = next(row for row in pnl['agencies'] if row['id'] == self.south.id)
+        self.assertEqual(south['session_gain_cop'], Decimal('0.00'))
+
+    def test_regional_manager_report_is_scoped(self):
+        """Le Regional Manager ne voit que son agence, avec la comparaison N-1"""
+        rm_role = Role.objects.create(name=Role.RoleType.REGIONAL_MANAGER)
+        User.objects.create_user(username="regional", password="test123", role=rm_role, agency=self.south)
+        client = Client()
+        client.login(username="regional", password="test123")
+        params = {'date_from': '2026-01-01', 'date_to': '2026-01-31', 'agency': self.north.id, 'compare': '1'}
+
+        data = client.get(reverse('reports:pnl_data'), params).json()
+        self.assertEqual([row['code'] for row in data['agencies']], ['AGT002'])
+        self.assertEqual(data['consolidated']['session_gain_cop'], '200000.00')
+        self.assertEqual(data['previous']['session_gain_cop'], '0.00')
+
+        response = client.get(reverse('reports:pnl_report'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Estado de Resultados')
+
+
+    def test_watermark_covers_bonus_sources(self):
+        """Sessions antérieures lues par les bonus et assignations d'horaires changent le filigrane"""
+        params = pnl_params(date(2026, 1, 15), date(2026, 1, 31), [self.north.id], False)
+        watermark = source_watermark(params)
+
+        # Session du 10 janvier : hors période, mais dans le mois du bonus mensuel
+        WorkSession.objects.filter(agency=self.north, date=date(2026, 1, 10)).get().save()
+        self.assertNotEqual(source_watermark(params), watermark)
+        watermark = source_watermark(params)
+
+        assignment = ScheduleAssignment.objects.filter(schedule__agency=self.north).first()
+        assignment.is_active = False
+        assignment.save()
+        self.assertNotEqual(source_watermark(params), watermark)
+
+    def test_export_rendered_by_worker_and_reused(self):
+        """Le fichier est rendu par le worker puis réutilisé tant que les données ne changent pas"""
+        gm_role = Role.objects.create(name=Role.RoleType.GENERAL_MANAGER)
+        User.objects.create_user(username="general", password="test123", role=gm_role)
+        client = Client()
+        client.login(username="general", password="test123")
+        url = reverse('reports:pnl_export') + '?date_from=2026-01-01&date_to=2026-01-31&format=xlsx'
+
+        with tempfile.TemporaryDirectory() as media_root, tempfile.TemporaryDirectory() as private_root, \
+                self.settings(MEDIA_ROOT=media_root, PRIVATE_ROOT=private_root):
+            data = client.post(url).json()
+            self.assertFalse(data['ready'])
+            self.assertEqual(client.get(data['status_url']).json()['status'], ReportArtifact.Status.PENDING)
+            run_job(claim_next('worker-1'))
+
+            data = client.post(url).json()
+            self.assertTrue(data['ready'])
+            self.assertIsNone(claim_next('worker-1'))
+            response = client.get(data['download_url'])
+            archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+            sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+            self.assertIn('Consolidado', sheet)
+            self.assertIn('<v>1200000.00</v>', sheet)
+            # Fichier hors du répertoire publié par le serveur web
+            self.assertEqual(os.listdir(media_root), [])
+            self.assertTrue(os.listdir(os.path.join(private_root, 'reports')))
+
+            # Une nouvelle dépense change le filigrane : un nouveau fichier est demandé
+            Expense.objects.create(agency=self.north, category=self.category, date=date(2026, 1, 9), amount=Decimal('1.00'))
+            self.assertFalse(client.post(url).json()['ready'])
+            self.assertEqual(ReportArtifact.objects.count(), 2)
+            response.close()
+
+
+class TrendsTest(TestCase):
+    """Tests des tendances calculées par fonctions de fenêtre"""
+
+    def setUp(self):
+        """Créer deux modèles avec des sessions sur deux quinzaines"""
+        self.agency = Agency.objects.create(name="Norte", code="AGT001")
+        self.ana = Model.objects.create(first_name="Ana", last_name="Ruiz", agency=self.agency, fecha_ingreso=date(2025, 1, 1))
+        self.eva = Model.objects.create(first_name="Eva", last_name="Soto", agency=self.agency, fecha_ingreso=date(2025, 1, 1))
+        for model, day, gain in [
+            (self.ana, date(2026, 2, 23), '100000.00'),
+            (self.ana, date(2026, 3, 2), '150000.00'),
+            (self.ana, date(2026, 3, 3), '50000.00'),
+            (self.eva, date(2026, 3, 3), '300000.00'),
+            (self.ana, date(2026, 3, 17), '400000.00'),
+        ]:
+            WorkSession.objects.create(
+                model=model,
+                date=day,
+                status=WorkSession.Status.COMPLETED,
+                session_gain_amount=Decimal(gain),
+                late_penalty_amount=Decimal('0.00'),
+            )
+
+    def test_daily_running_sum_and_rolling_average(self):
+        """Le cumul repart du début de la période, la moyenne glissante inclut les jours antérieurs"""
+        with self.assertNumQueries(1):
+            series = daily_trend(date(2026, 3, 1), date(2026, 3, 31))
+        self.assertEqual([row['date'] for row in series], [date(2026, 3, 2), date(2026, 3, 3), date(2026, 3, 17)])
+        self.assertEqual([row['cumulative'] for row in series], [
+            Decimal('150000.00'), Decimal('500000.00'), Decimal('900000.00'),
+        ])
+        # Moyenne des jours 23/02, 02/03 et 03/03 : (100 000 + 150 000 + 350 000) / 3
+        self.assertEqual(series[1]['rolling_average'], Decimal('200000.00'))
+        self.assertEqual(series[0]['previous'], Decimal('100000.00'))
+        self.assertEqual(series[1]['growth'], Decimal('133.3'))
+
+    def test_weekly_growth_only_against_adjacent_week(self):
+        """La croissance n'est calculée que par rapport à la semaine immédiatement précédente"""
+        series = weekly_growth(date(2026, 3, 2), date(2026, 3, 22))
+        ana = [row for row in series if row['model_id'] == self.ana.id]
+        self.assertEqual([row['week'] for row in ana], [date(2026, 3, 2), date(2026, 3, 16)])
+        self.assertEqual(ana[0]['previous'], Decimal('100000.00'))
+        self.assertEqual(ana[0]['growth'], Decimal('100.0'))
+        self.assertIsNone(ana[1]['previous'])
+
+    def test_quincena_comparison_and_endpoint_scope(self):
+        """Comparaison avec la quinzaine précédente ; le Regional Manager ne voit que son agence"""
+        comparison = quincena_comparison(date(2026, 3, 20))
+        self.assertEqual(comparison['current'], (date(2026, 3, 16), date(2026, 3, 31)))
+        models = {entry['model_id']: entry for entry in comparison['models']}
+        self.assertEqual(models[self.ana.id]['gain_cop'], Decimal('400000.00'))
+        self.assertEqual(models[self.ana.id]['previous'], Decimal('200000.00'))
+        self.assertEqual(models[self.ana.id]['growth'], Decimal('100.0'))
+        self.assertEqual(models[self.eva.id]['gain_cop'], Decimal('0.00'))
+        self.assertEqual(models[self.eva.id]['previous'], Decimal('300000.00'))
+
+        rm_role = Role.objects.create(name=Role.RoleType.REGIONAL_MANAGER)
+        other = Agency.objects.create(name="Sur", code="AGT002")
+        User.objects.create_user(username="regional", password="test123", role=rm_role, agency=other)
+        client = Client()
+        client.login(username="regional", password="test123")
+        data = client.get(reverse('reports:trends_quincena'), {'date_to': '2026-03-20'}).json()
+        self.assertEqual(data['models'], [])
+        response = client.get(reverse('reports:trends_report'), {'date_from': '2026-03-01', 'date_to': '2026-03-20'})
+        self.assertEqual(response.status_code, 200)
 
-# Create your tests here.
@@ -0,0 +1,214 @@
+"""
+Tendances des sessions calculées par fonctions de fenêtre SQL.
+
+Chaque série est une seule requête GROUP BY (jour, semaine ou quinzaine) sur les sessions
+complétées, dont les cumuls, moyennes glissantes et valeurs de la période précédente
+(Lag) sont calculés par la base de données : seules les lignes agrégées sont lues.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import (
+    BooleanField, Case, Count, DecimalField, ExpressionWrapper, F, Func, IntegerField, Q, RowRange,
+    Sum, Value, When, Window,
+)
+from django.db.models.functions import Lag, TruncMonth, TruncWeek
+
+from models_app.models import WorkSession
+from models_app.utils import get_quincena_bounds
+
+# Nombre de jours d'activité de la moyenne glissante
+ROLLING_DAYS = 30
+
+ZERO = Decimal('0.00')
+
+
+class WindowSum(Func):
+    """SUM utilisable sur une annotation agrégée à l'intérieur d'une fenêtre"""
+    function = 'SUM'
+    window_compatible = True
+    output_field = DecimalField(max_digits=16, decimal_places=2)
+
+
+class WindowAvg(Func):
+    """AVG utilisable sur une annotation agrégée à l'intérieur d'une fenêtre"""
+    function = 'AVG'
+    window_compatible = True
+    output_field = DecimalField(max_digits=16, decimal_places=2)
+
+
+def _completed_sessions(start, end, agency_ids=None):
+    sessions = WorkSession.objects.filter(
+        status=WorkSession.Status.COMPLETED, date__gte=start, date__lte=end
+    )
+    if agency_ids is not None:
+        sessions = sessions.filter(agency_id__in=agency_ids)
+    return sessions.order_by()
+
+
+def _amount(value):
+    return (value if value is not None else ZERO).quantize(Decimal('0.01'))
+
+
+def _growth(current, previous):
+    """Variation en pourcentage (None sans valeur précédente non nulle)"""
+    if not previous:
+        return None
+    return round((current - previous) * 100 / abs(previous), 1)
+
+
+def daily_trend(start, end, agency_ids=None):
+    """
+    Gains quotidiens avec cumul de la période, moyenne glissante et variation journalière.
+
+    La moyenne glissante porte sur les ROLLING_DAYS derniers jours ayant des sessions ;
+    les jours précédant la période sont lus pour l'amorcer mais ne sont pas renvoyés et
+    n'entrent pas dans le cumul.
+
+    Returns:
+        list: [{'date', 'gain_cop', 'sessions', 'cumulative', 'rolling_average', 'previous', 'growth'}]
+    """
+    fetch_start = start - timedelta(days=ROLLING_DAYS * 2)
+    in_period = ExpressionWrapper(Q(date__gte=start), output_field=BooleanField())
+    rows = (
+        _completed_sessions(fetch_start, end, agency_ids)
+        .values('date')
+        .annotate(gain_cop=Sum('session_gain_amount'), sessions=Count('id'))
+        .annotate(
+            cumulative=Window(WindowSum('gain_cop'), partition_by=[in_period], order_by=F('date').asc()),
+            rolling_average=Window(
+                WindowAvg('gain_cop'),
+                order_by=F('date').asc(),
+                frame=RowRange(start=-(ROLLING_DAYS - 1), end=0),
+            ),
+            previous=Window(Lag('gain_cop'), order_by=F('date').asc()),
+        )
+        .order_by('date')
+    )
+    series = []
+    for row in rows:
+        if row['date'] < start:
+            continue
+        gain = _amount(row['gain_cop'])
+        previous = _amount(row['previous']) if row['previous'] is not None else None
+        series.append({
+            'date': row['date'],
+            'gain_cop': gain,
+            'sessions': row['sessions'],
+            'cumulative': _amount(row['cumulative']),
+            'rolling_average': _amount(row['rolling_average']),
+            'previous': previous,
+            'growth': _growth(gain, previous),
+        })
+    return series
+
+
+def weekly_growth(start, end, agency_ids=None):
+    """
+    Gains hebdomadaires par modèle et croissance par rapport à la semaine précédente.
+
+    La semaine précédente est lue par Lag sur la partition du modèle ; elle n'est retenue
+    que si elle précède immédiatement la semaine (sinon le modèle n'a pas travaillé).
+
+    Returns:
+        list: [{'model_id', 'model_name', 'week', 'gain_cop', 'sessions', 'previous', 'growth'}]
+    """
+    week_start = start - timedelta(days=start.weekday())
+    model_order = {'partition_by': [F('model_id')], 'order_by': F('week').asc()}
+    rows = (
+        _completed_sessions(week_start - timedelta(days=7), end, agency_ids)
+        .annotate(week=TruncWeek('date'))
+        .values('model_id', 'model__first_name', 'model__last_name', 'week')
+        .annotate(gain_cop=Sum('session_gain_amount'), sessions=Count('id'))
+        .annotate(
+            previous=Window(Lag('gain_cop'), **model_order),
+            previous_week=Window(Lag('week'), **model_order),
+        )
+        .order_by('model__first_name', 'model__last_name', 'model_id', 'week')
+    )
+    series = []
+    for row in rows:
+        if row['week'] < week_start:
+            continue
+        gain = _amount(row['gain_cop'])
+        previous = None
+        if row['previous_week'] == row['week'] - timedelta(days=7):
+            previous = _amount(row['previous'])
+        series.append({
+            'model_id': row['model_id'],
+            'model_name': f"{row['model__first_name']} {row['model__last_name']}",
+            'week': row['week'],
+            'gain_cop': gain,
+            'sessions': row['sessions'],
+            'previous': previous,
+            'growth': _growth(gain, previous),
+        })
+    return series
+
+
+def quincena_comparison(day, agency_ids=None):
+    """
+    Gains de chaque modèle sur la quinzaine d'une date comparés à la quinzaine précédente.
+
+    Returns:
+        dict: {'current': (début, fin), 'previous': (début, fin), 'totals': {...},
+               'models': [{'model_id', 'model_name', 'gain_cop', 'sessions', 'hours',
+                           'previous', 'previous_sessions', 'growth'}]}
+    """
+    current_start, current_end = get_quincena_bounds(day)
+    previous_start, previous_end = get_quincena_bounds(current_start - timedelta(days=1))
+    half = Case(When(date__day__lte=15, then=Value(1)), default=Value(2), output_field=IntegerField())
+    model_order = {'partition_by': [F('model_id')], 'order_by': [F('month').asc(), F('half').asc()]}
+    rows = (
+        _completed_sessions(previous_start, current_end, agency_ids)
+        .annotate(month=TruncMonth('date'), half=half)
+        .values('model_id', 'model__first_name', 'model__last_name', 'month', 'half')
+        .annotate(gain_cop=Sum('session_gain_amount'), sessions=Count('id'), hours=Sum('total_worked_hours'))
+        .annotate(
+            previous=Window(Lag('gain_cop'), **model_order),
+            previous_sessions=Window(Lag('sessions'), **model_order),
+        )
+        .order_by('model__first_name', 'model__last_name', 'model_id', 'month', 'half')
+    )
+
+    models = {}
+    for row in rows:
+        is_current = row['month'] == current_start.replace(day=1) and row['half'] == (1 if current_start.day == 1 else 2)
+        entry = models.setdefault(row['model_id'], {
+            'model_id': row['model_id'],
+            'model_name': f"{row['model__first_name']} {row['model__last_name']}",
+            'gain_cop': ZERO,
+            'sessions': 0,
+            'hours': ZERO,
+            'previous': None,
+            'previous_sessions': 0,
+        })
+        if is_current:
+            # Lag donne la quinzaine précédente du modèle (seule autre ligne lue)
+            entry['gain_cop'] = _amount(row['gain_cop'])
+            entry['sessions'] = row['sessions']
+            entry['hours'] = _amount(row['hours'])
+            entry['previous'] = _amount(row['previous']) if row['previous'] is not None else None
+            entry['previous_sessions'] = row['previous_sessions'] or 0
+        elif entry['previous'] is None:
+            # Modèle sans session sur la quinzaine courante
+            entry['previous'] = _amount(row['gain_cop'])
+            entry['previous_sessions'] = row['sessions']
+
+    result = list(models.values())
+    for entry in result:
+        entry['growth'] = _growth(entry['gain_cop'], entry['previous'])
+    result.sort(key=lambda entry: entry['gain_cop'], reverse=True)
+
+    current_total = sum((entry['gain_cop'] for entry in result), ZERO)
+    previous_total = sum((entry['previous'] or ZERO for entry in result), ZERO)
+    return {
+        'current': (current_start, current_end),
+        'previous': (previous_start, previous_end),
+        'totals': {
+            'gain_cop': current_total,
+            'previous': previous_total,
+            'growth': _growth(current_total, previous_total),
+        },
+        'models': result,
+    }
@@ -0,0 +1,16 @@
+from django.urls import path
+from . import views
+
+app_name = 'reports'
+
+urlpatterns = [
+    path('pnl/', views.pnl_report, name='pnl_report'),
+    path('pnl/data/', views.pnl_data, name='pnl_data'),
+    path('pnl/export/', views.pnl_export, name='pnl_export'),
+    path('trends/', views.trends_report, name='trends_report'),
+    path('trends/daily/', views.trends_daily, name='trends_daily'),
+    path('trends/weekly/', views.trends_weekly, name='trends_weekly'),
+    path('trends/quincena/', views.trends_quincena, name='trends_quincena'),
+    path('artifacts/<int:artifact_id>/status/', views.artifact_status, name='artifact_status'),
+    path('artifacts/<int:artifact_id>/download/', views.artifact_download, name='artifact_download'),
+]
@@ -1,3 +1,288 @@
-from django.shortcuts import render
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from django.shortcuts import render, get_object_or_404
+from django.http import FileResponse, Http404, JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_http_methods
+from django.contrib import messages
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from accounts.decorators import role_required
+from accounts.models import Role
+from accounts.refdata import get_agencies
+from .artifacts import pnl_params, request_artifact
+from .engine import AMOUNT_FIELDS, get_pnl, previous_year_period
+from .models import ReportArtifact
+from .trends import ROLLING_DAYS, daily_trend, quincena_comparison, weekly_growth
 
-# Create your views here.
+# Lignes du compte de résultats : (clé, libellé, signe dans le résultat net)
+PNL_LINES = [
+    ('session_gain_cop', _('Ganancias de sesiones'), '+'),
+    ('revenues', _('Otros ingresos'), '+'),
+    ('gross_income', _('Ingresos brutos'), '='),
+    ('bank_fees', _('Impuestos bancarios'), '-'),
+    ('model_share', _('Ganancia de modelos (neta de multas)'), '-'),
+    ('bonuses', _('Bonos'), '-'),
+    ('expenses', _('Gastos'), '-'),
+    ('salaries', _('Salarios'), '-'),
+    ('net_profit', _('Utilidad neta'), '='),
+]
+
+
+def _parse_date(value, default):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else default
+    except ValueError:
+        return default
+
+
+def _get_pnl_params(request, default_start=None):
+    """
+    Période et agences du rapport selon les paramètres GET et le rôle.
+
+    Le Regional Manager est limité à son agence ; le General Manager peut choisir une
+    agence ou consulter toutes les agences.
+
+    Returns:
+        tuple: (début, fin, liste des agences ou None, agence sélectionnée, comparaison N-1)
+    """
+    today = timezone.now().date()
+    start = _parse_date(request.GET.get('date_from'), default_start or today.replace(month=1, day=1))
+    end = _parse_date(request.GET.get('date_to'), today)
+    if end < start:
+        start, end = end, start
+
+    selected_agency = None
+    agency_id = request.GET.get('agency')
+    if agency_id and agency_id.isdigit():
+        selected_agency = int(agency_id)
+
+    if request.user.is_superuser or request.user.is_general_manager():
+        agency_ids = [selected_agency] if selected_agency else None
+    else:
+        agency_ids = [request.user.agency_id] if request.user.agency_id else []
+        selected_agency = request.user.agency_id
+
+    compare = request.GET.get('compare') == '1'
+    return start, end, agency_ids, selected_agency, compare
+
+
+def _serialize(totals):
+    data = {field: str(totals[field]) for field in AMOUNT_FIELDS + [
+        'gross_income', 'model_payout', 'operating_costs', 'net_profit'
+    ]}
+    data['sessions_count'] = totals['sessions_count']
+    data['expenses_by_category'] = {
+        category: str(amount) for category, amount in totals['expenses_by_category'].items()
+    }
+    return data
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+def pnl_report(request):
+    """Compte de résultats par agence et consolidé, avec comparaison à l'année précédente"""
+    start, end, agency_ids, selected_agency, compare = _get_pnl_params(request)
+    if agency_ids == []:
+        messages.warning(request, _('No tiene una agencia asignada.'))
+
+    pnl = get_pnl(start, end, agency_ids)
+    previous = None
+    if compare:
+        previous = get_pnl(*previous_year_period(start, end), agency_ids)
+
+    # Lignes du tableau consolidé avec la variation par rapport à N-1
+    lines = []
+    for key, label, sign in PNL_LINES:
+        line = {'key': key, 'label': label, 'sign': sign, 'value': pnl['consolidated'][key]}
+        if previous is not None:
+            line['previous'] = previous['consolidated'][key]
+            line['variation'] = line['value'] - line['previous']
+            line['variation_percentage'] = (
+                round(line['variation'] * 100 / abs(line['previous']), 1) if line['previous'] else None
+            )
+        lines.append(line)
+
+    agencies = None
+    if request.user.is_superuser or request.user.is_general_manager():
+        agencies = get_agencies()
+
+    context = {
+        'pnl': pnl,
+        'previous': previous,
+        'lines': lines,
+        'agencies': agencies,
+        'selected_agency': selected_agency,
+        'date_from': start,
+        'date_to': end,
+        'compare': compare,
+    }
+    return render(request, 'reports/pnl.html', context)
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+def pnl_data(request):
+    """Compte de résultats JSON (mêmes paramètres que le rapport)"""
+    start, end, agency_ids, selected_agency, compare = _get_pnl_params(request)
+    pnl = get_pnl(start, end, agency_ids)
+    data = {
+        'success': True,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'consolidated': _serialize(pnl['consolidated']),
+        'agencies': [
+            {'id': row['id'], 'name': row['name'], 'code': row['code'], **_serialize(row)}
+            for row in pnl['agencies']
+        ],
+    }
+    if compare:
+        previous_start, previous_end = previous_year_period(start, end)
+        data['previous'] = _serialize(get_pnl(previous_start, previous_end, agency_ids)['consolidated'])
+    return JsonResponse(data)
+
+
+# ==================== TENDANCES ====================
+
+# Période par défaut des tendances (jours)
+TREND_DEFAULT_DAYS = 90
+
+
+def _get_trend_params(request):
+    """Période et agences des tendances (90 derniers jours par défaut)"""
+    default_start = timezone.now().date() - timedelta(days=TREND_DEFAULT_DAYS)
+    return _get_pnl_params(request, default_start=default_start)
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _serialize_rows(rows):
+    """Dates en ISO et montants en chaînes"""
+    return [{key: _json_value(value) for key, value in row.items()} for row in rows]
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+def trends_report(request):
+    """Tendances : gains quotidiens, croissance hebdomadaire et comparaison de quinzaines"""
+    start, end, agency_ids, selected_agency, compare = _get_trend_params(request)
+    if agency_ids == []:
+        messages.warning(request, _('No tiene una agencia asignada.'))
+
+    agencies = None
+    if request.user.is_superuser or request.user.is_general_manager():
+        agencies = get_agencies()
+
+    context = {
+        'quincena': quincena_comparison(end, agency_ids),
+        'agencies': agencies,
+        'selected_agency': selected_agency,
+        'date_from': start,
+        'date_to': end,
+        'rolling_days': ROLLING_DAYS,
+    }
+    return render(request, 'reports/trends.html', context)
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+def trends_daily(request):
+    """Série quotidienne JSON (cumul, moyenne glissante, variation)"""
+    start, end, agency_ids, selected_agency, compare = _get_trend_params(request)
+    return JsonResponse({
+        'success': True,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'rolling_days': ROLLING_DAYS,
+        'series': _serialize_rows(daily_trend(start, end, agency_ids)),
+    })
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+def trends_weekly(request):
+    """Croissance hebdomadaire JSON par modèle"""
+    start, end, agency_ids, selected_agency, compare = _get_trend_params(request)
+    return JsonResponse({
+        'success': True,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'series': _serialize_rows(weekly_growth(start, end, agency_ids)),
+    })
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+def trends_quincena(request):
+    """Comparaison JSON de la quinzaine de la date de fin avec la précédente"""
+    start, end, agency_ids, selected_agency, compare = _get_trend_params(request)
+    comparison = quincena_comparison(end, agency_ids)
+    return JsonResponse({
+        'success': True,
+        'current': [day.isoformat() for day in comparison['current']],
+        'previous': [day.isoformat() for day in comparison['previous']],
+        'totals': _serialize_rows([comparison['totals']])[0],
+        'models': _serialize_rows(comparison['models']),
+    })
+
+
+# ==================== FICHIERS (RENDU EN SEGUNDO PLANO) ====================
+
+def _artifact_payload(artifact):
+    """État JSON d'un fichier de rapport"""
+    data = {
+        'success': True,
+        'id': artifact.id,
+        'status': artifact.status,
+        'status_display': str(artifact.get_status_display()),
+        'ready': artifact.status == ReportArtifact.Status.READY,
+        'failed': artifact.is_failed,
+        'status_url': reverse('reports:artifact_status', args=[artifact.id]),
+    }
+    if data['ready']:
+        data['download_url'] = reverse('reports:artifact_download', args=[artifact.id])
+    return data
+
+
+def _get_visible_artifact(request, artifact_id):
+    """Un Regional Manager n'accède qu'aux fichiers limités à son agence"""
+    artifact = get_object_or_404(ReportArtifact.objects.select_related('job'), id=artifact_id)
+    if not (request.user.is_superuser or request.user.is_general_manager()):
+        if artifact.params.get('agency_ids') != [request.user.agency_id]:
+            raise Http404
+    return artifact
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+@require_http_methods(["POST"])
+def pnl_export(request):
+    """
+    Demande le fichier XLSX ou HTML imprimable du P&L ; le rendu est fait par le worker et
+    un fichier identique sur des données inchangées est réutilisé.
+    """
+    start, end, agency_ids, selected_agency, compare = _get_pnl_params(request)
+    export_format = request.GET.get('format', ReportArtifact.Format.XLSX)
+    if export_format not in ReportArtifact.Format.values:
+        return JsonResponse({'success': False, 'error': str(_('Formato no soportado.'))}, status=400)
+
+    artifact = request_artifact('pnl', export_format, pnl_params(start, end, agency_ids, compare), request.user)
+    return JsonResponse(_artifact_payload(artifact))
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+def artifact_status(request, artifact_id):
+    """État JSON d'un fichier de rapport (interrogé périodiquement par l'interface)"""
+    return JsonResponse(_artifact_payload(_get_visible_artifact(request, artifact_id)))
+
+
+@role_required(Role.RoleType.REGIONAL_MANAGER, Role.RoleType.GENERAL_MANAGER)
+def artifact_download(request, artifact_id):
+    """Téléchargement d'un fichier de rapport prêt"""
+    artifact = _get_visible_artifact(request, artifact_id)
+    if artifact.status != ReportArtifact.Status.READY:
+        raise Http404
+    return FileResponse(
+        artifact.file.open('rb'),
+        as_attachment=artifact.format == ReportArtifact.Format.XLSX,
+        filename=artifact.file.name.rsplit('/', 1)[-1],
+    )